@@ -0,0 +1,188 @@
+import logging
+import asyncio
+
+from app.config import settings
+from app.database_fixed import AsyncSessionLocal
+from app.crud_fixed import save_answer_score, get_answer_rows
+from app.services import gemini_service
+from app.session_store import session_store
+from app.metrics import GEMINI_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# Уровень по средней оценке для сводки без модели
+LEVELS = ((8, "Senior"), (5.5, "Middle"), (0, "Junior"))
+STRONG_SCORE = 7
+WEAK_SCORE = 4
+
+
+def local_report(position: str, items: list) -> str:
+    """Итоговый отчет по оценкам ответов без обращения к модели"""
+    scored = [item for item in items if item["score"] is not None]
+    lines = [f"Позиция: {position}"]
+    if scored:
+        average = sum(item["score"] for item in scored) / len(scored)
+        level = next(name for threshold, name in LEVELS if average >= threshold)
+        lines.append(f"Средняя оценка: {average:.1f}/10 (уровень: {level})")
+    lines.append(f"Оценено ответов: {len(scored)} из {len(items)}")
+
+    lines.append("\nПО ВОПРОСАМ:")
+    for i, item in enumerate(items):
+        score = f"{item['score']}/10" if item["score"] is not None else "без оценки"
+        lines.append(f"{i + 1}. {item['question']} - {score}. {item['notes'] or ''}".rstrip())
+
+    strong = [str(i + 1) for i, item in enumerate(items) if item["score"] is not None and item["score"] >= STRONG_SCORE]
+    weak = [str(i + 1) for i, item in enumerate(items) if item["score"] is not None and item["score"] <= WEAK_SCORE]
+    lines.append("\nСИЛЬНЫЕ СТОРОНЫ: " + (f"вопросы {', '.join(strong)}" if strong else "не выявлены"))
+    lines.append("ОБЛАСТИ ДЛЯ РАЗВИТИЯ: " + (f"вопросы {', '.join(weak)}" if weak else "не выявлены"))
+    return "\n".join(lines)
+
+
+class AnswerScorer:
+    """Фоновая оценка каждого ответа сразу после его получения (FEEDBACK_MODE=incremental).
+
+    Короткий запрос к модели по одной паре вопрос-ответ выполняется, пока
+    кандидат отвечает на следующие вопросы; оценка и комментарий пишутся в
+    interview_answers. После последнего ответа final_report() только сводит
+    готовые оценки - коротким запросом (FEEDBACK_SUMMARY=model) или локально.
+    Оценки, не готовые к этому моменту (ошибка, перезапуск), досчитываются там же.
+    """
+
+    def __init__(self, mode: str, workers: int, summary: str, gemini=gemini_service, store=session_store):
+        self.mode = mode
+        self.workers = workers
+        self.summary = summary
+        self.gemini = gemini
+        self.store = store
+        self._queue = None
+        self._tasks = []
+        self._pending = {}  # session_id -> число ответов в очереди на оценку
+        self._idle = {}     # session_id -> asyncio.Event, когда очередь сессии пуста
+        self.scored = 0
+        self.failed = 0
+        self.scored_at_summary = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "incremental"
+
+    async def start(self):
+        if self.enabled:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, session_id: str, idx: int, position: str, question: str, answer: str):
+        if not self.enabled or self._queue is None:
+            return
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._queue.put_nowait((session_id, idx, position, question, answer))
+
+    async def wait(self, session_id: str, timeout: float) -> bool:
+        """Дождаться оценки всех ответов сессии, поставленных в очередь; False по таймауту"""
+        if not self._pending.get(session_id):
+            return True
+        event = self._idle.setdefault(session_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _worker(self):
+        while True:
+            session_id, idx, position, question, answer = await self._queue.get()
+            try:
+                score, notes = await self.gemini.score_answer_async(position, question, answer)
+                if score is None and notes is None:
+                    self.failed += 1
+                else:
+                    await self._save(session_id, idx, score, notes)
+                    self.scored += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Ошибка фоновой оценки ответа", extra={"session_id": session_id, "idx": idx})
+            finally:
+                left = self._pending.get(session_id, 0) - 1
+                if left > 0:
+                    self._pending[session_id] = left
+                else:
+                    self._pending.pop(session_id, None)
+                    event = self._idle.pop(session_id, None)
+                    if event is not None:
+                        event.set()
+                self._queue.task_done()
+
+    async def _save(self, session_id: str, idx: int, score, notes: str):
+        async with AsyncSessionLocal() as db:
+            if await save_answer_score(db, session_id, idx, score, notes):
+                return
+            # SESSION_STORE=memory: ответ еще ждет отложенной записи
+            await self.store.flush()
+            await save_answer_score(db, session_id, idx, score, notes)
+
+    async def final_report(self, session_id: str, position: str, questions: list):
+        """Части итогового отчета по оценкам ответов (вместо полного фидбэка)"""
+        await self.wait(session_id, settings.SCORING_WAIT)
+        async with AsyncSessionLocal() as db:
+            rows = await get_answer_rows(db, session_id)
+        if len(rows) != len(questions):
+            # Сообщение о несовпадении формирует полный фидбэк
+            async for chunk in self.gemini.generate_feedback_stream(position, questions, [row.text for row in rows]):
+                yield chunk
+            return
+
+        items = [
+            {"idx": row.idx, "question": q, "answer": row.text, "score": row.score, "notes": row.notes}
+            for q, row in zip(questions, rows)
+        ]
+        missing = [item for item in items if item["score"] is None]
+        if missing:
+            # Недооцененные ответы досчитываются параллельно - это по-прежнему короткие запросы
+            results = await asyncio.gather(*(
+                self.gemini.score_answer_async(position, item["question"], item["answer"]) for item in missing
+            ))
+            async with AsyncSessionLocal() as db:
+                for item, (score, notes) in zip(missing, results):
+                    item["score"], item["notes"] = score, notes
+                    if score is not None or notes is not None:
+                        await save_answer_score(db, session_id, item["idx"], score, notes)
+            self.scored_at_summary += len(missing)
+            logger.info("Оценки досчитаны перед сводкой", extra={"session_id": session_id, "answers": len(missing)})
+
+        if self.summary != "model":
+            yield local_report(position, items)
+            return
+
+        started = False
+        try:
+            async for chunk in self.gemini.generate_summary_stream(position, items):
+                started = True
+                yield chunk
+        except Exception as e:
+            GEMINI_FALLBACKS.labels("summary").inc()
+            logger.warning("Сводка без модели", extra={"session_id": session_id, "error": repr(e)})
+            report = local_report(position, items)
+            yield f"\n\n{report}" if started else report
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sessions_pending": len(self._pending),
+            "scored": self.scored,
+            "failed": self.failed,
+            "scored_at_summary": self.scored_at_summary,
+        }
+
+
+answer_scorer = AnswerScorer(
+    mode=settings.FEEDBACK_MODE,
+    workers=settings.SCORING_WORKERS,
+    summary=settings.FEEDBACK_SUMMARY,
+)
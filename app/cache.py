@@ -0,0 +1,110 @@
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+# Символы, которые различают языки и платформы, заменяются словами до удаления
+# пунктуации: иначе "C++", "C#" и "C" дают один ключ и общие вопросы
+_SYMBOL_TOKENS = (
+    (re.compile(r"\+\+"), "pp"),                # c++ -> cpp
+    (re.compile(r"#"), "sharp"),                 # c# -> csharp, f# -> fsharp
+    (re.compile(r"\.net\b"), " dotnet"),         # .net, asp.net -> asp dotnet
+    (re.compile(r"(?<=\w)\.js\b"), "js"),        # node.js -> nodejs
+)
+
+
+def normalize_position(position: str) -> str:
+    """Нормализация названия позиции: регистр, пробелы и пунктуация (кроме значимой: C++, C#, .NET)"""
+    text = position.casefold()
+    for pattern, token in _SYMBOL_TOKENS:
+        text = pattern.sub(token, text)
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+class QuestionCache:
+    """LRU-кэш с TTL для сгенерированных наборов вопросов.
+
+    Ключ - нормализованная позиция. Для каждой позиции хранится небольшой
+    пул вариантов (до ``variants`` наборов), пока пул не заполнен, get()
+    возвращает промах, чтобы сервис догенерировал ещё один вариант.
+    """
+
+    def __init__(self, max_size: int, ttl: float, variants: int = 1, shuffle: bool = False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        self.shuffle = shuffle
+        self._entries = OrderedDict()  # key -> (expires_at, [questions, ...])
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, position: str):
+        """Получить копию набора вопросов или None при промахе"""
+        if self.max_size <= 0:
+            return None
+        key = normalize_position(position)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None or len(entry[1]) < self.variants:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            questions = list(random.choice(entry[1]))
+
+        if self.shuffle:
+            random.shuffle(questions)
+        return questions
+
+    def put(self, position: str, questions: list):
+        """Добавить набор вопросов в пул вариантов позиции"""
+        if self.max_size <= 0:
+            return
+        key = normalize_position(position)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                entry = (time.monotonic() + self.ttl, [])
+            pool = entry[1]
+            if list(questions) not in pool:
+                pool.append(list(questions))
+            del pool[:-self.variants]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+question_cache = QuestionCache(
+    max_size=settings.QUESTION_CACHE_SIZE,
+    ttl=settings.QUESTION_CACHE_TTL,
+    variants=settings.QUESTION_CACHE_VARIANTS,
+    shuffle=settings.QUESTION_CACHE_SHUFFLE,
+)
@@ -1,15 +1,119 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-class Settings:
-    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
-    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./academy_hr.db")
-    TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
-    HOST: str = os.getenv("HOST", "127.0.0.1")
-    PORT: int = int(os.getenv("PORT", 8000))
-    DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
-
-settings = Settings()
\ No newline at end of file
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class Settings:
+    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./academy_hr.db")
+    # По умолчанию выводится из DATABASE_URL (aiosqlite / asyncpg)
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")
+    TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    HOST: str = os.getenv("HOST", "127.0.0.1")
+    PORT: int = int(os.getenv("PORT", 8000))
+    DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    # Токен админских эндпоинтов (заголовок X-Admin-Token); пусто - эндпоинты отключены
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # Логирование: уровень и формат ("text" - для консоли, "json" - для сборщика логов)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+
+    # Пул соединений с БД (для PostgreSQL) и настройки SQLite
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # мс
+
+    # Вызовы Gemini
+    GEMINI_TIMEOUT: float = float(os.getenv("GEMINI_TIMEOUT", 60))
+    GEMINI_USE_AIO: bool = os.getenv("GEMINI_USE_AIO", "True").lower() == "true"
+    GEMINI_EXECUTOR_WORKERS: int = int(os.getenv("GEMINI_EXECUTOR_WORKERS", 32))
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", 16))
+    GEMINI_QUESTIONS_CONCURRENCY: int = int(os.getenv("GEMINI_QUESTIONS_CONCURRENCY", 8))
+    GEMINI_FEEDBACK_CONCURRENCY: int = int(os.getenv("GEMINI_FEEDBACK_CONCURRENCY", 8))
+    GEMINI_SCORING_CONCURRENCY: int = int(os.getenv("GEMINI_SCORING_CONCURRENCY", 8))
+    GEMINI_RATE_PER_SEC: float = float(os.getenv("GEMINI_RATE_PER_SEC", 5))  # 0 - без ограничения
+    GEMINI_RATE_BURST: float = float(os.getenv("GEMINI_RATE_BURST", 10))
+    GEMINI_BREAKER_THRESHOLD: int = int(os.getenv("GEMINI_BREAKER_THRESHOLD", 5))  # 0 - отключить
+    GEMINI_BREAKER_RESET: float = float(os.getenv("GEMINI_BREAKER_RESET", 30))
+    # Кэш контекста Gemini: рубрика оценки загружается один раз, запросы ссылаются на нее.
+    # Нужна модель с context caching и рубрика не меньше минимального размера кэша этой модели
+    GEMINI_CONTEXT_CACHE: bool = os.getenv("GEMINI_CONTEXT_CACHE", "False").lower() == "true"
+    GEMINI_CONTEXT_CACHE_TTL: int = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 3600))
+    # Бюджет токенов на один ответ кандидата в промпте (0 - только сжатие пробелов, без обрезки)
+    PROMPT_ANSWER_TOKEN_BUDGET: int = int(os.getenv("PROMPT_ANSWER_TOKEN_BUDGET", 800))
+
+    # Фоновая генерация фидбэка
+    FEEDBACK_WORKERS: int = int(os.getenv("FEEDBACK_WORKERS", 4))
+    FEEDBACK_WAIT_MAX: float = float(os.getenv("FEEDBACK_WAIT_MAX", 60))
+    FEEDBACK_POLL_INTERVAL: float = float(os.getenv("FEEDBACK_POLL_INTERVAL", 1))
+    # "full" - один большой запрос после последнего ответа,
+    # "incremental" - каждый ответ оценивается в фоне, в конце только сводка по оценкам
+    FEEDBACK_MODE: str = os.getenv("FEEDBACK_MODE", "full")
+    # Сводка в режиме incremental: "model" - короткий запрос к Gemini, "local" - без обращения к модели
+    FEEDBACK_SUMMARY: str = os.getenv("FEEDBACK_SUMMARY", "model")
+    SCORING_WORKERS: int = int(os.getenv("SCORING_WORKERS", 8))
+    SCORING_WAIT: float = float(os.getenv("SCORING_WAIT", 30))  # сколько сводка ждет незавершенные оценки
+    # Сколько секунд захват сессии воркером оценки не дает другим процессам взять ее повторно
+    FEEDBACK_LEASE_TIMEOUT: float = float(os.getenv("FEEDBACK_LEASE_TIMEOUT", 300))
+
+    # Повторная отправка ответа (Idempotency-Key или question_index): кэш готовых ответов API
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+    IDEMPOTENCY_TTL: float = float(os.getenv("IDEMPOTENCY_TTL", 3600))
+
+    # Хранилище активных сессий: "db" - сразу в БД, "memory" - в памяти с отложенной записью ответов
+    SESSION_STORE: str = os.getenv("SESSION_STORE", "db")
+    SESSION_STORE_MAX: int = int(os.getenv("SESSION_STORE_MAX", 10000))
+    SESSION_STORE_FLUSH_INTERVAL: float = float(os.getenv("SESSION_STORE_FLUSH_INTERVAL", 0.5))
+    SESSION_STORE_BATCH_SIZE: int = int(os.getenv("SESSION_STORE_BATCH_SIZE", 200))
+
+    # Обслуживание таблицы сессий: активные без действий дольше SESSION_IDLE_TTL секунд - expired,
+    # завершенные и истекшие старше ARCHIVE_AFTER_DAYS дней - в архив (0 отключает шаг)
+    SESSION_IDLE_TTL: float = float(os.getenv("SESSION_IDLE_TTL", 24 * 3600))
+    ARCHIVE_AFTER_DAYS: float = float(os.getenv("ARCHIVE_AFTER_DAYS", 90))
+    MAINTENANCE_INTERVAL: float = float(os.getenv("MAINTENANCE_INTERVAL", 600))
+    MAINTENANCE_BATCH_SIZE: int = int(os.getenv("MAINTENANCE_BATCH_SIZE", 500))
+
+    # Кэш сгенерированных вопросов (QUESTION_CACHE_SIZE=0 отключает кэш)
+    QUESTION_CACHE_SIZE: int = int(os.getenv("QUESTION_CACHE_SIZE", 512))
+    QUESTION_CACHE_TTL: float = float(os.getenv("QUESTION_CACHE_TTL", 6 * 3600))
+    QUESTION_CACHE_VARIANTS: int = int(os.getenv("QUESTION_CACHE_VARIANTS", 1))
+    QUESTION_CACHE_SHUFFLE: bool = os.getenv("QUESTION_CACHE_SHUFFLE", "False").lower() == "true"
+
+    # Банк вопросов: сгенерированные вопросы сохраняются в БД, собеседование на
+    # похожую позицию собирается из банка без запроса к Gemini
+    QUESTION_BANK: bool = os.getenv("QUESTION_BANK", "True").lower() == "true"
+    # Порог похожести позиций по триграммам названия (0..1)
+    QUESTION_BANK_SIMILARITY: float = float(os.getenv("QUESTION_BANK_SIMILARITY", 0.45))
+    # Из банка - только когда у похожих позиций набралось столько вопросов (иначе всем достается один набор)
+    QUESTION_BANK_MIN_QUESTIONS: int = int(os.getenv("QUESTION_BANK_MIN_QUESTIONS", 20))
+    # Вопросы с оценкой сходства по MinHash не ниже порога считаются почти-дубликатами
+    QUESTION_BANK_DEDUP: float = float(os.getenv("QUESTION_BANK_DEDUP", 0.6))
+    # Как часто перечитывать список позиций банка, с: его пополняют и другие процессы
+    QUESTION_BANK_REFRESH: float = float(os.getenv("QUESTION_BANK_REFRESH", 300))
+
+    # Telegram-бот
+    # "http" - бот ходит в API, "embedded" - вызывает сервис собеседований в своем процессе
+    BOT_MODE: str = os.getenv("BOT_MODE", "http")
+    BOT_API_BASE_URL: str = os.getenv("BOT_API_BASE_URL", "http://127.0.0.1:8000/api")
+    # "polling" - getUpdates, "webhook" - Telegram присылает обновления POST-запросами
+    BOT_UPDATES: str = os.getenv("BOT_UPDATES", "polling")
+    BOT_WEBHOOK_URL: str = os.getenv("BOT_WEBHOOK_URL", "")  # внешний адрес, пусто - setWebhook не вызывается
+    BOT_WEBHOOK_LISTEN: str = os.getenv("BOT_WEBHOOK_LISTEN", "127.0.0.1")
+    BOT_WEBHOOK_PORT: int = int(os.getenv("BOT_WEBHOOK_PORT", 8443))
+    BOT_WEBHOOK_PATH: str = os.getenv("BOT_WEBHOOK_PATH", "/telegram")
+    BOT_WEBHOOK_SECRET: str = os.getenv("BOT_WEBHOOK_SECRET", "")
+    # Обновления разных чатов обрабатываются параллельно, одного чата - по очереди
+    BOT_CONCURRENT_UPDATES: int = int(os.getenv("BOT_CONCURRENT_UPDATES", 256))
+    BOT_CONNECTION_POOL_SIZE: int = int(os.getenv("BOT_CONNECTION_POOL_SIZE", 256))
+    # Лимиты исходящих сообщений: всего в секунду и в один чат (Telegram: ~30/с и ~1/с)
+    BOT_SEND_RATE: float = float(os.getenv("BOT_SEND_RATE", 30))
+    BOT_SEND_CHAT_RATE: float = float(os.getenv("BOT_SEND_CHAT_RATE", 1))
+    BOT_SEND_CHAT_BURST: float = float(os.getenv("BOT_SEND_CHAT_BURST", 3))
+    # Адрес Bot API (локальный Bot API server или заглушка bot/telegram_standin.py)
+    BOT_TELEGRAM_API_URL: str = os.getenv("BOT_TELEGRAM_API_URL", "")
+
+settings = Settings()
@@ -1,64 +1,413 @@
-from sqlalchemy.orm import Session
-from app.database_fixed import InterviewSessionDB
-from app.models import InterviewSession
-from datetime import datetime
-
-def create_session(db: Session, session_data: InterviewSession):
-    db_session = InterviewSessionDB(
-        session_id=session_data.session_id,
-        user_id=session_data.user_id,
-        platform=session_data.platform,
-        position=session_data.position,
-        current_question=session_data.current_question,
-        status=session_data.status,
-        created_at=session_data.created_at
-    )
-    db_session.set_questions(session_data.questions or [])
-    db_session.set_answers(session_data.answers or [])
-    
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session
-
-def get_session(db: Session, session_id: str):
-    return db.query(InterviewSessionDB).filter(InterviewSessionDB.session_id == session_id).first()
-
-def update_session_answers(db: Session, session_id: str, answers: list, current_question: int):
-    """Специальная функция для обновления ответов"""
-    db_session = db.query(InterviewSessionDB).filter(InterviewSessionDB.session_id == session_id).first()
-    if db_session:
-        print(f"💾 Сохранение {len(answers)} ответов в базу")
-        db_session.set_answers(answers)
-        db_session.current_question = current_question
-        db.commit()
-        db.refresh(db_session)
-        print(f"✅ В базе теперь {len(db_session.get_answers())} ответов")
-    return db_session
-
-def update_session_complete(db: Session, session_id: str, answers: list, feedback: str):
-    """Завершение собеседования"""
-    db_session = db.query(InterviewSessionDB).filter(InterviewSessionDB.session_id == session_id).first()
-    if db_session:
-        db_session.set_answers(answers)
-        db_session.status = "completed"
-        db_session.feedback = feedback
-        db_session.completed_at = datetime.now()
-        db.commit()
-        db.refresh(db_session)
-    return db_session
-
-def update_session_questions(db: Session, session_id: str, questions: list, position: str):
-    """Обновление вопросов и позиции"""
-    db_session = db.query(InterviewSessionDB).filter(InterviewSessionDB.session_id == session_id).first()
-    if db_session:
-        db_session.set_questions(questions)
-        db_session.position = position
-        db_session.current_question = 0
-        db_session.set_answers([])
-        db.commit()
-        db.refresh(db_session)
-    return db_session
-
-def get_user_sessions(db: Session, user_id: str):
-    return db.query(InterviewSessionDB).filter(InterviewSessionDB.user_id == user_id).order_by(InterviewSessionDB.created_at.desc()).all()
\ No newline at end of file
+import logging
+from sqlalchemy import select, insert, update, delete, func, bindparam, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, load_only, defer
+from app.database_fixed import (
+    InterviewSessionDB, InterviewQuestionDB, InterviewAnswerDB, InterviewEvaluationDB, InterviewSessionArchiveDB,
+    QuestionBankDB
+)
+from app.models import InterviewSession
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Конечные статусы: такие сессии больше не меняются и могут уйти в архив
+ARCHIVABLE_STATUSES = ("completed", "expired")
+
+async def create_session(db: AsyncSession, session_data: InterviewSession):
+    db_session = InterviewSessionDB(
+        session_id=session_data.session_id,
+        user_id=session_data.user_id,
+        platform=session_data.platform,
+        position=session_data.position,
+        current_question=session_data.current_question,
+        status=session_data.status,
+        created_at=session_data.created_at
+    )
+    db_session.set_questions(session_data.questions or [])
+    db_session.set_answers(session_data.answers or [])
+    
+    db.add(db_session)
+    await db.commit()
+    return db_session
+
+async def get_session(db: AsyncSession, session_id: str, questions: bool = True, answers: bool = True):
+    """Загрузка сессии; ненужные вопросы/ответы не загружаются (обращение к ним - ошибка)"""
+    query = select(InterviewSessionDB).where(InterviewSessionDB.session_id == session_id)
+    if not questions:
+        query = query.options(raiseload(InterviewSessionDB.question_rows))
+    if not answers:
+        query = query.options(raiseload(InterviewSessionDB.answer_rows))
+    return (await db.execute(query)).scalars().first()
+
+async def _execute_update(db: AsyncSession, stmt):
+    """Условный UPDATE за один запрос: строка из RETURNING или None, если ни одна строка не изменилась"""
+    if db.get_bind().dialect.update_returning:
+        stmt = stmt.returning(
+            InterviewSessionDB.session_id,
+            InterviewSessionDB.position,
+            InterviewSessionDB.current_question,
+            InterviewSessionDB.status
+        )
+        return (await db.execute(stmt)).first()
+    result = await db.execute(stmt)
+    return result if result.rowcount == 1 else None
+
+async def add_answer(db: AsyncSession, session_id: str, idx: int, answer: str, status: str = None):
+    """Добавление ответа: условный UPDATE сессии и одна вставка в interview_answers.
+
+    UPDATE срабатывает, только если сессия активна и всё ещё ждёт ответа
+    на вопрос idx (оптимистичная блокировка), иначе возвращается None.
+    """
+    logger.debug("Сохранение ответа", extra={"session_id": session_id, "idx": idx})
+    values = {"current_question": idx + 1}
+    if status:
+        values["status"] = status
+    row = await _execute_update(db, update(InterviewSessionDB).where(
+        InterviewSessionDB.session_id == session_id,
+        InterviewSessionDB.current_question == idx,
+        InterviewSessionDB.status == "active"
+    ).values(**values))
+    if row is None:
+        await db.rollback()
+        return None
+
+    db.add(InterviewAnswerDB(session_id=session_id, idx=idx, text=answer))
+    await db.commit()
+    return row
+
+async def save_answers_batch(db: AsyncSession, answers: list):
+    """Запись пачки ответов одной транзакцией (write-behind из SessionStore).
+
+    answers - список словарей session_id, idx, text; current_question каждой
+    сессии выставляется по последнему ответу в пачке.
+    """
+    progress = {}
+    for item in answers:
+        progress[item["session_id"]] = max(progress.get(item["session_id"], 0), item["idx"] + 1)
+
+    await db.execute(insert(InterviewAnswerDB), answers)
+    sessions = InterviewSessionDB.__table__
+    await db.execute(
+        update(sessions)
+        .where(sessions.c.session_id == bindparam("b_session_id"))
+        .values(current_question=bindparam("b_current_question")),
+        [{"b_session_id": sid, "b_current_question": cq} for sid, cq in progress.items()]
+    )
+    await db.commit()
+
+async def save_answer_score(db: AsyncSession, session_id: str, idx: int, score, notes: str) -> bool:
+    """Оценка ответа; False, если строки ответа еще нет в БД (отложенная запись SessionStore)"""
+    result = await db.execute(update(InterviewAnswerDB).where(
+        InterviewAnswerDB.session_id == session_id,
+        InterviewAnswerDB.idx == idx
+    ).values(score=score, notes=notes))
+    await db.commit()
+    return result.rowcount == 1
+
+async def get_answer_rows(db: AsyncSession, session_id: str):
+    """Ответы сессии вместе с оценками, по порядку вопросов"""
+    query = select(InterviewAnswerDB).where(InterviewAnswerDB.session_id == session_id).order_by(InterviewAnswerDB.idx)
+    return (await db.execute(query)).scalars().all()
+
+async def update_session_complete(db: AsyncSession, session_id: str, feedback: str):
+    """Завершение собеседования; срабатывает один раз - только для сессии в статусе evaluating"""
+    row = await _execute_update(db, update(InterviewSessionDB).where(
+        InterviewSessionDB.session_id == session_id,
+        InterviewSessionDB.status == "evaluating"
+    ).values(status="completed", feedback=feedback, completed_at=datetime.now()))
+    await db.commit()
+    return row
+
+async def claim_feedback(db: AsyncSession, session_id: str, stale_before: datetime):
+    """Захват сессии на оценку: срабатывает для evaluating без захвата или с захватом старше stale_before.
+
+    Так фидбэк сессии генерирует один воркер, даже если её поставили
+    в очередь несколько процессов (например, при перезапуске).
+    """
+    row = await _execute_update(db, update(InterviewSessionDB).where(
+        InterviewSessionDB.session_id == session_id,
+        InterviewSessionDB.status == "evaluating",
+        or_(
+            InterviewSessionDB.feedback_claimed_at.is_(None),
+            InterviewSessionDB.feedback_claimed_at < stale_before
+        )
+    ).values(feedback_claimed_at=datetime.now()))
+    await db.commit()
+    return row
+
+async def release_feedback(db: AsyncSession, session_ids: list):
+    """Снять захват с незавершенных сессий (остановка приложения посреди оценки)"""
+    await db.execute(update(InterviewSessionDB).where(
+        InterviewSessionDB.session_id.in_(session_ids),
+        InterviewSessionDB.status == "evaluating"
+    ).values(feedback_claimed_at=None))
+    await db.commit()
+
+async def update_session_questions(db: AsyncSession, session_id: str, questions: list, position: str, user_id: str = None):
+    """Обновление вопросов и позиции активной сессии одной транзакцией"""
+    row = await _execute_update(db, update(InterviewSessionDB).where(
+        InterviewSessionDB.session_id == session_id,
+        InterviewSessionDB.status == "active"
+    ).values(
+        position=position,
+        current_question=0,
+        # user_id из телеграма проставляется, только если его еще нет
+        user_id=func.coalesce(InterviewSessionDB.user_id, user_id)
+    ))
+    if row is None:
+        await db.rollback()
+        return None
+
+    await db.execute(delete(InterviewQuestionDB).where(InterviewQuestionDB.session_id == session_id))
+    await db.execute(delete(InterviewAnswerDB).where(InterviewAnswerDB.session_id == session_id))
+    db.add_all([
+        InterviewQuestionDB(session_id=session_id, idx=i, text=q)
+        for i, q in enumerate(questions)
+    ])
+    await db.commit()
+    return row
+
+def _before(model, before: datetime, before_id: str = None):
+    """Условие keyset-курсора (created_at, session_id): сессии после последней на предыдущей странице.
+
+    session_id различает сессии с одинаковым created_at и совпадает в рабочей
+    таблице и архиве, поэтому курсор переживает архивирование сессии.
+    """
+    if before_id is None:
+        return model.created_at < before
+    return or_(model.created_at < before, and_(model.created_at == before, model.session_id < before_id))
+
+async def get_user_sessions(db: AsyncSession, user_id: str, limit: int = None, before: datetime = None,
+                            detail: bool = False, before_id: str = None):
+    """История пользователя с keyset-пагинацией по (created_at, session_id).
+
+    Без detail загружается только краткая сводка: вопросы, ответы и фидбэк не читаются.
+    """
+    query = select(InterviewSessionDB).where(InterviewSessionDB.user_id == user_id)
+    if before is not None:
+        query = query.where(_before(InterviewSessionDB, before, before_id))
+    query = query.order_by(InterviewSessionDB.created_at.desc(), InterviewSessionDB.session_id.desc())
+    if limit:
+        query = query.limit(limit)
+    if not detail:
+        query = query.options(
+            load_only(
+                InterviewSessionDB.session_id,
+                InterviewSessionDB.position,
+                InterviewSessionDB.current_question,
+                InterviewSessionDB.status,
+                InterviewSessionDB.created_at,
+                InterviewSessionDB.completed_at
+            ),
+            raiseload(InterviewSessionDB.question_rows),
+            raiseload(InterviewSessionDB.answer_rows)
+        )
+    return (await db.execute(query)).scalars().all()
+
+async def count_sessions_by_status(db: AsyncSession) -> dict:
+    query = select(InterviewSessionDB.status, func.count()).group_by(InterviewSessionDB.status)
+    return dict((await db.execute(query)).all())
+
+async def get_sessions_by_status(db: AsyncSession, status: str):
+    query = select(InterviewSessionDB).where(InterviewSessionDB.status == status)
+    return (await db.execute(query)).scalars().all()
+
+async def stream_sessions_to_evaluate(db: AsyncSession, version: str, batch_size: int, limit: int = None):
+    """Завершенные сессии без оценки версии version, порциями по batch_size.
+
+    Серверный курсор (yield_per): в памяти одна порция, сколько бы сессий ни было.
+    Уже оцененные этой версией сессии не выбираются, поэтому повторный
+    запуск продолжает с места остановки.
+    """
+    evaluated = select(InterviewEvaluationDB.id).where(
+        InterviewEvaluationDB.session_id == InterviewSessionDB.session_id,
+        InterviewEvaluationDB.version == version
+    ).exists()
+    query = select(InterviewSessionDB).where(
+        InterviewSessionDB.status == "completed",
+        ~evaluated
+    ).order_by(InterviewSessionDB.id).options(
+        load_only(InterviewSessionDB.session_id, InterviewSessionDB.position)
+    ).execution_options(yield_per=batch_size)
+    if limit:
+        query = query.limit(limit)
+    result = await db.stream(query)
+    async for sessions in result.scalars().partitions():
+        yield sessions
+
+async def _insert_new(db: AsyncSession, model, rows: list) -> int:
+    """Вставка одним INSERT, при нарушении уникальности - по одной строке; число вставленных"""
+    if not rows:
+        return 0
+    try:
+        await db.execute(insert(model), rows)
+        await db.commit()
+        return len(rows)
+    except IntegrityError:
+        await db.rollback()
+
+    saved = 0
+    for row in rows:
+        try:
+            await db.execute(insert(model).values(**row))
+            await db.commit()
+            saved += 1
+        except IntegrityError:
+            await db.rollback()
+    return saved
+
+async def save_evaluations(db: AsyncSession, rows: list) -> int:
+    """Запись оценок одним INSERT; число записанных (оценку той же версии мог записать параллельный запуск)"""
+    return await _insert_new(db, InterviewEvaluationDB, rows)
+
+async def get_evaluations(db: AsyncSession, session_id: str):
+    """Все версии повторной оценки сессии, от старых к новым"""
+    query = select(InterviewEvaluationDB).where(
+        InterviewEvaluationDB.session_id == session_id
+    ).order_by(InterviewEvaluationDB.created_at)
+    return (await db.execute(query)).scalars().all()
+
+async def expire_idle_sessions(db: AsyncSession, idle_before: datetime, limit: int) -> list:
+    """Брошенные активные сессии (без изменений с idle_before) - в статус expired; session_id истекших"""
+    query = select(InterviewSessionDB.session_id).where(
+        InterviewSessionDB.status == "active",
+        InterviewSessionDB.updated_at < idle_before
+    ).limit(limit)
+    session_ids = (await db.execute(query)).scalars().all()
+    if not session_ids:
+        return []
+
+    # Условия повторяются: между SELECT и UPDATE сессия могла получить ответ
+    await db.execute(update(InterviewSessionDB).where(
+        InterviewSessionDB.session_id.in_(session_ids),
+        InterviewSessionDB.status == "active",
+        InterviewSessionDB.updated_at < idle_before
+    ).values(status="expired"))
+    await db.commit()
+    return list(session_ids)
+
+async def get_sessions_to_archive(db: AsyncSession, before: datetime, limit: int):
+    """Завершенные и истекшие сессии без изменений с before и их повторные оценки (session_id -> список)"""
+    query = select(InterviewSessionDB).where(
+        InterviewSessionDB.status.in_(ARCHIVABLE_STATUSES),
+        InterviewSessionDB.updated_at < before
+    ).order_by(InterviewSessionDB.id).limit(limit)
+    sessions = (await db.execute(query)).scalars().all()
+    evaluations = {}
+    if sessions:
+        rows = (await db.execute(select(InterviewEvaluationDB).where(
+            InterviewEvaluationDB.session_id.in_([s.session_id for s in sessions])
+        ).order_by(InterviewEvaluationDB.created_at))).scalars().all()
+        for row in rows:
+            evaluations.setdefault(row.session_id, []).append(row)
+    return sessions, evaluations
+
+async def move_to_archive(db: AsyncSession, archived: list, session_ids: list) -> bool:
+    """Запись в архив и удаление из рабочих таблиц одной транзакцией.
+
+    Дочерние строки удаляются явно: SQLite без PRAGMA foreign_keys не
+    выполняет ON DELETE CASCADE. False - эти сессии уже архивировал другой процесс.
+    """
+    try:
+        await db.execute(insert(InterviewSessionArchiveDB), archived)
+    except IntegrityError:
+        await db.rollback()
+        return False
+    for model in (InterviewEvaluationDB, InterviewAnswerDB, InterviewQuestionDB, InterviewSessionDB):
+        await db.execute(delete(model).where(model.session_id.in_(session_ids)))
+    await db.commit()
+    return True
+
+async def get_archived_session(db: AsyncSession, session_id: str):
+    query = select(InterviewSessionArchiveDB).where(InterviewSessionArchiveDB.session_id == session_id)
+    return (await db.execute(query)).scalars().first()
+
+async def get_user_archived_sessions(db: AsyncSession, user_id: str, limit: int = None, before: datetime = None,
+                                     detail: bool = False, before_id: str = None):
+    """Архивная часть истории пользователя; без detail сжатые данные не читаются"""
+    query = select(InterviewSessionArchiveDB).where(InterviewSessionArchiveDB.user_id == user_id)
+    if before is not None:
+        query = query.where(_before(InterviewSessionArchiveDB, before, before_id))
+    query = query.order_by(InterviewSessionArchiveDB.created_at.desc(), InterviewSessionArchiveDB.session_id.desc())
+    if limit:
+        query = query.limit(limit)
+    if not detail:
+        query = query.options(defer(InterviewSessionArchiveDB.payload, raiseload=True))
+    return (await db.execute(query)).scalars().all()
+
+async def get_bank_positions(db: AsyncSession) -> dict:
+    """Позиции банка вопросов: position_key -> число вопросов"""
+    query = select(QuestionBankDB.position_key, func.count()).group_by(QuestionBankDB.position_key)
+    return dict((await db.execute(query)).all())
+
+async def get_bank_questions(db: AsyncSession, position_keys: list):
+    """Вопросы банка для позиций: строки (position_key, question, signature)"""
+    query = select(QuestionBankDB.position_key, QuestionBankDB.question, QuestionBankDB.signature).where(
+        QuestionBankDB.position_key.in_(position_keys)
+    ).order_by(QuestionBankDB.id)
+    return (await db.execute(query)).all()
+
+async def save_bank_questions(db: AsyncSession, rows: list) -> int:
+    """Запись вопросов в банк; число записанных (тот же вопрос мог сохранить другой процесс)"""
+    return await _insert_new(db, QuestionBankDB, rows)
+
+def _export_filters(model, since: datetime = None, until: datetime = None, position: str = None, statuses: list = None) -> list:
+    clauses = []
+    if since is not None:
+        clauses.append(model.created_at >= since)
+    if until is not None:
+        clauses.append(model.created_at < until)
+    if position:
+        clauses.append(func.lower(model.position) == position.lower())
+    if statuses:
+        clauses.append(model.status.in_(statuses))
+    return clauses
+
+async def stream_sessions_for_export(db: AsyncSession, batch_size: int, **filters):
+    """Сессии по фильтрам порциями по batch_size через серверный курсор: (строки, вопросы, ответы).
+
+    filters - since/until (по created_at), position (без учета регистра), statuses.
+    Строки - Row без ORM-объектов; вопросы и ответы порции читаются двумя
+    запросами и возвращаются словарями session_id -> [text] и [(text, score)].
+    """
+    query = select(
+        InterviewSessionDB.session_id,
+        InterviewSessionDB.user_id,
+        InterviewSessionDB.platform,
+        InterviewSessionDB.position,
+        InterviewSessionDB.status,
+        InterviewSessionDB.current_question,
+        InterviewSessionDB.created_at,
+        InterviewSessionDB.completed_at,
+        InterviewSessionDB.feedback
+    ).where(*_export_filters(InterviewSessionDB, **filters)).order_by(InterviewSessionDB.id)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        session_ids = [row.session_id for row in rows]
+        questions, answers = {}, {}
+        for session_id, text in await db.execute(
+            select(InterviewQuestionDB.session_id, InterviewQuestionDB.text)
+            .where(InterviewQuestionDB.session_id.in_(session_ids))
+            .order_by(InterviewQuestionDB.session_id, InterviewQuestionDB.idx)
+        ):
+            questions.setdefault(session_id, []).append(text)
+        for session_id, text, score in await db.execute(
+            select(InterviewAnswerDB.session_id, InterviewAnswerDB.text, InterviewAnswerDB.score)
+            .where(InterviewAnswerDB.session_id.in_(session_ids))
+            .order_by(InterviewAnswerDB.session_id, InterviewAnswerDB.idx)
+        ):
+            answers.setdefault(session_id, []).append((text, score))
+        yield rows, questions, answers
+
+async def stream_archived_sessions_for_export(db: AsyncSession, batch_size: int, **filters):
+    """Архивные сессии по тем же фильтрам порциями по batch_size через серверный курсор"""
+    query = select(InterviewSessionArchiveDB).where(
+        *_export_filters(InterviewSessionArchiveDB, **filters)
+    ).order_by(InterviewSessionArchiveDB.id)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.scalars().partitions():
+        yield rows
+        # Архивные строки больше не нужны - identity map не растет с размером выгрузки
+        db.expunge_all()
@@ -1,63 +1,255 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import json
-from datetime import datetime
-
-from app.config import settings
-
-Base = declarative_base()
-
-class InterviewSessionDB(Base):
-    __tablename__ = "interview_sessions"
-
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, unique=True, index=True)
-    user_id = Column(String, nullable=True)
-    platform = Column(String, default="web")
-    position = Column(String)
-    questions = Column(Text)  # Храним как JSON строку
-    answers = Column(Text)    # Храним как JSON строку  
-    current_question = Column(Integer, default=0)
-    status = Column(String, default="active")
-    feedback = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    completed_at = Column(DateTime, nullable=True)
-
-    def get_questions(self):
-        """Получить вопросы как список"""
-        if self.questions:
-            return json.loads(self.questions)
-        return []
-    
-    def set_questions(self, questions_list):
-        """Установить вопросы как JSON строку"""
-        self.questions = json.dumps(questions_list, ensure_ascii=False)
-    
-    def get_answers(self):
-        """Получить ответы как список"""
-        if self.answers:
-            return json.loads(self.answers)
-        return []
-    
-    def set_answers(self, answers_list):
-        """Установить ответы как JSON строку"""
-        self.answers = json.dumps(answers_list, ensure_ascii=False)
-
-# SQLite для разработки
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+import zlib
+from datetime import datetime
+
+import orjson
+from sqlalchemy import create_engine, event, Column, String, Integer, DateTime, Text, LargeBinary, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.types import TypeDecorator
+
+from app.config import settings
+from app.metrics import instrument_engine
+
+Base = declarative_base()
+
+class CompressedJSON(TypeDecorator):
+    """JSON-колонка: JSONB на PostgreSQL (большие значения TOAST сжимает сам), на остальных БД - orjson + zlib в BLOB.
+
+    Значение декодируется один раз при загрузке строки; в UPDATE колонка
+    попадает, только если атрибуту присвоено новое значение.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return zlib.compress(orjson.dumps(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return orjson.loads(zlib.decompress(value))
+
+class InterviewSessionDB(Base):
+    __tablename__ = "interview_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, unique=True, index=True)
+    user_id = Column(String, nullable=True)
+    platform = Column(String, default="web")
+    position = Column(String)
+    current_question = Column(Integer, default=0)
+    status = Column(String, default="active")
+    feedback = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    # Когда воркер взял сессию на оценку; пока захват не истек, другие воркеры ее не берут
+    feedback_claimed_at = Column(DateTime, nullable=True)
+    # Последнее изменение сессии: по нему истекают брошенные и архивируются старые сессии
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # История пользователя: WHERE user_id = ? ORDER BY created_at DESC
+        Index("ix_interview_sessions_user_created", "user_id", created_at.desc()),
+        # Обслуживание: WHERE status = ? AND updated_at < ?
+        Index("ix_interview_sessions_status_updated", "status", "updated_at"),
+    )
+
+    # Вопросы и ответы хранятся построчно, добавление ответа - один INSERT
+    question_rows = relationship(
+        "InterviewQuestionDB",
+        order_by="InterviewQuestionDB.idx",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+    answer_rows = relationship(
+        "InterviewAnswerDB",
+        order_by="InterviewAnswerDB.idx",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    def get_questions(self):
+        """Получить вопросы как список"""
+        return [row.text for row in self.question_rows]
+    
+    def set_questions(self, questions_list):
+        """Установить вопросы (только для новой сессии)"""
+        self.question_rows = [InterviewQuestionDB(idx=i, text=q) for i, q in enumerate(questions_list)]
+    
+    def get_answers(self):
+        """Получить ответы как список"""
+        return [row.text for row in self.answer_rows]
+    
+    def set_answers(self, answers_list):
+        """Установить ответы (только для новой сессии)"""
+        self.answer_rows = [InterviewAnswerDB(idx=i, text=a) for i, a in enumerate(answers_list)]
+
+class InterviewQuestionDB(Base):
+    __tablename__ = "interview_questions"
+    __table_args__ = (
+        UniqueConstraint("session_id", "idx", name="uq_interview_questions_session_idx"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("interview_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    idx = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class InterviewAnswerDB(Base):
+    __tablename__ = "interview_answers"
+    __table_args__ = (
+        UniqueConstraint("session_id", "idx", name="uq_interview_answers_session_idx"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("interview_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    idx = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    # Оценка ответа 0-10 и комментарий (FEEDBACK_MODE=incremental)
+    score = Column(Integer, nullable=True)
+    notes = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class InterviewEvaluationDB(Base):
+    """Повторные оценки завершенных собеседований (python -m app.rescoring).
+
+    Каждая версия рубрики или модели - отдельная строка, исходный
+    interview_sessions.feedback не меняется, старые и новые оценки можно сравнить.
+    """
+    __tablename__ = "interview_evaluations"
+    __table_args__ = (
+        UniqueConstraint("session_id", "version", name="uq_interview_evaluations_session_version"),
+        Index("ix_interview_evaluations_version", "version"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("interview_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    version = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    feedback = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class InterviewSessionArchiveDB(Base):
+    """Архив завершенных и истекших сессий (app/maintenance.py).
+
+    Поля для поиска и истории - отдельными колонками, вопросы, ответы с
+    оценками, фидбэк и повторные оценки - одним JSON-документом в payload.
+    """
+    __tablename__ = "interview_sessions_archive"
+    __table_args__ = (
+        Index("ix_interview_sessions_archive_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, unique=True, index=True, nullable=False)
+    user_id = Column(String, nullable=True)
+    platform = Column(String)
+    position = Column(String)
+    current_question = Column(Integer)
+    status = Column(String)
+    created_at = Column(DateTime)
+    completed_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    payload = Column(CompressedJSON, nullable=False)
+
+class QuestionBankDB(Base):
+    """Банк сгенерированных вопросов (app/question_bank.py).
+
+    position_key - нормализованная позиция, fingerprint - хэш нормализованного
+    текста вопроса, signature - MinHash для поиска почти-дубликатов.
+    """
+    __tablename__ = "question_bank"
+    __table_args__ = (
+        UniqueConstraint("position_key", "fingerprint", name="uq_question_bank_position_fingerprint"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    position = Column(String, nullable=False)
+    position_key = Column(String, nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    fingerprint = Column(String(16), nullable=False)
+    signature = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _async_database_url(url: str) -> str:
+    """URL для async-драйвера: aiosqlite для SQLite, asyncpg для PostgreSQL"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    scheme, sep, rest = url.partition("://")
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+def _engine_options(url: str) -> dict:
+    if _is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        # JSONB (CompressedJSON) кодируется тем же orjson
+        "json_serializer": lambda value: orjson.dumps(value).decode("utf-8"),
+        "json_deserializer": orjson.loads,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL и busy_timeout, чтобы параллельные записи не падали с 'database is locked'"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+# Синхронный движок - для init_db, миграций и утилит командной строки
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+
+# expire_on_commit=False: после commit объекты не перечитываются лишним SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Асинхронный движок - для обработчиков FastAPI и фоновых задач
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    **_engine_options(settings.DATABASE_URL)
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if _is_sqlite(settings.DATABASE_URL):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
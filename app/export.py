@@ -0,0 +1,199 @@
+"""Выгрузка собеседований для аналитики: NDJSON, CSV или Parquet.
+
+    python -m app.export --format ndjson --out interviews.ndjson
+    python -m app.export --format csv --since 2026-01-01 --status completed --out - > interviews.csv
+    python -m app.export --format parquet --out interviews.parquet   # нужен pyarrow
+
+То же потоком по HTTP: GET /api/admin/export (заголовок X-Admin-Token).
+Сессии читаются серверным курсором порциями, поэтому память не зависит
+от размера таблицы, а первые строки уходят сразу после первой порции.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import sys
+from datetime import datetime
+
+import orjson
+
+from app.database_fixed import AsyncSessionLocal, async_engine
+from app.crud_fixed import stream_sessions_for_export, stream_archived_sessions_for_export
+from app.maintenance import unpack_session
+
+EXPORT_COLUMNS = (
+    "session_id", "user_id", "platform", "position", "status", "current_question",
+    "created_at", "completed_at", "questions", "answers", "scores", "feedback", "archived",
+)
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Списки в CSV - JSON-строкой в одной ячейке
+_LIST_COLUMNS = ("questions", "answers", "scores")
+
+
+def _session_row(row, questions: list, answers: list) -> dict:
+    return {
+        "session_id": row.session_id,
+        "user_id": row.user_id,
+        "platform": row.platform,
+        "position": row.position,
+        "status": row.status,
+        "current_question": row.current_question,
+        "created_at": row.created_at,
+        "completed_at": row.completed_at,
+        "questions": questions,
+        "answers": [text for text, _ in answers],
+        "scores": [score for _, score in answers],
+        "feedback": row.feedback,
+        "archived": False,
+    }
+
+
+def _archived_row(row) -> dict:
+    data = unpack_session(row)
+    result = {column: data[column] for column in EXPORT_COLUMNS if column != "archived"}
+    result["archived"] = True
+    return result
+
+
+async def iter_export_rows(batch_size: int = 500, include_archive: bool = True, **filters):
+    """Строки выгрузки списками по batch_size: сначала рабочая таблица, затем архив.
+
+    Открывает собственную сессию БД - генератор живет дольше обработчика запроса.
+    """
+    async with AsyncSessionLocal() as db:
+        async for rows, questions, answers in stream_sessions_for_export(db, batch_size, **filters):
+            yield [
+                _session_row(row, questions.get(row.session_id, []), answers.get(row.session_id, []))
+                for row in rows
+            ]
+        if include_archive:
+            async for rows in stream_archived_sessions_for_export(db, batch_size, **filters):
+                yield [_archived_row(row) for row in rows]
+
+
+def _ndjson(rows: list) -> bytes:
+    # Сразу UTF-8 байты от orjson: декодирование в str съело бы половину выигрыша у json.dumps
+    return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def _csv(rows: list, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([
+            orjson.dumps(row[column]).decode("utf-8") if column in _LIST_COLUMNS
+            else row[column].isoformat() if isinstance(row[column], datetime)
+            else row[column]
+            for column in EXPORT_COLUMNS
+        ])
+    return buffer.getvalue()
+
+
+async def _text_chunks(fmt: str, **options):
+    """Части выгрузки - по одной на порцию курсора - и число строк в каждой: NDJSON байтами, CSV строкой"""
+    header = fmt == "csv"
+    async for rows in iter_export_rows(**options):
+        yield (_csv(rows, header) if fmt == "csv" else _ndjson(rows)), len(rows)
+        header = False
+    if header:
+        # Пустая выгрузка CSV - только заголовок
+        yield _csv([], header=True), 0
+
+
+async def stream_export(fmt: str, **options):
+    """Части выгрузки для StreamingResponse"""
+    async for chunk, _ in _text_chunks(fmt, **options):
+        yield chunk
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("user_id", pa.string()),
+        ("platform", pa.string()),
+        ("position", pa.string()),
+        ("status", pa.string()),
+        ("current_question", pa.int32()),
+        ("created_at", pa.timestamp("us")),
+        ("completed_at", pa.timestamp("us")),
+        ("questions", pa.list_(pa.string())),
+        ("answers", pa.list_(pa.string())),
+        ("scores", pa.list_(pa.int32())),
+        ("feedback", pa.string()),
+        ("archived", pa.bool_()),
+    ])
+
+
+async def write_parquet(path: str, **options) -> int:
+    """Выгрузка в файл Parquet: одна группа строк на порцию курсора; число строк"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet нужен pyarrow: pip install pyarrow")
+
+    schema = _parquet_schema(pa)
+    total = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        async for rows in iter_export_rows(**options):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            total += len(rows)
+    return total
+
+
+async def write_text(fmt: str, out, **options) -> int:
+    """Выгрузка NDJSON (в бинарный файл) или CSV (в текстовый) в открытый файл; число строк"""
+    total = 0
+    async for chunk, count in _text_chunks(fmt, **options):
+        out.write(chunk)
+        total += count
+    return total
+
+
+async def _run(args) -> int:
+    options = {
+        "batch_size": args.batch_size,
+        "include_archive": not args.no_archive,
+        "since": args.since,
+        "until": args.until,
+        "position": args.position,
+        "statuses": args.status.split(",") if args.status else None,
+    }
+    try:
+        if args.format == "parquet":
+            return await write_parquet(args.out, **options)
+        binary = args.format == "ndjson"
+        if args.out == "-":
+            return await write_text(args.format, sys.stdout.buffer if binary else sys.stdout, **options)
+        with open(args.out, "wb") if binary else open(args.out, "w", encoding="utf-8", newline="") as out:
+            return await write_text(args.format, out, **options)
+    finally:
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка собеседований для аналитики")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--out", required=True, help="файл выгрузки, '-' - stdout (кроме parquet)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="созданные не раньше (ISO-дата)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="созданные раньше (ISO-дата)")
+    parser.add_argument("--position", help="позиция (без учета регистра)")
+    parser.add_argument("--status", help="статусы через запятую: completed,expired,...")
+    parser.add_argument("--no-archive", action="store_true", help="без архивных сессий")
+    parser.add_argument("--batch-size", type=int, default=500, help="сессий за одно чтение курсора")
+    args = parser.parse_args()
+    if args.format == "parquet" and args.out == "-":
+        parser.error("Parquet пишется только в файл")
+
+    try:
+        total = asyncio.run(_run(args))
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"exported: {total}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
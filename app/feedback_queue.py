@@ -0,0 +1,194 @@
+import logging
+import asyncio
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.database_fixed import AsyncSessionLocal
+from app.crud_fixed import (
+    get_session, get_sessions_by_status, update_session_complete, claim_feedback, release_feedback
+)
+from app.services import gemini_service
+from app.answer_scoring import answer_scorer
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackStream:
+    """Буфер частей фидбэка: подписчики получают уже готовые части и затем новые"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.status = "evaluating"
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def close(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class FeedbackQueue:
+    """Очередь фоновой генерации фидбэка с пулом воркеров внутри процесса приложения.
+
+    Задача - это session_id сессии в статусе "evaluating", поэтому очередь
+    переживает перезапуск: при старте такие сессии ставятся в очередь заново.
+    Перед генерацией воркер захватывает сессию в БД (claim_feedback), поэтому
+    фидбэк генерируется один раз, даже если сессию поставили в очередь
+    несколько процессов. Занятая сессия проверяется снова, когда захват истечет.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue = None
+        self._tasks = []
+        self._pending = set()  # в очереди или обрабатываются
+        self._events = {}      # session_id -> asyncio.Event для long-poll
+        self._streams = {}     # session_id -> FeedbackStream для SSE
+        self._claimed = set()  # захвачены этим процессом, оценка не сохранена
+        self._retries = {}     # session_id -> отложенная повторная постановка в очередь
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        async with AsyncSessionLocal() as db:
+            stale = await get_sessions_by_status(db, "evaluating")
+        for session in stale:
+            self.enqueue(session.session_id)
+        if stale:
+            logger.info("Сессии на оценку повторно поставлены в очередь", extra={"sessions": len(stale)})
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+
+        # Прерванную оценку другой процесс или следующий запуск возьмут сразу, не дожидаясь истечения захвата
+        if self._claimed:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await release_feedback(db, list(self._claimed))
+            except Exception as e:
+                logger.warning("Не удалось снять захват оценки", extra={"sessions": len(self._claimed), "error": repr(e)})
+            self._claimed.clear()
+
+    def enqueue(self, session_id: str):
+        if session_id in self._pending:
+            return
+        self._pending.add(session_id)
+        self._streams[session_id] = FeedbackStream()
+        self._queue.put_nowait(session_id)
+
+    def _retry_later(self, session_id: str, delay: float):
+        if session_id not in self._retries:
+            self._retries[session_id] = asyncio.get_running_loop().call_later(delay, self._retry, session_id)
+
+    def _retry(self, session_id: str):
+        self._retries.pop(session_id, None)
+        self.enqueue(session_id)
+
+    def is_pending(self, session_id: str) -> bool:
+        return session_id in self._pending
+
+    def stream(self, session_id: str):
+        """Поток частей фидбэка, если задача сессии выполняется в этом процессе"""
+        return self._streams.get(session_id)
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "queued": self.qsize(),
+            "pending": len(self._pending),
+            "streams": len(self._streams),
+            "claimed": len(self._claimed),
+            "retries_scheduled": len(self._retries),
+        }
+
+    async def wait(self, session_id: str, timeout: float) -> bool:
+        """Дождаться завершения задачи сессии; False по таймауту"""
+        event = self._events.setdefault(session_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if session_id not in self._pending:
+                self._events.pop(session_id, None)
+
+    async def _worker(self):
+        while True:
+            session_id = await self._queue.get()
+            try:
+                await self._process(session_id)
+            except Exception:
+                logger.exception("Ошибка фоновой генерации фидбэка", extra={"session_id": session_id})
+                # Захват остается в БД и истечет - тогда сессия будет оценена заново
+                self._claimed.discard(session_id)
+                self._retry_later(session_id, settings.FEEDBACK_LEASE_TIMEOUT)
+            finally:
+                self._pending.discard(session_id)
+                stream = self._streams.pop(session_id, None)
+                if stream is not None:
+                    stream.close()
+                event = self._events.pop(session_id, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    async def _process(self, session_id: str):
+        async with AsyncSessionLocal() as db:
+            db_session = await get_session(db, session_id)
+            if not db_session or db_session.status != "evaluating":
+                return
+            # claim_feedback фиксирует транзакцию - соединение не держится, пока идет генерация
+            stale_before = datetime.now() - timedelta(seconds=settings.FEEDBACK_LEASE_TIMEOUT)
+            if not await claim_feedback(db, session_id, stale_before):
+                logger.info("Сессию уже оценивает другой воркер", extra={"session_id": session_id})
+                self._retry_later(session_id, settings.FEEDBACK_LEASE_TIMEOUT)
+                return
+            self._claimed.add(session_id)
+            stream = self._streams.get(session_id) or FeedbackStream()
+            if answer_scorer.enabled:
+                # Ответы уже оценены по одному - остается короткая сводка
+                parts = answer_scorer.final_report(session_id, db_session.position, db_session.get_questions())
+            else:
+                parts = gemini_service.generate_feedback_stream(
+                    db_session.position,
+                    db_session.get_questions(),
+                    db_session.get_answers()
+                )
+            async for chunk in parts:
+                stream.push(chunk)
+            feedback = "".join(stream.chunks)
+            await update_session_complete(db, session_id, feedback)
+            self._claimed.discard(session_id)
+            stream.status = "completed"
+            logger.info("Фидбэк сохранён", extra={"session_id": session_id})
+
+feedback_queue = FeedbackQueue(workers=settings.FEEDBACK_WORKERS)
@@ -0,0 +1,467 @@
+import logging
+import asyncio
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.models import InterviewSession
+from app.database_fixed import AsyncSessionLocal
+from app.crud_fixed import (
+    create_session, get_session, get_user_sessions, get_evaluations,
+    get_archived_session, get_user_archived_sessions
+)
+from app.services import gemini_service
+from app.session_store import session_store
+from app.feedback_queue import feedback_queue
+from app.idempotency import answer_responses
+from app.answer_scoring import answer_scorer
+from app.maintenance import session_maintenance, unpack_session
+from app.question_bank import question_bank
+from app.limits import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class InterviewError(Exception):
+    """Ошибка сценария собеседования; status_code совпадает с HTTP-кодом ответа API"""
+
+    status_code = 400
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class SessionNotFound(InterviewError):
+    status_code = 404
+
+    def __init__(self, detail: str = "Сессия не найдена"):
+        super().__init__(detail)
+
+
+class InterviewConflict(InterviewError):
+    status_code = 409
+
+
+def _closed_message(status: str) -> str:
+    if status == "expired":
+        return "Собеседование закрыто из-за неактивности, начните новое"
+    return "Собеседование уже завершено"
+
+
+class InterviewService:
+    """Сценарий собеседования без привязки к транспорту.
+
+    Вызывается из обработчиков FastAPI и напрямую из Telegram-бота во
+    встроенном режиме. Все методы принимают AsyncSession и возвращают
+    словари в формате ответов API.
+    """
+
+    def __init__(self, gemini=gemini_service, store=session_store, queue=feedback_queue,
+                 responses=answer_responses, scorer=answer_scorer, maintenance=session_maintenance,
+                 bank=question_bank):
+        self.gemini = gemini
+        self.store = store
+        self.queue = queue
+        self.responses = responses
+        self.scorer = scorer
+        self.maintenance = maintenance
+        self.bank = bank
+        # Одновременные повторы одного ответа ждут результат первого запроса
+        self._answers_in_flight = SingleFlight()
+
+    async def startup(self):
+        await self.scorer.start()
+        await self.queue.start()
+        await self.store.start()
+        await self.maintenance.start()
+
+    async def shutdown(self):
+        await self.maintenance.stop()
+        await self.store.stop()
+        await self.queue.stop()
+        await self.scorer.stop()
+
+    async def start(self, db, user_id: str = None, platform: str = "web") -> dict:
+        session_id = str(uuid.uuid4())
+        session_data = InterviewSession(
+            session_id=session_id,
+            user_id=user_id,
+            platform=platform,
+            position="",
+            questions=[],
+            current_question=0,
+            answers=[],
+            status="active",
+            created_at=datetime.now()
+        )
+
+        await create_session(db, session_data)
+        self.store.add_new(session_data)
+
+        return {
+            "session_id": session_id,
+            "message": "🎯 Добро пожаловать в Нейро-HR! Я помогу провести техническое собеседование. На какую позицию вы проводите собеседование?"
+        }
+
+    async def set_position(self, db, session_id: str, position: str, user_id: str = None, session=None) -> dict:
+        """Вопросы для позиции и первый из них.
+
+        session - состояние, привязанное к соединению (ActiveSession): с ним
+        сессия не читается из БД и обновляется на месте.
+        """
+        db_session = session or await self.store.get(db, session_id, questions=False, answers=False)
+        if not db_session:
+            raise await self._missing(db, session_id)
+        if db_session.status != "active":
+            raise InterviewConflict(_closed_message(db_session.status))
+
+        logger.debug("Установка позиции", extra={"session_id": session_id, "position": position})
+        questions = await self.bank.find(db, position)
+        # Соединение возвращается в пул на время генерации вопросов
+        await db.commit()
+
+        if questions is None:
+            questions = await self.gemini.generate_questions_async(position, fallback=False)
+            if questions:
+                await self.bank.add(db, position, questions)
+            else:
+                questions = self.gemini.fallback_questions(position)
+
+        position_changed = bool(db_session.position)
+        # user_id из телеграма обновляется тем же UPDATE, если его еще нет
+        if not await self.store.update_questions(db, db_session, questions, position, user_id):
+            raise InterviewConflict("Собеседование уже завершено")
+        if position_changed:
+            # Позиция сменилась посреди собеседования - ответы на старые вопросы больше не повторяются
+            self.responses.drop_session(session_id)
+        if session is not None:
+            session.position, session.questions, session.answers, session.current_question = position, list(questions), [], 0
+
+        return {
+            "question": questions[0],
+            "current_question": 1,
+            "total_questions": len(questions),
+            "position": position
+        }
+
+    async def answer(self, db, session_id: str, answer: str, question_index: int = None,
+                     idempotency_key: str = None, session=None) -> dict:
+        """Сохранить ответ и вернуть следующий вопрос или результат завершения.
+
+        Повтор с тем же idempotency_key или question_index (номер вопроса с 0)
+        получает ответ первого запроса: второй раз ответ не записывается и
+        оценка не запускается. Без них повтор на уже отвеченный вопрос - 409.
+        С session (состояние, привязанное к соединению) сессия не читается из БД:
+        устаревшее состояние отсекает условный UPDATE ответа.
+        """
+        if idempotency_key is not None:
+            key = (session_id, "key", idempotency_key)
+        elif question_index is not None:
+            key = (session_id, "step", question_index)
+        else:
+            return await self._answer(db, session_id, answer, None, None, session)
+
+        cached = self.responses.get(key)
+        if cached is not None:
+            return cached
+        return await self._answers_in_flight.do(
+            key, lambda: self._answer_shared(session_id, answer, question_index, key, session)
+        )
+
+    async def _answer_shared(self, session_id: str, answer: str, question_index, key, session=None) -> dict:
+        """_answer для общего вызова SingleFlight: сессия БД своя, а не первого запроса.
+
+        Первый клиент может отключиться раньше, чем вызов закончится, и его
+        сессию закроет get_async_db - повторы ждут результат именно этого вызова.
+        """
+        async with AsyncSessionLocal() as db:
+            return await self._answer(db, session_id, answer, question_index, key, session)
+
+    async def _answer(self, db, session_id: str, answer: str, question_index, key, session=None) -> dict:
+        db_session = session or await self.store.get(db, session_id, answers=False)
+        if not db_session:
+            raise await self._missing(db, session_id)
+
+        current_questions = db_session.get_questions()
+        current_question_index = db_session.current_question
+
+        if question_index is not None:
+            if question_index < current_question_index or (
+                    db_session.status != "active" and question_index == len(current_questions) - 1):
+                # Ответ на этот вопрос уже сохранен - результат восстанавливается по состоянию сессии
+                return self._answer_response(db_session, question_index)
+            if question_index != current_question_index:
+                raise InterviewConflict(f"Ожидается ответ на вопрос {current_question_index + 1}")
+        if db_session.status != "active":
+            raise InterviewConflict(_closed_message(db_session.status))
+        if not current_questions:
+            raise InterviewConflict("Сначала укажите позицию")
+
+        new_question_index = current_question_index + 1
+        interview_complete = new_question_index >= len(current_questions)
+
+        # Условный UPDATE по current_question: параллельный ответ на тот же вопрос отклоняется
+        try:
+            saved = await self.store.add_answer(
+                db, db_session, current_question_index, answer,
+                status="evaluating" if interview_complete else None
+            )
+        except IntegrityError:
+            await db.rollback()
+            saved = None
+        if not saved:
+            if session is not None:
+                # Состояние соединения могло устареть: сессию закрыли по неактивности
+                current = await self.store.get(db, session_id, questions=False, answers=False)
+                if current is not None and current.status not in ("active", "evaluating"):
+                    raise InterviewConflict(_closed_message(current.status))
+            raise InterviewConflict("Ответ на этот вопрос уже получен")
+        if session is not None:
+            session.current_question = new_question_index
+            if interview_complete:
+                session.status = "evaluating"
+
+        # FEEDBACK_MODE=incremental: ответ оценивается в фоне, пока кандидат отвечает дальше
+        self.scorer.enqueue(
+            session_id, current_question_index, db_session.position,
+            current_questions[current_question_index], answer
+        )
+
+        # Проверяем завершение собеседования
+        if interview_complete:
+            logger.info("Собеседование завершено", extra={"session_id": session_id, "questions": len(current_questions)})
+
+            # Все вопросы отвечены - фидбэк генерируется в фоне; в evaluating сессия переходит
+            # только здесь и только один раз, поэтому оценка ставится в очередь однократно
+            self.queue.enqueue(session_id)
+
+        response = self._answer_response(db_session, current_question_index)
+        # Ответ запоминается по шагу всегда: ретрай с question_index найдет его и без Idempotency-Key
+        self.responses.put((session_id, "step", current_question_index), response)
+        if key is not None:
+            self.responses.put(key, response)
+        return response
+
+    def _answer_response(self, session, question_index: int) -> dict:
+        """Ответ API на ответ кандидата на вопрос question_index"""
+        questions = session.get_questions()
+        new_question_index = question_index + 1
+
+        if new_question_index >= len(questions):
+            return {
+                "interview_complete": True,
+                "status": "evaluating" if session.status == "active" else session.status,
+                "feedback": None,
+                "feedback_url": f"/api/session/{session.session_id}/feedback",
+                "feedback_stream_url": f"/api/session/{session.session_id}/feedback/stream",
+                "total_questions": len(questions),
+                "position": session.position
+            }
+
+        # Продолжаем собеседование
+        return {
+            "question": questions[new_question_index],
+            "current_question": new_question_index + 1,
+            "total_questions": len(questions),
+            "interview_complete": False
+        }
+
+    async def _missing(self, db, session_id: str) -> InterviewError:
+        """Ошибка для сессии, которой нет в рабочей таблице: архивная уже завершена"""
+        if await get_archived_session(db, session_id) is not None:
+            return InterviewConflict("Собеседование уже завершено")
+        return SessionNotFound()
+
+    async def _archived(self, db, session_id: str) -> dict:
+        """Сессия из архива (app/maintenance.py) или SessionNotFound"""
+        row = await get_archived_session(db, session_id)
+        if row is None:
+            raise SessionNotFound()
+        return unpack_session(row)
+
+    async def get_session(self, db, session_id: str) -> dict:
+        session = await self.store.get(db, session_id)
+        if not session:
+            archived = await self._archived(db, session_id)
+            return {key: archived[key] for key in (
+                "session_id", "position", "questions", "answers", "current_question", "status"
+            )}
+
+        questions = session.get_questions()
+        answers = session.get_answers()
+
+        return {
+            "session_id": session.session_id,
+            "position": session.position,
+            "questions": questions,
+            "answers": answers,
+            "current_question": session.current_question,
+            "status": session.status
+        }
+
+    async def get_feedback(self, db, session_id: str, wait: float = 0) -> dict:
+        """Результат фоновой оценки; ждёт до wait секунд, пока статус evaluating"""
+        session = await get_session(db, session_id, answers=False)
+        if not session:
+            archived = await self._archived(db, session_id)
+            return {
+                "session_id": session_id,
+                "status": archived["status"],
+                "feedback": archived["feedback"],
+                "position": archived["position"],
+                "total_questions": len(archived["questions"])
+            }
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(max(wait, 0), settings.FEEDBACK_WAIT_MAX)
+        while session.status == "evaluating":
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await db.commit()  # не держим соединение во время ожидания
+            await self.queue.wait(session_id, timeout=min(remaining, settings.FEEDBACK_POLL_INTERVAL))
+            await db.refresh(session, ["status", "feedback"])
+
+        if session.status == "evaluating":
+            return {"session_id": session_id, "status": "evaluating", "feedback": None}
+
+        return {
+            "session_id": session_id,
+            "status": session.status,
+            "feedback": session.feedback,
+            "position": session.position,
+            "total_questions": len(session.get_questions())
+        }
+
+    async def feedback_events(self, db, session_id: str):
+        """Проверяет сессию и возвращает асинхронный итератор событий (event, data) фидбэка"""
+        session = await get_session(db, session_id, questions=False, answers=False)
+        if not session:
+            archived = await self._archived(db, session_id)
+
+            async def archived_events():
+                yield "chunk", {"text": archived["feedback"] or ""}
+                yield "done", {"status": archived["status"]}
+
+            return archived_events()
+        if session.status == "active":
+            raise InterviewConflict("Собеседование еще не завершено")
+
+        stream = self.queue.stream(session_id) if session.status == "evaluating" else None
+        status = session.status
+        feedback = session.feedback
+        await db.commit()
+
+        async def events():
+            if stream is not None:
+                async for chunk in stream.subscribe():
+                    yield "chunk", {"text": chunk}
+                if stream.status == "completed":
+                    yield "done", {"status": stream.status}
+                    return
+                if stream.chunks:
+                    # Фидбэк отдан, но не сохранен - повтор будет не раньше истечения захвата,
+                    # клиент отбрасывает полученные части и ждет результат через long-poll
+                    yield "pending", {"status": "evaluating"}
+                    return
+
+            # Результат уже сохранен или оценка идет в другом процессе - ждем его в БД
+            nonlocal status, feedback
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.FEEDBACK_WAIT_MAX
+            while status == "evaluating" and loop.time() < deadline:
+                await self.queue.wait(session_id, timeout=settings.FEEDBACK_POLL_INTERVAL)
+                async with AsyncSessionLocal() as poll_db:
+                    polled = await get_session(poll_db, session_id, questions=False, answers=False)
+                    if polled is not None:
+                        status, feedback = polled.status, polled.feedback
+                        continue
+                    # Пока ждали, сессию перенесли в архив или удалили
+                    try:
+                        archived = await self._archived(poll_db, session_id)
+                    except SessionNotFound:
+                        break
+                    status, feedback = archived["status"], archived["feedback"]
+
+            if status == "evaluating":
+                yield "pending", {"status": status}
+            else:
+                yield "chunk", {"text": feedback or ""}
+                yield "done", {"status": status}
+
+        return events()
+
+    async def history(self, db, user_id: str, limit: int = 20, before: datetime = None, detail: bool = False,
+                      before_id: str = None) -> dict:
+        """Страница истории; курсор следующей - next_before и next_before_id (created_at и session_id последней сессии)"""
+        sessions = await get_user_sessions(db, user_id, limit=limit, before=before, detail=detail, before_id=before_id)
+
+        result = []
+        for session in sessions:
+            item = {
+                "session_id": session.session_id,
+                "position": session.position,
+                "current_question": session.current_question,
+                "status": session.status,
+                "created_at": session.created_at,
+                "completed_at": session.completed_at
+            }
+            if detail:
+                item["questions"] = session.get_questions()
+                item["answers"] = session.get_answers()
+            result.append(item)
+
+        # Старые сессии перенесены в архив: страница собирается из обеих таблиц
+        archived = await get_user_archived_sessions(db, user_id, limit=limit, before=before, detail=detail, before_id=before_id)
+        for row in archived:
+            item = {
+                "session_id": row.session_id,
+                "position": row.position,
+                "current_question": row.current_question,
+                "status": row.status,
+                "created_at": row.created_at,
+                "completed_at": row.completed_at
+            }
+            if detail:
+                data = unpack_session(row)
+                item["questions"] = data["questions"]
+                item["answers"] = data["answers"]
+            result.append(item)
+        if archived:
+            result.sort(key=lambda item: (item["created_at"], item["session_id"]), reverse=True)
+            result = result[:limit]
+
+        # Курсор следующей страницы
+        last = result[-1] if len(result) == limit else None
+        return {
+            "user_id": user_id,
+            "sessions": result,
+            "next_before": last["created_at"] if last else None,
+            "next_before_id": last["session_id"] if last else None,
+        }
+
+    async def evaluations(self, db, session_id: str) -> dict:
+        """Повторные оценки сессии всех версий (python -m app.rescoring)"""
+        rows = await get_evaluations(db, session_id)
+        if not rows and not await get_session(db, session_id, questions=False, answers=False):
+            archived = await self._archived(db, session_id)
+            return {"session_id": session_id, "evaluations": archived["evaluations"]}
+
+        return {
+            "session_id": session_id,
+            "evaluations": [
+                {
+                    "version": row.version,
+                    "model": row.model,
+                    "feedback": row.feedback,
+                    "created_at": row.created_at
+                }
+                for row in rows
+            ]
+        }
+
+
+interview_service = InterviewService()
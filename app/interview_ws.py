@@ -0,0 +1,163 @@
+import logging
+import time
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.database_fixed import AsyncSessionLocal
+from app.interview_service import interview_service, InterviewError
+from app.metrics import WS_CONNECTIONS, WS_MESSAGE_DURATION
+from app.models import InterviewStart, PositionRequest, AnswerRequest
+from app.session_store import ActiveSession
+
+logger = logging.getLogger(__name__)
+
+
+class InterviewSocket:
+    """Собеседование по одному WebSocket-соединению (/ws/interview).
+
+    Сообщения клиента - JSON с полем type, как тела REST-запросов:
+        {"type": "start", "user_id": ...}
+        {"type": "position", "position": ...}
+        {"type": "answer", "answer": ..., "question_index": ...}
+    Ответы - те же словари, что у REST, с type: started, question, complete
+    и error (status и detail как у HTTP-ошибки). После complete по тому же
+    соединению приходит фидбэк: события chunk, done или pending, как в SSE,
+    либо error, если фидбэк получить не удалось.
+
+    Сессия после start или первого сообщения с session_id привязывается к
+    соединению: вопросы и номер текущего вопроса хранятся здесь, поэтому
+    шаг - это условный UPDATE ответа без чтения сессии из БД. После ошибки
+    сценария (например, ответ на этот вопрос уже пришел через REST) привязка
+    сбрасывается и следующее сообщение перечитывает сессию. Соединение с БД
+    берется только на время обработки одного сообщения.
+    """
+
+    def __init__(self, websocket: WebSocket, service=interview_service):
+        self.websocket = websocket
+        self.service = service
+        self.session_id = None
+        self.session = None  # ActiveSession или None - читать сессию из БД
+
+    async def send(self, kind: str, data: dict):
+        await self.websocket.send_text(orjson.dumps({"type": kind, **data}).decode("utf-8"))
+
+    async def run(self):
+        await self.websocket.accept()
+        WS_CONNECTIONS.inc()
+        try:
+            while True:
+                await self.handle(await self.websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            WS_CONNECTIONS.dec()
+
+    async def handle(self, text: str):
+        started = time.perf_counter()
+        kind = "invalid"
+        try:
+            message = orjson.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError("ожидается JSON-объект")
+            handler = self._handlers().get(message.pop("type", None))
+            if handler is None:
+                raise ValueError("type должен быть start, position или answer")
+            kind = handler.__name__
+            complete = await handler(message)
+            self._observe(kind, 200, started)
+            if complete:
+                # Фидбэк - отдельной записью метрики: длительность ответа не включает генерацию
+                started, kind = time.perf_counter(), "stream_feedback"
+                await self.stream_feedback()
+                self._observe(kind, 200, started)
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            self._observe(kind, await self._send_error(e), started)
+
+    async def _send_error(self, error: Exception) -> int:
+        """Ошибка сообщением error (страница переходит на REST или long-poll); HTTP-код ошибки"""
+        if isinstance(error, InterviewError):
+            status, detail = error.status_code, error.detail
+        elif isinstance(error, (ValueError, TypeError, ValidationError)):
+            status, detail = 422, str(error)
+        else:
+            status, detail = 500, "Внутренняя ошибка"
+            logger.exception("Ошибка обработки сообщения WebSocket", extra={"session_id": self.session_id})
+        if status != 422:
+            # После ошибки сценария или БД привязанное состояние могло устареть
+            self.session = None
+        await self.send("error", {"status": status, "detail": detail})
+        return status
+
+    @staticmethod
+    def _observe(kind: str, status: int, started: float):
+        WS_MESSAGE_DURATION.labels(kind, str(status)).observe(time.perf_counter() - started)
+
+    def _handlers(self) -> dict:
+        return {"start": self.start, "position": self.position, "answer": self.answer}
+
+    def _bind(self, session_id):
+        """Сообщение для другой сессии отвязывает текущую"""
+        if session_id and session_id != self.session_id:
+            self.session_id, self.session = session_id, None
+        if not self.session_id:
+            raise ValueError("сессия не начата: сначала отправьте start")
+
+    async def _load(self, db):
+        """Привязка сессии к соединению: одно чтение из БД после start с другого канала или ошибки"""
+        if self.service.store.enabled:
+            # SESSION_STORE=memory: сессия и так в памяти, а хранилище знает о закрытых в обход него
+            return await self.service.store.get(db, self.session_id)
+        if self.session is None:
+            session = await self.service.store.get(db, self.session_id)
+            if session is not None and not isinstance(session, ActiveSession):
+                session = ActiveSession.from_db(session)
+            self.session = session
+        return self.session
+
+    async def start(self, message: dict) -> bool:
+        data = InterviewStart(**{**message, "start": True})
+        async with AsyncSessionLocal() as db:
+            result = await self.service.start(db, data.user_id, data.platform)
+        self.session_id = result["session_id"]
+        self.session = ActiveSession(self.session_id, data.user_id, "", [], [], 0, "active")
+        await self.send("started", result)
+        return False
+
+    async def position(self, message: dict) -> bool:
+        self._bind(message.pop("session_id", None))
+        data = PositionRequest(session_id=self.session_id, **message)
+        async with AsyncSessionLocal() as db:
+            session = await self._load(db)
+            result = await self.service.set_position(db, self.session_id, data.position, data.user_id, session=session)
+        await self.send("question", result)
+        return False
+
+    async def answer(self, message: dict) -> bool:
+        self._bind(message.pop("session_id", None))
+        data = AnswerRequest(session_id=self.session_id, **message)
+        async with AsyncSessionLocal() as db:
+            session = await self._load(db)
+            result = await self.service.answer(
+                db, self.session_id, data.answer, question_index=data.question_index,
+                idempotency_key=message.get("idempotency_key"), session=session
+            )
+        if result["interview_complete"]:
+            await self.send("complete", result)
+            return True
+        await self.send("question", result)
+        return False
+
+    async def stream_feedback(self):
+        """Фидбэк по частям в то же соединение (события как у /feedback/stream)"""
+        async with AsyncSessionLocal() as db:
+            events = await self.service.feedback_events(db, self.session_id)
+        async for event, data in events:
+            await self.send(event, data)
+
+
+async def serve_interview(websocket: WebSocket):
+    await InterviewSocket(websocket).run()
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонён: предохранитель разомкнут"""
+
+
+class RateLimitTimeout(Exception):
+    """Не удалось получить токен rate limiter за отведённое время"""
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов в один вызов"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного из ожидающих не отменяет общий вызов
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+class TokenBucket:
+    """Асинхронный token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, timeout: float = None):
+        """Дождаться токена; RateLimitTimeout, если его не будет за timeout секунд"""
+        if self.rate <= 0:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Ждем без блокировки: каждый проверяет свой срок и после pause() пересчитывает задержку
+        while True:
+            delay = self.try_acquire()
+            if delay == 0:
+                return
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise RateLimitTimeout(f"rate limit: нет свободного токена за {timeout}с")
+            await asyncio.sleep(delay)
+
+    def try_acquire(self) -> float:
+        """Взять токен без ожидания: 0, если токен взят, иначе через сколько секунд он появится"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд (например, по retry_after от API)"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class CircuitBreaker:
+    """Предохранитель: после threshold ошибок подряд размыкается на reset_timeout секунд"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Можно ли делать вызов; в half-open пропускается один пробный"""
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            # пробный вызов, который завис или был отменён, не блокирует предохранитель навсегда
+            if state == self.HALF_OPEN and (self._probe_at is None or now - self._probe_at >= self.reset_timeout):
+                self._probe_at = now
+                return True
+            return False
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError("Gemini временно недоступен, предохранитель разомкнут")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_at = None
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures}
@@ -1,210 +1,243 @@
-from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-import uuid
-from datetime import datetime
-
-from app.models import InterviewStart, PositionRequest, AnswerRequest, InterviewSession
-from app.services import gemini_service
-from app.config import settings
-from app.database_fixed import get_db, init_db, InterviewSessionDB
-from app.crud_fixed import create_session, get_session, update_session_answers, update_session_complete, update_session_questions
-
-app = FastAPI(
-    title="Нейро-HR AI Interview System",
-    description="AI-powered technical interviews using Gemini",
-    version="3.0.0"
-)
-
-# Инициализация БД при запуске
-@app.on_event("startup")
-def startup_event():
-    init_db()
-    print("✅ Database initialized")
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Templates
-templates = Jinja2Templates(directory="app/templates")
-
-@app.get("/")
-async def root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
-
-@app.post("/api/start_interview")
-async def start_interview(data: InterviewStart, db: Session = Depends(get_db)):
-    if not data.start:
-        raise HTTPException(status_code=400, detail="Interview not started")
-    
-    session_id = str(uuid.uuid4())
-    session_data = InterviewSession(
-        session_id=session_id,
-        user_id=data.user_id,
-        platform=data.platform,
-        position="",
-        questions=[],
-        current_question=0,
-        answers=[],
-        status="active",
-        created_at=datetime.now()
-    )
-    
-    create_session(db, session_data)
-    
-    return {
-        "session_id": session_id,
-        "message": "🎯 Добро пожаловать в Нейро-HR! Я помогу провести техническое собеседование. На какую позицию вы проводите собеседование?"
-    }
-
-@app.post("/api/set_position")
-async def set_position(data: PositionRequest, db: Session = Depends(get_db)):
-    db_session = get_session(db, data.session_id)
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Сессия не найдена")
-    
-    print(f"🔄 Установка позиции: {data.position}")
-    
-    # Обновляем user_id если пришел из телеграма
-    if data.user_id and not db_session.user_id:
-        db_session.user_id = data.user_id
-        db.commit()
-    
-    questions = gemini_service.generate_questions(data.position)
-    print(f"📋 Сгенерировано вопросов: {len(questions)}")
-    
-    update_session_questions(db, data.session_id, questions, data.position)
-    
-    return {
-        "question": questions[0],
-        "current_question": 1,
-        "total_questions": len(questions),
-        "position": data.position
-    }
-
-@app.post("/api/answer_question")
-async def answer_question(data: AnswerRequest, db: Session = Depends(get_db)):
-    db_session = get_session(db, data.session_id)
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Сессия не найдена")
-    
-    current_questions = db_session.get_questions()
-    current_answers = db_session.get_answers()
-    current_question_index = db_session.current_question
-    
-    print(f"📝 Получен ответ для вопроса {current_question_index + 1}")
-    print(f"📊 Текущие ответы до добавления: {len(current_answers)}")
-    
-    # Добавляем новый ответ
-    current_answers.append(data.answer)
-    new_question_index = current_question_index + 1
-    
-    print(f"📊 Ответы после добавления: {len(current_answers)}")
-    
-    # Проверяем завершение собеседования
-    if new_question_index >= len(current_questions):
-        print(f"🎯 Собеседование завершено! Вопросов: {len(current_questions)}, Ответов: {len(current_answers)}")
-        
-        # Все вопросы отвечены - генерируем фидбэк
-        feedback = gemini_service.generate_feedback(
-            db_session.position,
-            current_questions,
-            current_answers
-        )
-        
-        update_session_complete(db, data.session_id, current_answers, feedback)
-        
-        return {
-            "interview_complete": True,
-            "feedback": feedback,
-            "total_questions": len(current_questions),
-            "position": db_session.position
-        }
-    else:
-        # Продолжаем собеседование - сохраняем ответы
-        update_session_answers(db, data.session_id, current_answers, new_question_index)
-        
-        next_question = current_questions[new_question_index]
-        print(f"➡️ Следующий вопрос: {new_question_index + 1}")
-        
-        return {
-            "question": next_question,
-            "current_question": new_question_index + 1,
-            "total_questions": len(current_questions),
-            "interview_complete": False
-        }
-
-@app.get("/api/session/{session_id}")
-async def get_session_endpoint(session_id: str, db: Session = Depends(get_db)):
-    session = get_session(db, session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Сессия не найдена")
-    
-    # Отладочная информация
-    questions = session.get_questions()
-    answers = session.get_answers()
-    
-    print(f"🔍 Сессия {session_id}:")
-    print(f"   Вопросов: {len(questions)}")
-    print(f"   Ответов: {len(answers)}")
-    print(f"   Текущий вопрос: {session.current_question}")
-    print(f"   Ответы: {answers}")
-    
-    return {
-        "session_id": session.session_id,
-        "position": session.position,
-        "questions": questions,
-        "answers": answers,
-        "current_question": session.current_question,
-        "status": session.status
-    }
-
-@app.get("/api/user/{user_id}/sessions")
-async def get_user_sessions(user_id: str, db: Session = Depends(get_db)):
-    from app.crud_fixed import get_user_sessions
-    sessions = get_user_sessions(db, user_id)
-    
-    result = []
-    for session in sessions:
-        result.append({
-            "session_id": session.session_id,
-            "position": session.position,
-            "questions": session.get_questions(),
-            "answers": session.get_answers(),
-            "current_question": session.current_question,
-            "status": session.status,
-            "created_at": session.created_at
-        })
-    
-    return {"user_id": user_id, "sessions": result}
-
-@app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
-    try:
-        # Проверяем подключение к БД
-        db.execute("SELECT 1")
-        db_status = "healthy"
-    except Exception as e:
-        print(f"Database health check error: {e}")
-        db_status = "unhealthy"
-    
-    return {
-        "status": "healthy", 
-        "model": settings.GEMINI_MODEL,
-        "database": db_status
-    }
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG
+from fastapi import FastAPI, HTTPException, Request, Depends, Query, Header, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+import secrets
+from datetime import datetime
+from typing import Any, Optional
+import orjson
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+from app.models import InterviewStart, PositionRequest, AnswerRequest
+from app.services import gemini_service
+from app.cache import question_cache
+from app.config import settings
+from app.database_fixed import get_async_db, init_db, async_engine
+from app.crud_fixed import count_sessions_by_status
+from app.session_store import session_store
+from app.idempotency import answer_responses
+from app.answer_scoring import answer_scorer
+from app.feedback_queue import feedback_queue
+from app.maintenance import session_maintenance
+from app.question_bank import question_bank
+from app.export import stream_export, MEDIA_TYPES
+from app.interview_service import interview_service, InterviewError
+from app.interview_ws import serve_interview
+from app.logging_config import setup_logging
+from app.metrics import MetricsMiddleware, INTERVIEW_SESSIONS, stats_collector
+
+setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Состояние компонентов в /metrics
+stats_collector.add("question_cache", question_cache.stats)
+stats_collector.add("gemini_breaker", gemini_service.breaker.stats)
+stats_collector.add("gemini_single_flight", lambda: {
+    "in_flight": len(gemini_service.single_flight),
+    "coalesced": gemini_service.single_flight.coalesced
+})
+stats_collector.add("session_store", session_store.stats)
+stats_collector.add("feedback_queue", feedback_queue.stats)
+stats_collector.add("answer_responses", answer_responses.stats)
+stats_collector.add("answer_scoring", answer_scorer.stats)
+stats_collector.add("session_maintenance", session_maintenance.stats)
+stats_collector.add("question_bank", question_bank.stats)
+
+class ORJSONResponse(JSONResponse):
+    """JSON-ответ через orjson: на длинных русских ответах и фидбэке в разы быстрее json.dumps.
+
+    fastapi.responses.ORJSONResponse в текущей версии FastAPI объявлен устаревшим.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+app = FastAPI(
+    title="Нейро-HR AI Interview System",
+    description="AI-powered technical interviews using Gemini",
+    version="3.0.0",
+    default_response_class=ORJSONResponse
+)
+
+# Инициализация БД при запуске
+@app.on_event("startup")
+async def startup_event():
+    init_db()
+    logger.info("Database initialized")
+    await interview_service.startup()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await interview_service.shutdown()
+    await async_engine.dispose()
+
+# CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(MetricsMiddleware)
+
+# Templates
+templates = Jinja2Templates(directory="app/templates")
+
+@app.get("/")
+async def root(request: Request):
+    return templates.TemplateResponse("index.html", {"request": request})
+
+@app.exception_handler(InterviewError)
+async def interview_error_handler(request: Request, exc: InterviewError):
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+@app.post("/api/start_interview")
+async def start_interview(data: InterviewStart, db: AsyncSession = Depends(get_async_db)):
+    if not data.start:
+        raise HTTPException(status_code=400, detail="Interview not started")
+    return await interview_service.start(db, data.user_id, data.platform)
+
+@app.post("/api/set_position")
+async def set_position(data: PositionRequest, db: AsyncSession = Depends(get_async_db)):
+    return await interview_service.set_position(db, data.session_id, data.position, data.user_id)
+
+@app.post("/api/answer_question")
+async def answer_question(
+    data: AnswerRequest,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ответ на вопрос; повтор с тем же Idempotency-Key или question_index вернет первый результат"""
+    return await interview_service.answer(
+        db, data.session_id, data.answer,
+        question_index=data.question_index, idempotency_key=idempotency_key
+    )
+
+@app.get("/api/session/{session_id}")
+async def get_session_endpoint(session_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await interview_service.get_session(db, session_id)
+
+@app.get("/api/session/{session_id}/feedback")
+async def get_feedback(session_id: str, wait: float = 0, db: AsyncSession = Depends(get_async_db)):
+    """Результат фоновой оценки; с ?wait=N ждёт до N секунд (long-poll)"""
+    result = await interview_service.get_feedback(db, session_id, wait)
+    if result["status"] == "evaluating":
+        return ORJSONResponse(status_code=202, content=result)
+    return result
+
+@app.get("/api/session/{session_id}/evaluations")
+async def get_evaluations(session_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Повторные оценки собеседования разных версий рубрики и модели"""
+    return await interview_service.evaluations(db, session_id)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Доступ к /api/admin/* по ADMIN_TOKEN; без настроенного токена эндпоинты закрыты"""
+    if not settings.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+@app.get("/api/admin/export", dependencies=[Depends(require_admin)])
+async def export_sessions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    position: Optional[str] = None,
+    status: Optional[str] = None,
+    archive: bool = True,
+    batch_size: int = Query(500, ge=1, le=5000)
+):
+    """Выгрузка собеседований потоком; фильтры по дате создания, позиции и статусам (через запятую)"""
+    rows = stream_export(
+        format,
+        batch_size=batch_size,
+        include_archive=archive,
+        since=since,
+        until=until,
+        position=position,
+        statuses=status.split(",") if status else None
+    )
+    return StreamingResponse(
+        rows,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="interviews.{format}"'}
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode('utf-8')}\n\n"
+
+@app.get("/api/session/{session_id}/feedback/stream")
+async def stream_feedback(session_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Фидбэк через Server-Sent Events: части текста по мере генерации"""
+    events = await interview_service.feedback_events(db, session_id)
+    
+    async def body():
+        async for event, data in events:
+            yield _sse(event, data)
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/interview")
+async def interview_websocket(websocket: WebSocket):
+    """Собеседование через одно соединение: вопросы и фидбэк по частям без отдельных HTTP-запросов"""
+    await serve_interview(websocket)
+
+@app.get("/api/user/{user_id}/sessions")
+async def get_user_sessions(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    detail: str = Query("summary", pattern="^(summary|full)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """История собеседований: ?limit=&before=&before_id= для пагинации, ?detail=full - с вопросами и ответами"""
+    return await interview_service.history(
+        db, user_id, limit=limit, before=before, detail=detail == "full", before_id=before_id
+    )
+
+@app.get("/health")
+async def health_check(db: AsyncSession = Depends(get_async_db)):
+    try:
+        # Проверяем подключение к БД
+        await db.execute(text("SELECT 1"))
+        db_status = "healthy"
+    except Exception as e:
+        logger.error("Database health check failed", extra={"error": repr(e)})
+        db_status = "unhealthy"
+    
+    return {
+        "status": "healthy", 
+        "model": settings.GEMINI_MODEL,
+        "database": db_status,
+        "question_cache": question_cache.stats(),
+        "gemini_breaker": gemini_service.breaker.stats(),
+        "session_store": session_store.stats()
+    }
+
+# Статусы, которые уже были в метрике: пропавший из БД статус (последнюю истекшую
+# сессию перенесли в архив) показывается нулем, а не последним значением
+_session_statuses = {"active", "evaluating", "completed", "expired"}
+
+@app.get("/metrics")
+async def metrics(db: AsyncSession = Depends(get_async_db)):
+    """Метрики в формате Prometheus"""
+    counts = await count_sessions_by_status(db)
+    _session_statuses.update(counts)
+    for status in _session_statuses:
+        INTERVIEW_SESSIONS.labels(status).set(counts.get(status, 0))
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        reload=settings.DEBUG
     )
\ No newline at end of file
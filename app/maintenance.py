@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.database_fixed import AsyncSessionLocal
+from app.crud_fixed import expire_idle_sessions, get_sessions_to_archive, move_to_archive
+from app.session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def pack_session(session, evaluations: list) -> dict:
+    """Содержимое сессии для архива (колонка payload сама кодирует и сжимает его)"""
+    data = {
+        "questions": session.get_questions(),
+        "answers": [
+            {"text": row.text, "score": row.score, "notes": row.notes}
+            for row in session.answer_rows
+        ],
+        "feedback": session.feedback,
+        "evaluations": [
+            {"version": row.version, "model": row.model, "feedback": row.feedback, "created_at": _isoformat(row.created_at)}
+            for row in evaluations
+        ],
+    }
+    return data
+
+
+def unpack_session(row) -> dict:
+    """Архивная сессия в том же виде, что и сессия из рабочей таблицы"""
+    data = row.payload
+    return {
+        "session_id": row.session_id,
+        "user_id": row.user_id,
+        "platform": row.platform,
+        "position": row.position,
+        "current_question": row.current_question,
+        "status": row.status,
+        "created_at": row.created_at,
+        "completed_at": row.completed_at,
+        "questions": data["questions"],
+        "answers": [answer["text"] for answer in data["answers"]],
+        "scores": [answer["score"] for answer in data["answers"]],
+        "feedback": data["feedback"],
+        "evaluations": data["evaluations"],
+    }
+
+
+def archive_row(session, evaluations: list) -> dict:
+    return {
+        "session_id": session.session_id,
+        "user_id": session.user_id,
+        "platform": session.platform,
+        "position": session.position,
+        "current_question": session.current_question,
+        "status": session.status,
+        "created_at": session.created_at,
+        "completed_at": session.completed_at,
+        "archived_at": datetime.utcnow(),
+        "payload": pack_session(session, evaluations),
+    }
+
+
+class SessionMaintenance:
+    """Фоновое обслуживание таблицы сессий.
+
+    Раз в interval секунд активные сессии без изменений дольше idle_ttl
+    переводятся в expired, а завершенные и истекшие старше archive_after_days
+    переносятся в interview_sessions_archive со сжатым содержимым. Рабочая
+    таблица и ее индексы остаются небольшими; чтение сессии по session_id
+    и история пользователя смотрят в архив, если сессии нет в рабочей таблице.
+    Работа идет пачками по batch_size сессий, каждая - отдельной транзакцией.
+    """
+
+    def __init__(self, idle_ttl: float, archive_after_days: float, interval: float, batch_size: int, store=session_store):
+        self.idle_ttl = idle_ttl
+        self.archive_after_days = archive_after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.store = store
+        self._task = None
+        self.runs = 0
+        self.errors = 0
+        self.expired = 0
+        self.archived = 0
+        self.last_run_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and (self.idle_ttl > 0 or self.archive_after_days > 0)
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                self.errors += 1
+                logger.exception("Ошибка обслуживания таблицы сессий")
+
+    async def run_once(self) -> dict:
+        """Один проход: истечение брошенных сессий, затем архивирование старых"""
+        started = time.monotonic()
+        expired = await self.expire() if self.idle_ttl > 0 else 0
+        archived = await self.archive() if self.archive_after_days > 0 else 0
+        self.runs += 1
+        self.last_run_seconds = time.monotonic() - started
+        if expired or archived:
+            logger.info("Обслуживание таблицы сессий", extra={
+                "expired": expired, "archived": archived, "seconds": round(self.last_run_seconds, 2)
+            })
+        return {"expired": expired, "archived": archived}
+
+    async def expire(self) -> int:
+        idle_before = datetime.utcnow() - timedelta(seconds=self.idle_ttl)
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                session_ids = await expire_idle_sessions(db, idle_before, self.batch_size)
+            # Хранилище в памяти не должно принимать ответы для закрытых в БД сессий
+            self.store.forget(session_ids)
+            total += len(session_ids)
+            self.expired += len(session_ids)
+            if len(session_ids) < self.batch_size:
+                return total
+
+    async def archive(self) -> int:
+        before = datetime.utcnow() - timedelta(days=self.archive_after_days)
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                sessions, evaluations = await get_sessions_to_archive(db, before, self.batch_size)
+                if not sessions:
+                    return total
+                rows = [archive_row(session, evaluations.get(session.session_id, [])) for session in sessions]
+                if not await move_to_archive(db, rows, [session.session_id for session in sessions]):
+                    logger.warning("Сессии архивирует другой процесс, проход прерван")
+                    return total
+            total += len(rows)
+            self.archived += len(rows)
+            if len(rows) < self.batch_size:
+                return total
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "expired": self.expired,
+            "archived": self.archived,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+        }
+
+
+session_maintenance = SessionMaintenance(
+    idle_ttl=settings.SESSION_IDLE_TTL,
+    archive_after_days=settings.ARCHIVE_AFTER_DAYS,
+    interval=settings.MAINTENANCE_INTERVAL,
+    batch_size=settings.MAINTENANCE_BATCH_SIZE,
+)
@@ -0,0 +1,176 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+# Границы бакетов: HTTP и БД - миллисекунды..секунды, Gemini - до минуты
+_HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+_GEMINI_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 45, 60, 90)
+_TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "neurohr_http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route", "status"], buckets=_HTTP_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "neurohr_http_requests_in_progress", "HTTP-запросы в обработке (маршрут до обработки неизвестен)", ["method"]
+)
+WS_CONNECTIONS = Gauge(
+    "neurohr_ws_connections", "Открытые WebSocket-соединения собеседования"
+)
+WS_MESSAGE_DURATION = Histogram(
+    "neurohr_ws_message_duration_seconds", "Время обработки сообщения WebSocket (без потока фидбэка)",
+    ["type", "status"], buckets=_HTTP_BUCKETS
+)
+GEMINI_CALL_DURATION = Histogram(
+    "neurohr_gemini_call_duration_seconds", "Длительность вызова Gemini (для потока - до последней части)",
+    ["operation", "outcome"], buckets=_GEMINI_BUCKETS
+)
+GEMINI_ERRORS = Counter(
+    "neurohr_gemini_errors_total", "Ошибки вызовов Gemini", ["operation", "error"]
+)
+GEMINI_FALLBACKS = Counter(
+    "neurohr_gemini_fallbacks_total", "Ответы без модели: запасные вопросы или текст ошибки фидбэка", ["operation"]
+)
+GEMINI_IN_FLIGHT = Gauge(
+    "neurohr_gemini_calls_in_flight", "Вызовы Gemini в процессе", ["operation"]
+)
+GEMINI_TOKENS = Histogram(
+    "neurohr_gemini_tokens", "Токены на вызов Gemini по usage_metadata: input, output, cached (часть input из кэша)",
+    ["operation", "kind"], buckets=_TOKEN_BUCKETS
+)
+PROMPT_TOKENS_SAVED = Counter(
+    "neurohr_prompt_tokens_saved_total", "Токены, сэкономленные сжатием и обрезкой ответов в промптах (оценка)", ["operation"]
+)
+PROMPT_ANSWERS_TRUNCATED = Counter(
+    "neurohr_prompt_answers_truncated_total", "Ответы, обрезанные до бюджета токенов", ["operation"]
+)
+DB_QUERY_DURATION = Histogram(
+    "neurohr_db_query_duration_seconds", "Время выполнения SQL-запроса", ["statement"], buckets=_DB_BUCKETS
+)
+DB_QUERY_ERRORS = Counter(
+    "neurohr_db_query_errors_total", "Ошибки SQL-запросов", ["statement"]
+)
+INTERVIEW_SESSIONS = Gauge(
+    "neurohr_interview_sessions", "Сессии собеседований в БД по статусам", ["status"]
+)
+
+
+@contextmanager
+def track_gemini(operation: str):
+    """Замер вызова Gemini: длительность, ошибки и число вызовов в процессе"""
+    in_flight = GEMINI_IN_FLIGHT.labels(operation)
+    in_flight.inc()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except Exception as e:
+        GEMINI_ERRORS.labels(operation, type(e).__name__).inc()
+        raise
+    except BaseException:
+        outcome = "cancelled"
+        raise
+    finally:
+        in_flight.dec()
+        GEMINI_CALL_DURATION.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+def record_usage(operation: str, usage):
+    """Токены вызова из usage_metadata ответа Gemini (у потока - из последней части)"""
+    if usage is None:
+        return
+    for kind, field in (("input", "prompt_token_count"), ("output", "candidates_token_count"),
+                        ("cached", "cached_content_token_count")):
+        value = getattr(usage, field, None)
+        if value is not None:
+            GEMINI_TOKENS.labels(operation, kind).observe(value)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запросов по шаблону маршрута (/api/session/{session_id}), а не по URL"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(scope["method"])
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+
+
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    return kind if kind in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA") else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    DB_QUERY_DURATION.labels(_statement_kind(statement)).observe(time.perf_counter() - started)
+
+
+def _handle_error(context):
+    stack = context.connection.info.get("query_started") if context.connection is not None else None
+    if stack:
+        stack.pop()
+    DB_QUERY_ERRORS.labels(_statement_kind(context.statement or "")).inc()
+
+
+def instrument_engine(engine):
+    """Замер SQL-запросов через события SQLAlchemy (для async-движка - его sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class StatsCollector:
+    """Экспорт словарей stats() компонентов (кэш, хранилище сессий, предохранитель) как gauge"""
+
+    def __init__(self):
+        self._sources = {}
+
+    def add(self, name: str, stats):
+        self._sources[name] = stats
+
+    def collect(self):
+        for name, stats in self._sources.items():
+            for key, value in stats().items():
+                metric = f"neurohr_{name}_{key}"
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(metric, f"{name}.stats()['{key}']", value=value)
+                elif isinstance(value, str):
+                    family = GaugeMetricFamily(metric, f"{name}.stats()['{key}']", labels=[key])
+                    family.add_metric([value], 1)
+                    yield family
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
@@ -1,34 +1,36 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-from datetime import datetime
-
-class InterviewStart(BaseModel):
-    start: bool
-    user_id: Optional[str] = None
-    platform: Optional[str] = "web"
-
-class PositionRequest(BaseModel):
-    session_id: str
-    position: str
-    user_id: Optional[str] = None
-
-class AnswerRequest(BaseModel):
-    session_id: str
-    answer: str
-    user_id: Optional[str] = None
-
-class InterviewSession(BaseModel):
-    session_id: str
-    user_id: Optional[str] = None
-    platform: str = "web"
-    position: str
-    questions: List[str]
-    current_question: int
-    answers: List[str]
-    status: str = "active"
-    feedback: Optional[str] = None
-    created_at: datetime
-    completed_at: Optional[datetime] = None
-
-    class Config:
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional
+from datetime import datetime
+
+class InterviewStart(BaseModel):
+    start: bool
+    user_id: Optional[str] = None
+    platform: Optional[str] = "web"
+
+class PositionRequest(BaseModel):
+    session_id: str
+    position: str
+    user_id: Optional[str] = None
+
+class AnswerRequest(BaseModel):
+    session_id: str
+    answer: str
+    user_id: Optional[str] = None
+    # Номер вопроса, на который дан ответ (с 0): повтор запроса вернет тот же результат
+    question_index: Optional[int] = Field(None, ge=0)
+
+class InterviewSession(BaseModel):
+    session_id: str
+    user_id: Optional[str] = None
+    platform: str = "web"
+    position: str
+    questions: List[str]
+    current_question: int
+    answers: List[str]
+    status: str = "active"
+    feedback: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+
+    class Config:
         from_attributes = True
\ No newline at end of file
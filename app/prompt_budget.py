@@ -0,0 +1,74 @@
+import re
+
+# Грубая локальная оценка числа токенов без запроса к API: латиница и код -
+# около 4 символов на токен, кириллица - около 2.5
+_ASCII_CHARS_PER_TOKEN = 4.0
+_OTHER_CHARS_PER_TOKEN = 2.5
+
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+_INNER_SPACE_RE = re.compile(r"(?<=\S)[ \t]{2,}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_INDENT_RE = re.compile(r"^[ \t]+", re.MULTILINE)
+
+TRUNCATION_MARK = "\n[... пропущено около {tokens} токенов ...]\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов текста (без count_tokens: он стоит отдельного запроса к API)"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    other_chars = len(text) - ascii_chars
+    return int(ascii_chars / _ASCII_CHARS_PER_TOKEN + other_chars / _OTHER_CHARS_PER_TOKEN) + 1
+
+
+def _compact_indent(match) -> str:
+    # Каждый уровень отступа (таб или 4 пробела) - один пробел: структура кода сохраняется
+    indent = match.group(0).replace("\t", "    ")
+    return " " * (len(indent) // 4 + (1 if len(indent) % 4 else 0))
+
+
+def compact_text(text: str) -> str:
+    """Сжатие пробелов без потери смысла: хвостовые пробелы, выравнивание, отступы, пустые строки"""
+    text = text.replace("\r\n", "\n").strip()
+    text = _TRAILING_SPACE_RE.sub("", text)
+    text = _INNER_SPACE_RE.sub(" ", text)
+    text = _INDENT_RE.sub(_compact_indent, text)
+    return _BLANK_LINES_RE.sub("\n\n", text)
+
+
+def _cut(text: str, chars: int, from_end: bool = False) -> str:
+    """Не больше chars символов с начала (или с конца) текста, по границе строки, если она недалеко"""
+    if chars <= 0:
+        return ""
+    if from_end:
+        part = text[-chars:]
+        newline = part.find("\n")
+        return part[newline + 1:] if 0 <= newline < len(part) // 4 else part
+    part = text[:chars]
+    newline = part.rfind("\n")
+    return part[:newline] if newline > len(part) * 3 // 4 else part
+
+
+def fit_to_budget(text: str, budget: int) -> tuple:
+    """Ответ для промпта не длиннее budget токенов: (текст, сэкономлено токенов, был ли обрезан).
+
+    Сначала сжимаются пробелы и отступы; если этого мало, остаются начало
+    и конец ответа (2/3 и 1/3 бюджета) с пометкой о пропуске посередине -
+    в начале обычно суть ответа, в конце вывод или итог кода.
+    """
+    original = estimate_tokens(text)
+    compacted = compact_text(text)
+    tokens = estimate_tokens(compacted)
+    if budget <= 0 or tokens <= budget:
+        return compacted, original - tokens, False
+
+    # Символов на токен в этом тексте - чтобы перевести бюджет в длину
+    chars_per_token = len(compacted) / tokens
+    mark_tokens = estimate_tokens(TRUNCATION_MARK.format(tokens=tokens))
+    keep = max(budget - mark_tokens, 0)
+    head = _cut(compacted, int(keep * 2 / 3 * chars_per_token))
+    tail = _cut(compacted, int(keep / 3 * chars_per_token), from_end=True)
+    skipped = tokens - estimate_tokens(head) - estimate_tokens(tail)
+    result = head + TRUNCATION_MARK.format(tokens=skipped) + tail
+    return result, original - estimate_tokens(result), True
@@ -0,0 +1,278 @@
+import hashlib
+import logging
+import random
+import re
+import struct
+import time
+import zlib
+from collections import Counter, defaultdict
+
+from app.cache import normalize_position
+from app.config import settings
+from app.crud_fixed import get_bank_positions, get_bank_questions, save_bank_questions
+
+logger = logging.getLogger(__name__)
+
+# Общие слова названий ролей не отличают одну позицию от другой:
+# "Python dev", "Python-разработчик" и "Python Developer" - одна позиция
+_ROLE_WORD_RE = re.compile(
+    r"^(dev|developer|engineer|programmer|specialist|разработчи\w*|программист\w*|инженер\w*|специалист\w*)$"
+)
+
+# Параметры MinHash. Подписи хранятся в question_bank.signature:
+# при смене числа перестановок или зерна старые подписи перестают сравниваться
+MINHASH_PERMUTATIONS = 64
+_MINHASH_SEED = 20261018
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(_MINHASH_SEED)
+_MINHASH_COEFFICIENTS = [
+    (_rng.getrandbits(61) | 1, _rng.getrandbits(61)) for _ in range(MINHASH_PERMUTATIONS)
+]
+_SIGNATURE_FORMAT = f"<{MINHASH_PERMUTATIONS}I"
+# Похожесть слов, при которой слово позиции банка считается найденным в запрошенной
+# ("postgres" и "postgresql"); "java" и "javascript", "c" и "cpp" ниже порога
+TERM_SIMILARITY = 0.5
+# Первые буквы слова вместо основы: "тестирование" и "тестировании" совпадают
+STEM_LENGTH = 5
+# Служебные слова и обороты, общие для большинства вопросов собеседования
+_STOP_WORDS = frozenset("""
+    а в во для до же и из или как какие какой каким когда ли между на над не о об от по почему при про
+    с со так такое то у чем что это он она оно они его ее их вы вас вам ваш ваша ваше вашем вашей ваши вашего
+    расскажите опишите объясните приведите назовите опыт опыте работы работе
+    a an and are as at be by do does for how in is of on or the to what when which why with you your
+    describe explain tell
+""".split())
+
+
+def position_terms(position: str) -> list:
+    """Слова позиции без общих слов роли; если остались только они - все слова"""
+    words = normalize_position(position).split()
+    terms = [word for word in words if not _ROLE_WORD_RE.match(word)]
+    return terms or words
+
+
+def word_trigrams(word: str) -> frozenset:
+    """Триграммы слова, как в pg_trgm: слово дополняется двумя пробелами слева и одним справа"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigrams(position: str) -> frozenset:
+    """Триграммы значимых слов позиции"""
+    result = set()
+    for word in position_terms(position):
+        result.update(word_trigrams(word))
+    return frozenset(result)
+
+
+def trigram_similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def fingerprint(question: str) -> str:
+    """Отпечаток нормализованного текста вопроса: точные повторы отсекает уникальный индекс"""
+    return hashlib.sha1(normalize_position(question).encode("utf-8")).hexdigest()[:16]
+
+
+def shingles(question: str) -> set:
+    """Значимые слова вопроса, усеченные до STEM_LENGTH букв.
+
+    Без служебных слов общий оборот ("Расскажите о вашем опыте работы с ...")
+    не делает похожими вопросы о разном, а усечение сглаживает формы слов.
+    """
+    words = normalize_position(question).split()
+    result = {word[:STEM_LENGTH] for word in words if word not in _STOP_WORDS}
+    return result or {word[:STEM_LENGTH] for word in words}
+
+
+def minhash(question: str) -> tuple:
+    """MinHash-подпись вопроса по его шинглам"""
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(question)] or [0]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & 0xFFFFFFFF
+        for a, b in _MINHASH_COEFFICIENTS
+    )
+
+
+def minhash_similarity(a: tuple, b: tuple) -> float:
+    """Оценка сходства Жаккара по двум подписям"""
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_PERMUTATIONS
+
+
+def pack_signature(signature: tuple) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def unpack_signature(data: bytes) -> tuple:
+    return struct.unpack(_SIGNATURE_FORMAT, data)
+
+
+class QuestionBank:
+    """Постоянный банк вопросов с поиском похожих позиций.
+
+    Каждый набор вопросов от Gemini сохраняется в question_bank без
+    почти-дубликатов (MinHash по значимым словам) относительно вопросов
+    похожих позиций. find() ищет позиции банка, похожие на запрошенную по
+    триграммам названия (индекс триграмма -> позиции в памяти процесса), у
+    которых все значимые слова есть и в запрошенной: "Backend developer" не
+    получает вопросы "Backend Python developer". Из вопросов этих позиций
+    собирается набор без дубликатов, начиная с самой похожей позиции.
+    Gemini вызывается только для позиций, у которых в банке еще меньше
+    min_questions вопросов.
+
+    Индекс позиций перечитывается из БД раз в refresh секунд: позиции,
+    добавленные другими процессами, становятся видны с этой задержкой.
+    """
+
+    def __init__(self, enabled: bool, similarity: float, min_questions: int, dedup: float, refresh: float):
+        self.enabled = enabled
+        self.similarity = similarity
+        self.min_questions = min_questions
+        self.dedup = dedup
+        self.refresh = refresh
+        self._counts = {}                  # position_key -> число вопросов
+        self._trigrams = {}                # position_key -> триграммы
+        self._terms = {}                   # position_key -> триграммы каждого значимого слова
+        self._index = defaultdict(set)     # триграмма -> position_key
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.added = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    def _index_position(self, key: str, count: int):
+        if key not in self._trigrams:
+            grams = trigrams(key)
+            self._trigrams[key] = grams
+            self._terms[key] = [word_trigrams(word) for word in position_terms(key)]
+            for gram in grams:
+                self._index[gram].add(key)
+        self._counts[key] = count
+
+    async def _load(self, db):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh:
+            return
+        for key, count in (await get_bank_positions(db)).items():
+            self._index_position(key, count)
+        self._loaded_at = time.monotonic()
+
+    def _covers(self, terms: list, key: str) -> bool:
+        """Каждое значимое слово позиции банка key есть среди слов terms (с точностью до формы)"""
+        return all(
+            any(trigram_similarity(term, other) >= TERM_SIMILARITY for other in terms)
+            for term in self._terms[key]
+        )
+
+    def match(self, position: str) -> list:
+        """Позиции банка с похожестью не ниже порога: [(position_key, похожесть)], самые похожие первыми"""
+        grams = trigrams(position)
+        terms = [word_trigrams(word) for word in position_terms(position)]
+        common = Counter()
+        for gram in grams:
+            common.update(self._index.get(gram, ()))
+        matches = []
+        for key, shared in common.items():
+            similarity = shared / (len(grams) + len(self._trigrams[key]) - shared)
+            if similarity >= self.similarity and self._covers(terms, key):
+                matches.append((key, similarity))
+        matches.sort(key=lambda item: (-item[1], -self._counts.get(item[0], 0)))
+        return matches
+
+    def _is_duplicate(self, signature: tuple, signatures: list) -> bool:
+        return any(minhash_similarity(signature, other) >= self.dedup for other in signatures)
+
+    async def find(self, db, position: str, count: int = 10):
+        """Набор из count вопросов для позиции из банка или None, если похожих вопросов мало"""
+        if not self.enabled:
+            return None
+        try:
+            await self._load(db)
+            matches = self.match(position)
+            if sum(self._counts[key] for key, _ in matches) < self.min_questions:
+                self.misses += 1
+                return None
+            rows = await get_bank_questions(db, [key for key, _ in matches])
+        except Exception as e:
+            self.errors += 1
+            await db.rollback()
+            logger.error("Ошибка чтения банка вопросов", extra={"position": position, "error": repr(e)})
+            return None
+
+        by_position = defaultdict(list)
+        for row in rows:
+            by_position[row.position_key].append(row)
+        picked, signatures = [], []
+        for key, _ in matches:
+            group = by_position.get(key, [])
+            random.shuffle(group)
+            for row in group:
+                signature = unpack_signature(row.signature)
+                if self._is_duplicate(signature, signatures):
+                    continue
+                picked.append(row.question)
+                signatures.append(signature)
+                if len(picked) == count:
+                    self.hits += 1
+                    logger.info("Вопросы из банка", extra={"position": position, "positions": len(matches)})
+                    return picked
+        self.misses += 1
+        return None
+
+    async def add(self, db, position: str, questions: list) -> int:
+        """Сохранить вопросы позиции без почти-дубликатов вопросов похожих позиций; число сохраненных"""
+        key = normalize_position(position)
+        if not self.enabled or not key:
+            return 0
+        try:
+            await self._load(db)
+            matches = self.match(position)
+            existing = await get_bank_questions(db, [key for key, _ in matches]) if matches else []
+            signatures = [unpack_signature(row.signature) for row in existing]
+            rows = []
+            for question in questions:
+                signature = minhash(question)
+                if self._is_duplicate(signature, signatures):
+                    self.duplicates += 1
+                    continue
+                signatures.append(signature)
+                rows.append({
+                    "position": position,
+                    "position_key": key,
+                    "question": question,
+                    "fingerprint": fingerprint(question),
+                    "signature": pack_signature(signature),
+                })
+            saved = await save_bank_questions(db, rows)
+        except Exception as e:
+            self.errors += 1
+            await db.rollback()
+            logger.error("Ошибка записи в банк вопросов", extra={"position": position, "error": repr(e)})
+            return 0
+
+        self._index_position(key, self._counts.get(key, 0) + saved)
+        self.added += saved
+        return saved
+
+    def stats(self) -> dict:
+        return {
+            "positions": len(self._counts),
+            "questions": sum(self._counts.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "added": self.added,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+        }
+
+
+question_bank = QuestionBank(
+    enabled=settings.QUESTION_BANK,
+    similarity=settings.QUESTION_BANK_SIMILARITY,
+    min_questions=settings.QUESTION_BANK_MIN_QUESTIONS,
+    dedup=settings.QUESTION_BANK_DEDUP,
+    refresh=settings.QUESTION_BANK_REFRESH,
+)
@@ -0,0 +1,200 @@
+"""Повторная оценка завершенных собеседований после смены рубрики или модели.
+
+    python -m app.rescoring --pack 4 --concurrency 4
+    python -m app.rescoring --model gemini-2.5-flash --version rubric-2026-10
+
+Оценки пишутся в interview_evaluations с меткой версии, исходный фидбэк
+сессий не меняется. Повторный запуск с той же версией продолжает с места
+остановки: уже оцененные сессии не выбираются.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from app.config import settings
+from app.database_fixed import AsyncSessionLocal, async_engine, init_db
+from app.crud_fixed import stream_sessions_to_evaluate, save_evaluations
+from app.limits import CircuitOpenError
+from app.logging_config import setup_logging
+from app.prompt_budget import estimate_tokens
+from app.services import gemini_service, FEEDBACK_RUBRIC
+
+logger = logging.getLogger(__name__)
+
+
+def default_version(model: str) -> str:
+    """Версия по умолчанию - модель и отпечаток рубрики: после правки рубрики оценки не смешиваются со старыми"""
+    digest = hashlib.sha256(FEEDBACK_RUBRIC.encode("utf-8")).hexdigest()[:8]
+    return f"{model}:{digest}"
+
+
+def _item(session) -> dict:
+    return {
+        "session_id": session.session_id,
+        "position": session.position,
+        "questions": session.get_questions(),
+        "answers": session.get_answers(),
+    }
+
+
+def _item_tokens(item: dict) -> int:
+    return sum(estimate_tokens(text) for text in item["questions"] + item["answers"])
+
+
+class Rescorer:
+    """Конвейер переоценки: чтение сессий курсором -> пакеты -> ограниченное число параллельных запросов.
+
+    В один запрос к модели попадает до pack собеседований и не больше
+    pack_tokens токенов (по локальной оценке): длинные собеседования идут
+    меньшими пакетами. Собеседования, пропущенные моделью в ответе на пакет,
+    оцениваются по одному. Очередь пакетов ограничена, поэтому чтение из БД
+    не обгоняет запросы к модели.
+    """
+
+    def __init__(self, version: str, model: str, pack: int = 4, pack_tokens: int = 24000,
+                 concurrency: int = 4, retries: int = 3, read_batch: int = 100, gemini=gemini_service):
+        self.version = version
+        self.model = model
+        self.pack = max(1, pack)
+        self.pack_tokens = pack_tokens
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.read_batch = read_batch
+        self.gemini = gemini
+        self.evaluated = 0
+        self.failed = 0
+        self.skipped = 0
+        self.requests = 0
+
+    async def _produce(self, queue: asyncio.Queue, limit: int = None):
+        pack, pack_tokens = [], 0
+        async with AsyncSessionLocal() as db:
+            async for sessions in stream_sessions_to_evaluate(db, self.version, self.read_batch, limit):
+                for session in sessions:
+                    item = _item(session)
+                    if not item["answers"] or len(item["questions"]) != len(item["answers"]):
+                        self.skipped += 1
+                        continue
+                    tokens = _item_tokens(item)
+                    if pack and (len(pack) >= self.pack or pack_tokens + tokens > self.pack_tokens):
+                        await queue.put(pack)
+                        pack, pack_tokens = [], 0
+                    pack.append(item)
+                    pack_tokens += tokens
+        if pack:
+            await queue.put(pack)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            pack = await queue.get()
+            if pack is None:
+                return
+            try:
+                await self._evaluate(pack)
+            except Exception:
+                self.failed += len(pack)
+                logger.exception("Ошибка переоценки пакета", extra={"sessions": [item["session_id"] for item in pack]})
+
+    async def _evaluate(self, pack: list, attempt: int = 0):
+        self.requests += 1
+        try:
+            results = await self.gemini.evaluate_batch_async(pack)
+        except Exception as e:
+            if attempt >= self.retries:
+                self.failed += len(pack)
+                logger.error("Пакет не оценен", extra={"sessions": len(pack), "error": repr(e)})
+                return
+            # Разомкнутый предохранитель ждем целиком, остальные ошибки - с растущей паузой
+            delay = settings.GEMINI_BREAKER_RESET if isinstance(e, CircuitOpenError) else 2 ** attempt
+            logger.warning("Повтор пакета", extra={"sessions": len(pack), "attempt": attempt + 1, "error": repr(e)})
+            await asyncio.sleep(delay)
+            await self._evaluate(pack, attempt + 1)
+            return
+
+        done = [(item, text) for item, text in zip(pack, results) if text]
+        if done:
+            async with AsyncSessionLocal() as db:
+                saved = await save_evaluations(db, [
+                    {"session_id": item["session_id"], "version": self.version, "model": self.model, "feedback": text}
+                    for item, text in done
+                ])
+            self.evaluated += saved
+
+        missed = [item for item, text in zip(pack, results) if not text]
+        if missed and len(pack) > 1:
+            logger.warning("Модель пропустила собеседования пакета", extra={"missed": len(missed), "sessions": len(pack)})
+            for item in missed:
+                await self._evaluate([item])
+        elif missed:
+            self.failed += 1
+        logger.info("Пакет оценен", extra={"evaluated": self.evaluated, "failed": self.failed})
+
+    async def run(self, limit: int = None) -> dict:
+        started = time.monotonic()
+        queue = asyncio.Queue(maxsize=self.concurrency)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await self._produce(queue, limit)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        return self.stats(time.monotonic() - started)
+
+    def stats(self, elapsed: float = None) -> dict:
+        stats = {
+            "version": self.version,
+            "model": self.model,
+            "evaluated": self.evaluated,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "requests": self.requests,
+        }
+        if elapsed is not None:
+            stats["elapsed_s"] = round(elapsed, 1)
+            stats["sessions_per_s"] = round(self.evaluated / elapsed, 2) if elapsed else 0
+        return stats
+
+
+async def _run(rescorer: Rescorer, limit: int = None) -> dict:
+    try:
+        return await rescorer.run(limit)
+    finally:
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторная оценка завершенных собеседований")
+    parser.add_argument("--model", default=settings.GEMINI_MODEL, help="модель Gemini для оценки")
+    parser.add_argument("--version", help="метка версии оценки (по умолчанию - модель и отпечаток рубрики)")
+    parser.add_argument("--pack", type=int, default=4, help="собеседований в одном запросе к модели")
+    parser.add_argument("--pack-tokens", type=int, default=24000, help="предел входных токенов пакета")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных запросов к модели")
+    parser.add_argument("--retries", type=int, default=3, help="повторов пакета после ошибки")
+    parser.add_argument("--read-batch", type=int, default=100, help="сессий за одно чтение курсора")
+    parser.add_argument("--limit", type=int, help="оценить не больше N сессий")
+    args = parser.parse_args()
+
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    init_db()
+    gemini_service.model_name = args.model
+    rescorer = Rescorer(
+        version=args.version or default_version(args.model),
+        model=args.model,
+        pack=args.pack,
+        pack_tokens=args.pack_tokens,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        read_batch=args.read_batch,
+    )
+    stats = asyncio.run(_run(rescorer, args.limit))
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
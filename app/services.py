@@ -1,114 +1,483 @@
-from google import genai
-from google.genai import types
-from app.config import settings
-
-class GeminiService:
-    def __init__(self):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        self.model_name = settings.GEMINI_MODEL
-    
-    def generate_questions(self, position: str) -> list:
-        prompt = f"""
-        Ты - технический рекрутер. Сгенерируй 10 строгих технических вопросов для собеседования на позицию {position}.
-        Вопросы должны проверять:
-        - Глубину знаний языка программирования и технологий
-        - Практический опыт работы
-        - Понимание архитектуры и best practices
-        - Решение реальных задач
-        
-        Формат: только вопросы, каждый с новой строки, без номеров, без дополнительного текста.
-        """
-        
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(thinking_budget=0)
-                )
-            )
-            questions = [q.strip() for q in response.text.split('\n') if q.strip()]
-            result = questions[:10] if len(questions) >= 10 else self._get_fallback_questions(position)
-            print(f"✅ Сгенерировано {len(result)} вопросов для позиции {position}")
-            return result
-        except Exception as e:
-            print(f"❌ Ошибка генерации вопросов: {e}")
-            return self._get_fallback_questions(position)
-    
-    def _get_fallback_questions(self, position: str) -> list:
-        """Fallback вопросы на случай ошибки API"""
-        print("⚠️ Используются fallback вопросы")
-        return [
-            f"Какие основные технологии и фреймворки вы использовали в работе с {position}?",
-            "Опишите архитектуру последнего проекта, над которым работали",
-            "Как вы обеспечиваете качество и тестирование кода?",
-            "Расскажите о самом сложном техническом вызове в вашей карьере",
-            "Как вы оптимизируете производительность приложений?",
-            "Какие шаблоны проектирования вы чаще всего используете и почему?",
-            "Как вы организуете работу с базой данных в своих проектах?",
-            "Расскажите о вашем опыте работы с системами контроля версий",
-            "Как вы подходите к рефакторингу legacy кода?",
-            "Какие методы вы используете для отладки сложных проблем?"
-        ]
-    
-    def generate_feedback(self, position: str, questions: list, answers: list) -> str:
-        print(f"📊 Генерация фидбэка для позиции: {position}")
-        print(f"❓ Количество вопросов: {len(questions)}")
-        print(f"✅ Количество ответов: {len(answers)}")
-        
-        if len(questions) != len(answers):
-            error_msg = f"Ошибка: количество вопросов ({len(questions)}) и ответов ({len(answers)}) не совпадает. Пожалуйста, попробуйте начать собеседование заново."
-            print(f"❌ {error_msg}")
-            return error_msg
-        
-        qa_pairs = "\n".join([
-            f"ВОПРОС {i+1}: {q}\nОТВЕТ КАНДИДАТА: {a}\n" 
-            for i, (q, a) in enumerate(zip(questions, answers))
-        ])
-        
-        prompt = f"""
-        Ты - старший технический специалист, проводящий анализ результатов собеседования на позицию {position}.
-        
-        ВОПРОСЫ И ОТВЕТЫ КАНДИДАТА:
-        {qa_pairs}
-        
-        Проанализируй технические навыки кандидата и дай развернутую оценку по следующим критериям:
-        
-        1. ТЕХНИЧЕСКАЯ КОМПЕТЕНТНОСТЬ:
-           - Знание языка программирования и технологий
-           - Понимание архитектурных принципов
-           - Опыт решения практических задач
-        
-        2. СИЛЬНЫЕ СТОРОНЫ:
-           - Конкретные технические навыки, которые выделяют кандидата
-           - Глубина знаний в ключевых областях
-        
-        3. ОБЛАСТИ ДЛЯ РАЗВИТИЯ:
-           - Конкретные пробелы в знаниях
-           - Навыки, требующие улучшения
-           - Рекомендации по обучению
-        
-        4. ИТОГОВАЯ РЕКОМЕНДАЦИЯ:
-           - Готов ли кандидат к позиции {position}
-           - Конкретные аргументы за и против
-           - Уровень: Junior/Middle/Senior (если применимо)
-        
-        Будь строгим, объективным и конструктивным. Основывай оценку только на технических ответах.
-        """
-        
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(thinking_budget=0)
-                )
-            )
-            print("✅ Фидбэк успешно сгенерирован")
-            return response.text
-        except Exception as e:
-            error_msg = f"Ошибка при генерации фидбэка: {str(e)}"
-            print(f"❌ {error_msg}")
-            return error_msg
-
-gemini_service = GeminiService()
\ No newline at end of file
+import asyncio
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google import genai
+from google.genai import types
+from app.config import settings
+from app.cache import question_cache
+from app.limits import SingleFlight, TokenBucket, CircuitBreaker
+from app.metrics import track_gemini, record_usage, GEMINI_FALLBACKS, PROMPT_TOKENS_SAVED, PROMPT_ANSWERS_TRUNCATED
+from app.prompt_budget import fit_to_budget
+
+logger = logging.getLogger(__name__)
+
+_SCORE_RE = re.compile(r"ОЦЕНКА:\s*(\d+)", re.IGNORECASE)
+_NOTES_RE = re.compile(r"КОММЕНТАРИЙ:\s*(.+)", re.IGNORECASE | re.DOTALL)
+# Строка-разделитель оценок в ответе на пакетный запрос: "=== ОЦЕНКА 2 ==="
+_BATCH_MARK_RE = re.compile(r"^\W*ОЦЕНКА\s+(\d+)\W*$", re.IGNORECASE | re.MULTILINE)
+
+# Статическая рубрика фидбэка: одна и та же для всех собеседований, поэтому передается
+# как system instruction (или ссылкой на кэш контекста), а не внутри каждого промпта
+FEEDBACK_RUBRIC = """Ты - старший технический специалист, проводящий анализ результатов технического собеседования.
+В запросе - позиция, вопросы и ответы кандидата.
+
+Проанализируй технические навыки кандидата и дай развернутую оценку по следующим критериям:
+
+1. ТЕХНИЧЕСКАЯ КОМПЕТЕНТНОСТЬ:
+   - Знание языка программирования и технологий
+   - Понимание архитектурных принципов
+   - Опыт решения практических задач
+
+2. СИЛЬНЫЕ СТОРОНЫ:
+   - Конкретные технические навыки, которые выделяют кандидата
+   - Глубина знаний в ключевых областях
+
+3. ОБЛАСТИ ДЛЯ РАЗВИТИЯ:
+   - Конкретные пробелы в знаниях
+   - Навыки, требующие улучшения
+   - Рекомендации по обучению
+
+4. ИТОГОВАЯ РЕКОМЕНДАЦИЯ:
+   - Готов ли кандидат к заявленной позиции
+   - Конкретные аргументы за и против
+   - Уровень: Junior/Middle/Senior (если применимо)
+
+Будь строгим, объективным и конструктивным. Основывай оценку только на технических ответах.
+Длинные ответы могут быть сокращены: пометка о пропуске не является частью ответа кандидата."""
+
+# questions, scoring и summary идут без system instruction: инструкции уже в их коротких промптах
+SYSTEM_INSTRUCTIONS = {"feedback": FEEDBACK_RUBRIC, "rescoring": FEEDBACK_RUBRIC}
+
+CONTEXT_CACHE_MARGIN = 60    # кэш контекста пересоздается за минуту до истечения
+CONTEXT_CACHE_RETRY = 600    # после ошибки создания кэша инструкции идут в запросе столько секунд
+
+
+class GeminiService:
+    def __init__(self):
+        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.model_name = settings.GEMINI_MODEL
+        self.question_cache = question_cache
+        # Ограниченный пул потоков для синхронных вызовов SDK, если async-клиент недоступен
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.GEMINI_EXECUTOR_WORKERS,
+            thread_name_prefix="gemini"
+        )
+        # Ограничения на вызовы Gemini: одинаковые запросы объединяются,
+        # число одновременных вызовов и частота ограничены, при сбоях срабатывает предохранитель
+        self.single_flight = SingleFlight()
+        self.rate_limiter = TokenBucket(settings.GEMINI_RATE_PER_SEC, settings.GEMINI_RATE_BURST)
+        self.breaker = CircuitBreaker(settings.GEMINI_BREAKER_THRESHOLD, settings.GEMINI_BREAKER_RESET)
+        self._concurrency = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        self._context_caches = {}        # operation -> (имя кэша контекста, когда истекает)
+        self._context_cache_retry_at = {}
+        self._context_cache_lock = asyncio.Lock()
+        feedback_concurrency = asyncio.Semaphore(settings.GEMINI_FEEDBACK_CONCURRENCY)
+        self._operation_concurrency = {
+            "questions": asyncio.Semaphore(settings.GEMINI_QUESTIONS_CONCURRENCY),
+            "feedback": feedback_concurrency,
+            "scoring": asyncio.Semaphore(settings.GEMINI_SCORING_CONCURRENCY),
+            # Сводка заменяет фидбэк в пошаговом режиме и делит с ним лимит
+            "summary": feedback_concurrency,
+            # Пакетная переоценка ограничивает число запросов сама (--concurrency)
+            "rescoring": asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY),
+        }
+
+    def _generation_config(self, operation: str, cached_content: str = None):
+        """Конфигурация вызова: статические инструкции операции - ссылкой на кэш или как system instruction"""
+        extra = {}
+        if cached_content:
+            extra["cached_content"] = cached_content
+        elif operation in SYSTEM_INSTRUCTIONS:
+            extra["system_instruction"] = SYSTEM_INSTRUCTIONS[operation]
+        return types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            **extra
+        )
+
+    async def _context_cache(self, operation: str):
+        """Имя кэша контекста с инструкциями операции; None - передавать инструкции в запросе.
+
+        Кэш создается при первом вызове и пересоздается перед истечением TTL.
+        Если модель не поддерживает кэширование или инструкции меньше
+        минимального размера кэша, запросы CONTEXT_CACHE_RETRY секунд идут без него.
+        """
+        caches = getattr(getattr(self.client, "aio", None), "caches", None)
+        if not settings.GEMINI_CONTEXT_CACHE or operation not in SYSTEM_INSTRUCTIONS or caches is None:
+            return None
+        entry = self._context_caches.get(operation)
+        if entry is not None and entry[1] - time.monotonic() > CONTEXT_CACHE_MARGIN:
+            return entry[0]
+        if self._context_cache_retry_at.get(operation, 0) > time.monotonic():
+            return None
+
+        async with self._context_cache_lock:
+            entry = self._context_caches.get(operation)
+            if entry is not None and entry[1] - time.monotonic() > CONTEXT_CACHE_MARGIN:
+                return entry[0]
+            try:
+                cache = await asyncio.wait_for(caches.create(
+                    model=self.model_name,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=SYSTEM_INSTRUCTIONS[operation],
+                        ttl=f"{settings.GEMINI_CONTEXT_CACHE_TTL}s",
+                        display_name=f"neurohr-{operation}"
+                    )
+                ), timeout=settings.GEMINI_TIMEOUT)
+            except Exception as e:
+                self._context_cache_retry_at[operation] = time.monotonic() + CONTEXT_CACHE_RETRY
+                logger.warning("Кэш контекста недоступен, инструкции передаются в запросе",
+                               extra={"operation": operation, "error": repr(e)})
+                return None
+            self._context_caches[operation] = (cache.name, time.monotonic() + settings.GEMINI_CONTEXT_CACHE_TTL)
+            logger.info("Создан кэш контекста", extra={"operation": operation, "cache": cache.name})
+            return cache.name
+
+    def _drop_context_cache(self, operation: str, cached_content):
+        """Вызов со ссылкой на кэш упал - кэш мог быть удален, следующий вызов создаст новый"""
+        if cached_content:
+            self._context_caches.pop(operation, None)
+
+    def _generate_unchecked(self, operation: str, prompt: str) -> str:
+        response = self.client.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=self._generation_config(operation)
+        )
+        record_usage(operation, getattr(response, "usage_metadata", None))
+        return response.text
+
+    def _generate(self, operation: str, prompt: str) -> str:
+        """Блокирующий вызов модели"""
+        self.breaker.check()
+        try:
+            with track_gemini(operation):
+                text = self._generate_unchecked(operation, prompt)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return text
+
+    async def _call_model_async(self, operation: str, prompt: str) -> str:
+        aio = getattr(self.client, "aio", None) if settings.GEMINI_USE_AIO else None
+        if aio is not None:
+            cached_content = await self._context_cache(operation)
+            call = aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._generation_config(operation, cached_content)
+            )
+            try:
+                response = await asyncio.wait_for(call, timeout=settings.GEMINI_TIMEOUT)
+            except Exception:
+                self._drop_context_cache(operation, cached_content)
+                raise
+            record_usage(operation, getattr(response, "usage_metadata", None))
+            return response.text
+
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(self._executor, self._generate_unchecked, operation, prompt)
+        return await asyncio.wait_for(call, timeout=settings.GEMINI_TIMEOUT)
+
+    async def _generate_limited(self, operation: str, prompt: str) -> str:
+        # Сначала слот операции, потом общий: вызовы в очереди своей операции
+        # не занимают общие слоты, и другие операции не ждут за ними
+        async with self._operation_concurrency[operation], self._concurrency:
+            await self.rate_limiter.acquire(timeout=settings.GEMINI_TIMEOUT)
+            try:
+                with track_gemini(operation):
+                    text = await self._call_model_async(operation, prompt)
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return text
+
+    async def _stream_async(self, operation: str, prompt: str):
+        """Потоковый вызов модели с теми же ограничениями, что и _generate_limited"""
+        self.breaker.check()
+        async with self._operation_concurrency[operation], self._concurrency:
+            await self.rate_limiter.acquire(timeout=settings.GEMINI_TIMEOUT)
+            try:
+                with track_gemini(operation):
+                    aio = getattr(self.client, "aio", None) if settings.GEMINI_USE_AIO else None
+                    if aio is None:
+                        yield await self._call_model_async(operation, prompt)
+                    else:
+                        cached_content = await self._context_cache(operation)
+                        usage = None
+                        try:
+                            stream = await asyncio.wait_for(
+                                aio.models.generate_content_stream(
+                                    model=self.model_name,
+                                    contents=prompt,
+                                    config=self._generation_config(operation, cached_content)
+                                ),
+                                timeout=settings.GEMINI_TIMEOUT
+                            )
+                            async for response in stream:
+                                # Итоговые счетчики токенов приходят в последней части
+                                usage = getattr(response, "usage_metadata", None) or usage
+                                if response.text:
+                                    yield response.text
+                        except Exception:
+                            self._drop_context_cache(operation, cached_content)
+                            raise
+                        record_usage(operation, usage)
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+
+    async def _generate_async(self, operation: str, prompt: str) -> str:
+        """Неблокирующий вызов модели: client.aio или ограниченный пул потоков.
+
+        Одинаковые одновременные запросы выполняются одним вызовом,
+        при разомкнутом предохранителе сразу выбрасывается CircuitOpenError.
+        """
+        self.breaker.check()
+        return await self.single_flight.do(
+            (operation, prompt),
+            lambda: self._generate_limited(operation, prompt)
+        )
+
+    def _questions_prompt(self, position: str) -> str:
+        return f"""
+        Ты - технический рекрутер. Сгенерируй 10 строгих технических вопросов для собеседования на позицию {position}.
+        Вопросы должны проверять:
+        - Глубину знаний языка программирования и технологий
+        - Практический опыт работы
+        - Понимание архитектуры и best practices
+        - Решение реальных задач
+
+        Формат: только вопросы, каждый с новой строки, без номеров, без дополнительного текста.
+        """
+
+    def _parse_questions(self, text: str):
+        """Разбор ответа модели; None, если вопросов меньше 10"""
+        questions = [q.strip() for q in text.split('\n') if q.strip()]
+        return questions[:10] if len(questions) >= 10 else None
+
+    def _remember_questions(self, position: str, questions, fallback: bool = True):
+        if not questions:
+            return self.fallback_questions(position) if fallback else None
+        self.question_cache.put(position, questions)
+        logger.info("Вопросы сгенерированы", extra={"position": position, "questions": len(questions)})
+        return questions
+
+    def generate_questions(self, position: str) -> list:
+        cached = self.question_cache.get(position)
+        if cached:
+            return cached
+
+        try:
+            questions = self._parse_questions(self._generate("questions", self._questions_prompt(position)))
+        except Exception as e:
+            logger.error("Ошибка генерации вопросов", extra={"position": position, "error": repr(e)})
+            questions = None
+        return self._remember_questions(position, questions)
+
+    async def generate_questions_async(self, position: str, fallback: bool = True):
+        """Асинхронная версия generate_questions, не блокирует event loop.
+
+        С fallback=False при ошибке модели возвращает None вместо запасных вопросов.
+        """
+        cached = self.question_cache.get(position)
+        if cached:
+            return cached
+
+        try:
+            questions = self._parse_questions(await self._generate_async("questions", self._questions_prompt(position)))
+        except Exception as e:
+            logger.error("Ошибка генерации вопросов", extra={"position": position, "error": repr(e)})
+            questions = None
+        return self._remember_questions(position, questions, fallback)
+
+    def fallback_questions(self, position: str) -> list:
+        """Fallback вопросы на случай ошибки API"""
+        GEMINI_FALLBACKS.labels("questions").inc()
+        logger.warning("Используются fallback вопросы", extra={"position": position})
+        return [
+            f"Какие основные технологии и фреймворки вы использовали в работе с {position}?",
+            "Опишите архитектуру последнего проекта, над которым работали",
+            "Как вы обеспечиваете качество и тестирование кода?",
+            "Расскажите о самом сложном техническом вызове в вашей карьере",
+            "Как вы оптимизируете производительность приложений?",
+            "Какие шаблоны проектирования вы чаще всего используете и почему?",
+            "Как вы организуете работу с базой данных в своих проектах?",
+            "Расскажите о вашем опыте работы с системами контроля версий",
+            "Как вы подходите к рефакторингу legacy кода?",
+            "Какие методы вы используете для отладки сложных проблем?"
+        ]
+
+    def _check_pairs(self, position: str, questions: list, answers: list):
+        """Возвращает текст ошибки, если вопросы и ответы не совпадают"""
+        logger.debug("Генерация фидбэка", extra={"position": position, "questions": len(questions), "answers": len(answers)})
+
+        if len(questions) != len(answers):
+            error_msg = f"Ошибка: количество вопросов ({len(questions)}) и ответов ({len(answers)}) не совпадает. Пожалуйста, попробуйте начать собеседование заново."
+            GEMINI_FALLBACKS.labels("feedback").inc()
+            logger.error("Вопросы и ответы не совпадают", extra={"questions": len(questions), "answers": len(answers)})
+            return error_msg
+        return None
+
+    def _fit_answer(self, operation: str, answer: str) -> str:
+        """Ответ кандидата для промпта: сжатые пробелы и не больше PROMPT_ANSWER_TOKEN_BUDGET токенов"""
+        text, saved, truncated = fit_to_budget(answer, settings.PROMPT_ANSWER_TOKEN_BUDGET)
+        if saved > 0:
+            PROMPT_TOKENS_SAVED.labels(operation).inc(saved)
+        if truncated:
+            PROMPT_ANSWERS_TRUNCATED.labels(operation).inc()
+        return text
+
+    def _feedback_prompt(self, position: str, questions: list, answers: list, operation: str = "feedback") -> str:
+        """Переменная часть промпта фидбэка; рубрика - в FEEDBACK_RUBRIC (system instruction или кэш контекста)"""
+        qa_pairs = "\n".join([
+            f"ВОПРОС {i+1}: {q}\nОТВЕТ КАНДИДАТА: {self._fit_answer(operation, a)}\n"
+            for i, (q, a) in enumerate(zip(questions, answers))
+        ])
+
+        return f"ПОЗИЦИЯ: {position}\n\nВОПРОСЫ И ОТВЕТЫ КАНДИДАТА:\n{qa_pairs}"
+
+    def generate_feedback(self, position: str, questions: list, answers: list) -> str:
+        error_msg = self._check_pairs(position, questions, answers)
+        if error_msg:
+            return error_msg
+
+        try:
+            text = self._generate("feedback", self._feedback_prompt(position, questions, answers))
+            logger.info("Фидбэк сгенерирован", extra={"position": position})
+            return text
+        except Exception as e:
+            GEMINI_FALLBACKS.labels("feedback").inc()
+            logger.error("Ошибка генерации фидбэка", extra={"position": position, "error": repr(e)})
+            return f"Ошибка при генерации фидбэка: {str(e)}"
+
+    async def generate_feedback_async(self, position: str, questions: list, answers: list) -> str:
+        """Асинхронная версия generate_feedback, не блокирует event loop"""
+        error_msg = self._check_pairs(position, questions, answers)
+        if error_msg:
+            return error_msg
+
+        try:
+            text = await self._generate_async("feedback", self._feedback_prompt(position, questions, answers))
+            logger.info("Фидбэк сгенерирован", extra={"position": position})
+            return text
+        except Exception as e:
+            GEMINI_FALLBACKS.labels("feedback").inc()
+            logger.error("Ошибка генерации фидбэка", extra={"position": position, "error": repr(e)})
+            return f"Ошибка при генерации фидбэка: {e!r}"
+
+    async def generate_feedback_stream(self, position: str, questions: list, answers: list):
+        """Потоковая генерация фидбэка: текст отдаётся частями по мере готовности"""
+        error_msg = self._check_pairs(position, questions, answers)
+        if error_msg:
+            yield error_msg
+            return
+
+        started = False
+        try:
+            async for chunk in self._stream_async("feedback", self._feedback_prompt(position, questions, answers)):
+                started = True
+                yield chunk
+            logger.info("Фидбэк сгенерирован", extra={"position": position})
+        except Exception as e:
+            GEMINI_FALLBACKS.labels("feedback").inc()
+            logger.error("Ошибка генерации фидбэка", extra={"position": position, "error": repr(e)})
+            error_msg = f"Ошибка при генерации фидбэка: {e!r}"
+            yield f"\n\n{error_msg}" if started else error_msg
+
+    def _score_prompt(self, position: str, question: str, answer: str) -> str:
+        return f"""
+        Ты - технический интервьюер. Оцени ответ кандидата на позицию {position} на один вопрос.
+
+        ВОПРОС: {question}
+        ОТВЕТ КАНДИДАТА: {self._fit_answer("scoring", answer)}
+
+        Формат ответа - ровно две строки:
+        ОЦЕНКА: целое число от 0 до 10
+        КОММЕНТАРИЙ: одно-два предложения о сильных сторонах и пробелах ответа
+        """
+
+    def _parse_score(self, text: str) -> tuple:
+        """(оценка 0-10 или None, комментарий) из ответа модели"""
+        match = _SCORE_RE.search(text)
+        score = min(10, max(0, int(match.group(1)))) if match else None
+        notes = _NOTES_RE.search(text)
+        return score, (notes.group(1) if notes else text).strip()
+
+    async def score_answer_async(self, position: str, question: str, answer: str) -> tuple:
+        """Короткая оценка одного ответа: (оценка или None, комментарий или None)"""
+        try:
+            text = await self._generate_async("scoring", self._score_prompt(position, question, answer))
+        except Exception as e:
+            logger.warning("Ошибка оценки ответа", extra={"position": position, "error": repr(e)})
+            return None, None
+        return self._parse_score(text)
+
+    def _summary_prompt(self, position: str, items: list) -> str:
+        lines = "\n".join(
+            f"{i + 1}. {item['question']} - оценка {item['score'] if item['score'] is not None else 'нет'}/10: {item['notes'] or ''}"
+            for i, item in enumerate(items)
+        )
+
+        return f"""
+        Ты - старший технический специалист. Ниже оценки ответов кандидата на вопросы собеседования на позицию {position}.
+
+        {lines}
+
+        Составь итоговый отчет по разделам: ТЕХНИЧЕСКАЯ КОМПЕТЕНТНОСТЬ, СИЛЬНЫЕ СТОРОНЫ,
+        ОБЛАСТИ ДЛЯ РАЗВИТИЯ, ИТОГОВАЯ РЕКОМЕНДАЦИЯ (уровень Junior/Middle/Senior).
+        Опирайся только на приведенные оценки и комментарии, пиши кратко.
+        """
+
+    async def generate_summary_stream(self, position: str, items: list):
+        """Итоговый отчет по уже оцененным ответам - небольшой запрос вместо полного фидбэка.
+
+        Отдельная операция summary: рубрика FEEDBACK_RUBRIC к запросу не прикладывается.
+        Ошибки не перехватываются: вызывающий код собирает отчет без модели.
+        """
+        async for chunk in self._stream_async("summary", self._summary_prompt(position, items)):
+            yield chunk
+
+    def _batch_feedback_prompt(self, items: list) -> str:
+        interviews = "\n".join(
+            f"=== СОБЕСЕДОВАНИЕ {i + 1} ===\n"
+            + self._feedback_prompt(item["position"], item["questions"], item["answers"], "rescoring")
+            for i, item in enumerate(items)
+        )
+
+        return f"""Ниже {len(items)} независимых собеседований. Оцени каждое отдельно, не сравнивая кандидатов между собой.
+Перед оценкой каждого собеседования напиши отдельной строкой "=== ОЦЕНКА N ===", где N - номер собеседования.
+
+{interviews}"""
+
+    def _split_batch(self, text: str, count: int) -> list:
+        """Оценки из ответа на пакетный запрос по номерам собеседований; None - оценки нет"""
+        result = [None] * count
+        marks = list(_BATCH_MARK_RE.finditer(text))
+        for mark, following in zip(marks, marks[1:] + [None]):
+            n = int(mark.group(1)) - 1
+            body = text[mark.end():following.start() if following else len(text)].strip()
+            if 0 <= n < count and body and result[n] is None:
+                result[n] = body
+        return result
+
+    async def evaluate_batch_async(self, items: list) -> list:
+        """Повторная оценка нескольких завершенных собеседований одним запросом (python -m app.rescoring).
+
+        items - словари с position, questions и answers. Возвращает тексты
+        оценок в том же порядке; None - модель пропустила собеседование.
+        Ошибки вызова не перехватываются: о повторе решает вызывающий код.
+        """
+        if len(items) == 1:
+            item = items[0]
+            prompt = self._feedback_prompt(item["position"], item["questions"], item["answers"], "rescoring")
+            return [await self._generate_async("rescoring", prompt)]
+        text = await self._generate_async("rescoring", self._batch_feedback_prompt(items))
+        return self._split_batch(text, len(items))
+
+gemini_service = GeminiService()
@@ -0,0 +1,269 @@
+import logging
+import asyncio
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database_fixed import AsyncSessionLocal
+from app import crud_fixed
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveSession:
+    """Состояние идущего собеседования в памяти (интерфейс как у InterviewSessionDB)"""
+
+    __slots__ = ("session_id", "user_id", "position", "questions", "answers", "current_question", "status")
+
+    def __init__(self, session_id, user_id, position, questions, answers, current_question, status):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.position = position
+        self.questions = questions
+        self.answers = answers
+        self.current_question = current_question
+        self.status = status
+
+    @classmethod
+    def from_db(cls, db_session):
+        return cls(
+            db_session.session_id,
+            db_session.user_id,
+            db_session.position,
+            db_session.get_questions(),
+            db_session.get_answers(),
+            db_session.current_question,
+            db_session.status
+        )
+
+    def get_questions(self):
+        return self.questions
+
+    def get_answers(self):
+        return self.answers
+
+
+class SessionStore:
+    """Слой между обработчиками и crud_fixed.
+
+    В режиме "db" все операции сразу идут в базу. В режиме "memory" активные
+    сессии держатся в ограниченном LRU-словаре, а промежуточные ответы пишутся
+    в БД пачками в фоне (write-behind). Последний ответ, смена позиции и
+    остановка приложения сбрасывают очередь синхронно. Режим "memory" рассчитан
+    на один процесс приложения: другие воркеры увидят ответы с задержкой.
+    """
+
+    def __init__(self, mode: str, max_sessions: int, flush_interval: float, batch_size: int):
+        self.mode = mode
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._sessions = OrderedDict()
+        self._pending = []          # (enqueued_at, {session_id, idx, text})
+        self._pending_ids = {}      # session_id -> число незаписанных ответов
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flushed_answers = 0
+        self.flush_errors = 0
+        self.dropped_answers = 0
+        self.last_batch_size = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "memory"
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def get(self, db, session_id: str, questions: bool = True, answers: bool = True):
+        if not self.enabled:
+            return await crud_fixed.get_session(db, session_id, questions=questions, answers=answers)
+
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+
+        self.misses += 1
+        # Вытесненная сессия могла оставить незаписанные ответы - сначала сбрасываем их
+        if session_id in self._pending_ids:
+            await self.flush()
+        db_session = await crud_fixed.get_session(db, session_id)
+        if db_session is None:
+            return None
+        session = ActiveSession.from_db(db_session)
+        if session.status == "active":
+            self._remember(session)
+        return session
+
+    def add_new(self, session_data):
+        """Новая сессия уже записана в БД - сразу держим её в памяти"""
+        if self.enabled:
+            self._remember(ActiveSession(
+                session_data.session_id,
+                session_data.user_id,
+                session_data.position,
+                list(session_data.questions),
+                list(session_data.answers),
+                session_data.current_question,
+                session_data.status
+            ))
+
+    async def update_questions(self, db, session, questions: list, position: str, user_id: str = None):
+        if self.enabled and session.session_id in self._pending_ids:
+            await self.flush()
+        row = await crud_fixed.update_session_questions(db, session.session_id, questions, position, user_id)
+        if row is not None and self.enabled:
+            session.questions = list(questions)
+            session.answers = []
+            session.position = position
+            session.current_question = 0
+            session.user_id = session.user_id or user_id
+            self._remember(session)
+        return row
+
+    async def add_answer(self, db, session, idx: int, answer: str, status: str = None):
+        """Сохранить ответ; None, если ответ на этот шаг уже получен"""
+        if not self.enabled:
+            return await crud_fixed.add_answer(db, session.session_id, idx, answer, status=status)
+
+        if session.status != "active" or session.current_question != idx:
+            return None
+        session.answers.append(answer)
+        session.current_question = idx + 1
+
+        if status:
+            # Завершение: сначала записываются все накопленные ответы, затем последний - сразу в БД
+            session.status = status
+            self._sessions.pop(session.session_id, None)
+            await self.flush()
+            return await crud_fixed.add_answer(db, session.session_id, idx, answer, status=status)
+
+        self._pending.append((time.monotonic(), {"session_id": session.session_id, "idx": idx, "text": answer}))
+        self._pending_ids[session.session_id] = self._pending_ids.get(session.session_id, 0) + 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return session
+
+    def forget(self, session_ids):
+        """Убрать из памяти сессии, закрытые в БД в обход хранилища (истекшие по неактивности)"""
+        for session_id in session_ids:
+            self._sessions.pop(session_id, None)
+
+    def _remember(self, session):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    async def flush(self):
+        """Записать все накопленные ответы одной транзакцией.
+
+        Если пачка не записалась, ответы пишутся по одному: отвергнутые БД
+        (IntegrityError, DataError) отбрасываются с записью в лог, иначе одна
+        такая строка блокировала бы все следующие сбросы.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                async with AsyncSessionLocal() as db:
+                    await crud_fixed.save_answers_batch(db, [item for _, item in batch])
+                written = len(batch)
+            except Exception as e:
+                self.flush_errors += 1
+                logger.error("Ошибка записи ответов в БД", extra={"answers": len(batch), "error": repr(e)})
+                written = await self._flush_one_by_one(batch)
+
+            self._release(batch)
+            self.flushes += 1
+            self.flushed_answers += written
+            self.last_batch_size = written
+            self.last_flush_lag = time.monotonic() - batch[0][0]
+            self.max_flush_lag = max(self.max_flush_lag, self.last_flush_lag)
+
+    async def _flush_one_by_one(self, batch: list) -> int:
+        """Записать ответы пачки по одному; число записанных"""
+        written = 0
+        for position, (_, item) in enumerate(batch):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await crud_fixed.save_answers_batch(db, [item])
+            except (IntegrityError, DataError) as e:
+                self.dropped_answers += 1
+                logger.error("Ответ отброшен: БД его не принимает", extra={
+                    "session_id": item["session_id"], "idx": item["idx"], "error": repr(e)
+                })
+            except Exception:
+                # БД недоступна - остаток пачки возвращается в начало очереди до следующего сброса
+                self._pending = batch[position:] + self._pending
+                self._release(batch[:position])
+                raise
+            else:
+                written += 1
+        return written
+
+    def _release(self, batch: list):
+        for _, item in batch:
+            left = self._pending_ids.get(item["session_id"], 0) - 1
+            if left > 0:
+                self._pending_ids[item["session_id"]] = left
+            else:
+                self._pending_ids.pop(item["session_id"], None)
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(self.flush_interval)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "active_sessions": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pending_answers": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_answers": self.flushed_answers,
+            "flush_errors": self.flush_errors,
+            "dropped_answers": self.dropped_answers,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_lag": round(self.last_flush_lag, 4),
+            "max_flush_lag": round(self.max_flush_lag, 4),
+        }
+
+
+session_store = SessionStore(
+    mode=settings.SESSION_STORE,
+    max_sessions=settings.SESSION_STORE_MAX,
+    flush_interval=settings.SESSION_STORE_FLUSH_INTERVAL,
+    batch_size=settings.SESSION_STORE_BATCH_SIZE,
+)
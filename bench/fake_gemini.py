@@ -0,0 +1,166 @@
+import asyncio
+import random
+import time
+
+from app.prompt_budget import estimate_tokens
+
+
+class FakeGeminiError(Exception):
+    """Искусственная ошибка вызова модели (доля задается failure_rate)"""
+
+
+class _Usage:
+    """usage_metadata ответа: счетчики токенов по локальной оценке"""
+
+    def __init__(self, prompt: int, output: int, cached: int = 0):
+        self.prompt_token_count = prompt
+        self.candidates_token_count = output
+        self.cached_content_token_count = cached or None
+
+
+class _Response:
+    def __init__(self, text: str, usage: _Usage = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class _CachedContent:
+    def __init__(self, name: str, tokens: int):
+        self.name = name
+        self.tokens = tokens
+
+
+class FakeCaches:
+    """client.aio.caches: кэш контекста с system instruction"""
+
+    def __init__(self):
+        self.entries = {}
+
+    async def create(self, model=None, config=None):
+        name = f"cachedContents/fake-{len(self.entries) + 1}"
+        self.entries[name] = _CachedContent(name, estimate_tokens(str(config.system_instruction)))
+        return self.entries[name]
+
+
+class FakeGeminiModels:
+    """Замена client.models / client.aio.models из google-genai.
+
+    Отвечает с задержкой latency ± jitter секунд плюс chunk_latency на каждую
+    часть ответа (длинный фидбэк генерируется дольше короткой оценки),
+    с вероятностью failure_rate выбрасывает FakeGeminiError. Промпт вопросов узнается по слову
+    "Сгенерируй" (см. GeminiService._questions_prompt), на него возвращается
+    questions строк; промпт оценки одного ответа - по "ОЦЕНКА:", на него
+    возвращается случайная оценка; на пакетный промпт переоценки - по
+    фидбэку на каждое собеседование; на остальные - текст фидбэка из
+    feedback_chunks частей.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.1, failure_rate: float = 0.0,
+                 questions: int = 10, feedback_chunks: int = 8, chunk_latency: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.questions = questions
+        self.feedback_chunks = max(1, feedback_chunks)
+        self._random = random.Random(seed)
+        self.caches = FakeCaches()
+        self.calls = 0
+        self.failures = 0
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise FakeGeminiError("fake gemini: искусственная ошибка")
+
+    def _chunks(self, contents) -> list:
+        prompt = str(contents)
+        interviews = prompt.count("=== СОБЕСЕДОВАНИЕ ")
+        if interviews:
+            # Пакетная переоценка: по оценке на каждое собеседование, с разделителями
+            return [
+                chunk
+                for n in range(interviews)
+                for chunk in [f"=== ОЦЕНКА {n + 1} ===\n"] + [f"Часть оценки {i + 1}. " for i in range(self.feedback_chunks)] + ["\n"]
+            ]
+        if "Сгенерируй" in prompt:
+            return ["\n".join(f"Вопрос {i + 1}: расскажите о теме {i + 1}" for i in range(self.questions))]
+        if "ОЦЕНКА:" in prompt:
+            return [f"ОЦЕНКА: {self._random.randint(3, 9)}\nКОММЕНТАРИЙ: ответ по существу, не хватает деталей."]
+        return [f"Часть оценки {i + 1}. " for i in range(self.feedback_chunks)]
+
+    def _usage(self, contents, config, chunks) -> _Usage:
+        # Как в API: prompt_token_count включает и system instruction, и закэшированный контекст
+        prompt = estimate_tokens(str(contents))
+        cached = 0
+        if getattr(config, "cached_content", None) in self.caches.entries:
+            cached = self.caches.entries[config.cached_content].tokens
+        elif getattr(config, "system_instruction", None):
+            prompt += estimate_tokens(str(config.system_instruction))
+        return _Usage(prompt + cached, estimate_tokens("".join(chunks)), cached)
+
+    async def generate_content(self, model=None, contents=None, config=None):
+        chunks = self._chunks(contents)
+        await asyncio.sleep(self._delay() + self.chunk_latency * len(chunks))
+        self._maybe_fail()
+        return _Response("".join(chunks), self._usage(contents, config, chunks))
+
+    async def generate_content_stream(self, model=None, contents=None, config=None):
+        # Как в google-genai: корутина возвращает асинхронный итератор частей
+        self._maybe_fail()
+        chunks = self._chunks(contents)
+        first = self._delay()
+        usage = self._usage(contents, config, chunks)
+
+        async def stream():
+            await asyncio.sleep(first)
+            for i, chunk in enumerate(chunks):
+                await asyncio.sleep(self.chunk_latency)
+                yield _Response(chunk, usage if i == len(chunks) - 1 else None)
+
+        return stream()
+
+
+class FakeSyncModels:
+    """Синхронный client.models для режима GEMINI_USE_AIO=False (вызовы в пуле потоков)"""
+
+    def __init__(self, models: FakeGeminiModels):
+        self._models = models
+
+    def generate_content(self, model=None, contents=None, config=None):
+        chunks = self._models._chunks(contents)
+        time.sleep(self._models._delay() + self._models.chunk_latency * len(chunks))
+        self._models._maybe_fail()
+        return _Response("".join(chunks), self._models._usage(contents, config, chunks))
+
+
+class FakeGeminiClient:
+    """Клиент с интерфейсом genai.Client: client.models, client.aio.models и client.aio.caches"""
+
+    def __init__(self, **options):
+        models = FakeGeminiModels(**options)
+        self.aio = type("FakeAio", (), {})()
+        self.aio.models = models
+        self.aio.caches = models.caches
+        self.models = FakeSyncModels(models)
+
+    def stats(self) -> dict:
+        return {"calls": self.aio.models.calls, "failures": self.aio.models.failures}
+
+
+def install_fake_gemini(service=None, **options) -> FakeGeminiClient:
+    """Подменить клиент GeminiService фейком.
+
+    Ограничения вызовов (rate limiter, предохранитель, single-flight) и
+    кэш вопросов остаются настоящими - нагрузка проходит тот же путь, что
+    и с реальной моделью.
+    """
+    if service is None:
+        from app.services import gemini_service as service
+    client = FakeGeminiClient(**options)
+    service.client = client
+    return client
@@ -0,0 +1,125 @@
+"""Микробенчмарк JSON-слоя: стандартный json против orjson на данных собеседований.
+
+Сессия - 10 вопросов, длинные русские ответы с кодом и фидбэк. Сравниваются
+тело ответа API (JSONResponse Starlette против ORJSONResponse приложения),
+событие SSE, payload архива (json + zlib против колонки CompressedJSON) и
+порция выгрузки NDJSON. Результат - JSON: мкс на операцию и ускорение.
+
+    python -m bench.json_codec
+    python -m bench.json_codec --answer-size 4000 --number 200
+"""
+import argparse
+import json
+import os
+import timeit
+import zlib
+from datetime import datetime
+
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+from sqlalchemy.dialects import sqlite
+from starlette.responses import JSONResponse
+
+from app.database_fixed import CompressedJSON
+from app.export import _ndjson
+from app.main import ORJSONResponse, _sse
+
+ANSWER_LINE = "Использую asyncio.gather для параллельных запросов, а ошибки обрабатываю через return_exceptions=True.\n"
+CODE_LINE = "    result = await session.execute(select(User).where(User.id == user_id))\n"
+
+
+def _answer(size: int, i: int) -> str:
+    text = f"Ответ {i}. "
+    while len(text) < size:
+        text += ANSWER_LINE + CODE_LINE
+    return text[:size]
+
+
+def _session(answer_size: int, i: int = 0) -> dict:
+    questions = [f"Вопрос {q}: расскажите, как вы проектировали сервис с очередями и ретраями?" for q in range(10)]
+    answers = [_answer(answer_size, q) for q in range(10)]
+    return {
+        "session_id": f"00000000-0000-0000-0000-{i:012d}",
+        "user_id": f"user-{i}",
+        "platform": "web",
+        "position": "Python backend",
+        "status": "completed",
+        "current_question": 10,
+        "created_at": datetime(2026, 1, 1, 12, 0, 0),
+        "completed_at": datetime(2026, 1, 1, 12, 40, 0),
+        "questions": questions,
+        "answers": answers,
+        "scores": [7] * 10,
+        "feedback": "ОБЩАЯ ОЦЕНКА: 7/10\n" + _answer(answer_size * 2, 0),
+        "archived": False,
+    }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(type(value).__name__)
+
+
+def _cases(answer_size: int, rows: int) -> dict:
+    """Пары (стандартный json, orjson) для каждого сценария"""
+    session = _session(answer_size)
+    response = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in session.items()}
+    payload = {"questions": session["questions"], "answers": [
+        {"text": text, "score": 7, "notes": "по существу"} for text in session["answers"]
+    ], "feedback": session["feedback"], "evaluations": []}
+    chunk = {"text": session["feedback"][:200]}
+    batch = [_session(answer_size, i) for i in range(rows)]
+
+    column = CompressedJSON()
+    dialect = sqlite.dialect()
+    stored_std = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    stored_orjson = column.process_bind_param(payload, dialect)
+
+    return {
+        "response_body": (
+            lambda: JSONResponse(response).body,
+            lambda: ORJSONResponse(response).body,
+        ),
+        "sse_event": (
+            lambda: f"event: chunk\ndata: {json.dumps(chunk, ensure_ascii=False)}\n\n",
+            lambda: _sse("chunk", chunk),
+        ),
+        "archive_pack": (
+            lambda: zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8")),
+            lambda: column.process_bind_param(payload, dialect),
+        ),
+        "archive_unpack": (
+            lambda: json.loads(zlib.decompress(stored_std).decode("utf-8")),
+            lambda: column.process_result_value(stored_orjson, dialect),
+        ),
+        # Строку json.dumps StreamingResponse все равно кодирует в UTF-8
+        f"ndjson_{rows}_rows": (
+            lambda: "".join(json.dumps(row, ensure_ascii=False, default=_json_default) + "\n" for row in batch).encode("utf-8"),
+            lambda: _ndjson(batch),
+        ),
+    }
+
+
+def _best_us(func, number: int, repeat: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк JSON-слоя: json против orjson")
+    parser.add_argument("--answer-size", type=int, default=2000, help="длина ответа, символов")
+    parser.add_argument("--rows", type=int, default=100, help="строк в порции выгрузки")
+    parser.add_argument("--number", type=int, default=100, help="вызовов в одном замере")
+    parser.add_argument("--repeat", type=int, default=5, help="замеров, берется лучший")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (std, fast) in _cases(args.answer_size, args.rows).items():
+        std_us = _best_us(std, args.number, args.repeat)
+        fast_us = _best_us(fast, args.number, args.repeat)
+        results[name] = {"json_us": round(std_us, 1), "orjson_us": round(fast_us, 1), "speedup": round(std_us / fast_us, 1)}
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
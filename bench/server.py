@@ -0,0 +1,31 @@
+"""Сервер приложения с фейковым Gemini для нагрузки по HTTP (python -m bench.load --url ...).
+
+    python -m bench.server --profile sqlite --latency 0.3 --port 8000
+"""
+import argparse
+
+import uvicorn
+
+from bench.fake_gemini import install_fake_gemini
+from bench.load import PROFILES, add_fake_arguments, apply_profile, fake_options
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FastAPI-приложение с фейковым Gemini")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="sqlite")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="переопределить настройку приложения")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    env = apply_profile(args.profile, args.env)
+    from app.main import app
+
+    install_fake_gemini(**fake_options(args))
+    print(f"bench server: profile={args.profile} database={env['DATABASE_URL']}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
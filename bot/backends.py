@@ -0,0 +1,184 @@
+import json
+import asyncio
+import importlib.util
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP-клиент к API: таймауты по эндпоинтам (секунды) и повторы для идемпотентных запросов
+API_TIMEOUTS = {
+    "start_interview": 10,
+    "set_position": 90,   # генерация вопросов в Gemini
+    "answer_question": 15,
+    "history": 10,
+    "feedback": 45,
+}
+API_MAX_CONNECTIONS = 100
+API_RETRIES = 3
+API_RETRY_BACKOFF = 0.5
+
+
+class HttpBackend:
+    """Бот ходит в FastAPI по HTTP (API может работать в другом процессе или на другом хосте)"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.http = None
+
+    async def open(self):
+        """Общий keep-alive клиент к API, живет вместе с Application"""
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=API_MAX_CONNECTIONS, max_keepalive_connections=API_MAX_CONNECTIONS),
+            timeout=10
+        )
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+
+    async def request_with_retry(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Запрос с повторами и экспоненциальной задержкой (только для идемпотентных запросов)"""
+        for attempt in range(API_RETRIES):
+            try:
+                response = await self.http.request(method, url, **kwargs)
+                if response.status_code < 500 or attempt == API_RETRIES - 1:
+                    return response
+            except httpx.TransportError as e:
+                if attempt == API_RETRIES - 1:
+                    raise
+                logger.warning("Request failed, retrying", extra={"method": method, "url": url, "error": repr(e)})
+            await asyncio.sleep(API_RETRY_BACKOFF * 2 ** attempt)
+
+    async def get_with_retry(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request_with_retry("GET", url, **kwargs)
+
+    async def start_interview(self, user_id: str, platform: str) -> dict:
+        response = await self.http.post("/start_interview", json={
+            "start": True,
+            "user_id": user_id,
+            "platform": platform
+        }, timeout=API_TIMEOUTS["start_interview"])
+        response.raise_for_status()
+        return response.json()
+
+    async def set_position(self, session_id: str, position: str, user_id: str) -> dict:
+        response = await self.http.post("/set_position", json={
+            "session_id": session_id,
+            "position": position,
+            "user_id": user_id
+        }, timeout=API_TIMEOUTS["set_position"])
+        response.raise_for_status()
+        return response.json()
+
+    async def answer(self, session_id: str, answer: str, user_id: str, question_index: int = None) -> dict:
+        # С question_index повтор безопасен: API вернет результат первой попытки, а не запишет ответ дважды
+        send = self.request_with_retry if question_index is not None else self.http.request
+        response = await send("POST", "/answer_question", json={
+            "session_id": session_id,
+            "answer": answer,
+            "user_id": user_id,
+            "question_index": question_index
+        }, timeout=API_TIMEOUTS["answer_question"])
+        response.raise_for_status()
+        return response.json()
+
+    async def feedback_events(self, session_id: str):
+        """События SSE фидбэка в виде пар (event, data)"""
+        event = None
+        # Между частями фидбэка может пройти заметное время, поэтому read без ограничения
+        timeout = httpx.Timeout(10, read=None)
+        async with self.http.stream("GET", f"/session/{session_id}/feedback/stream", timeout=timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    yield event, json.loads(line[len("data:"):])
+
+    async def wait_feedback(self, session_id: str, wait: float) -> dict:
+        response = await self.get_with_retry(
+            f"/session/{session_id}/feedback",
+            params={"wait": wait},
+            timeout=API_TIMEOUTS["feedback"]
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def history(self, user_id: str, limit: int) -> dict:
+        response = await self.get_with_retry(
+            f"/user/{user_id}/sessions",
+            params={"limit": limit},
+            timeout=API_TIMEOUTS["history"]
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+class EmbeddedBackend:
+    """Бот вызывает InterviewService в своем процессе, без HTTP и сериализации JSON.
+
+    Бот сам поднимает БД, очередь фидбэка и хранилище сессий, поэтому
+    отдельный процесс FastAPI для него не нужен. Пакет app импортируется
+    только в этом режиме.
+    """
+
+    def __init__(self):
+        self.service = None
+        self.session_factory = None
+
+    async def open(self):
+        from app.database_fixed import init_db, AsyncSessionLocal
+        from app.interview_service import interview_service
+
+        init_db()
+        self.session_factory = AsyncSessionLocal
+        self.service = interview_service
+        await self.service.startup()
+
+    async def close(self):
+        from app.database_fixed import async_engine
+
+        if self.service is not None:
+            await self.service.shutdown()
+            await async_engine.dispose()
+            self.service = None
+
+    async def start_interview(self, user_id: str, platform: str) -> dict:
+        async with self.session_factory() as db:
+            return await self.service.start(db, user_id, platform)
+
+    async def set_position(self, session_id: str, position: str, user_id: str) -> dict:
+        async with self.session_factory() as db:
+            return await self.service.set_position(db, session_id, position, user_id)
+
+    async def answer(self, session_id: str, answer: str, user_id: str, question_index: int = None) -> dict:
+        async with self.session_factory() as db:
+            return await self.service.answer(db, session_id, answer, question_index=question_index)
+
+    async def feedback_events(self, session_id: str):
+        async with self.session_factory() as db:
+            events = await self.service.feedback_events(db, session_id)
+        async for event, data in events:
+            yield event, data
+
+    async def wait_feedback(self, session_id: str, wait: float) -> dict:
+        async with self.session_factory() as db:
+            return await self.service.get_feedback(db, session_id, wait)
+
+    async def history(self, user_id: str, limit: int) -> dict:
+        async with self.session_factory() as db:
+            return await self.service.history(db, user_id, limit=limit)
+
+
+def create_backend(mode: str, base_url: str):
+    """"http" - через API, "embedded" - InterviewService в процессе бота"""
+    if mode == "embedded":
+        return EmbeddedBackend()
+    if mode == "http":
+        return HttpBackend(base_url)
+    raise ValueError(f"Неизвестный BOT_MODE: {mode}")
@@ -0,0 +1,234 @@
+import asyncio
+import itertools
+import logging
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+
+from app.limits import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих сообщений: меньше - раньше
+PRIORITY_HIGH = 0     # следующий вопрос, ошибки - кандидат ждет ответа
+PRIORITY_NORMAL = 1   # фидбэк
+PRIORITY_LOW = 2      # история, промежуточные правки потокового фидбэка
+
+CHAT_BUCKETS_MAX = 10000
+FENCE = "```"
+
+
+def split_head(text: str, limit: int) -> tuple:
+    """Первое сообщение не длиннее limit и остаток текста.
+
+    Режет по абзацам, затем по строкам, затем по словам и только в крайнем
+    случае посреди слова. Разрезанный блок кода закрывается и открывается
+    заново в остатке.
+    """
+    if len(text) <= limit:
+        return text, ""
+    window = limit - len(FENCE) - 1  # запас на закрытие блока кода
+    cut = -1
+    for separator in ("\n\n", "\n", " "):
+        cut = text.rfind(separator, 0, window)
+        if cut > window // 2:
+            break
+    if cut <= window // 2:
+        # Разделитель только в начале окна - короткое первое сообщение хуже разреза посреди слова
+        cut = window
+    head, rest = text[:cut].rstrip(), text[cut:].lstrip()
+    if head.count(FENCE) % 2:
+        head += "\n" + FENCE
+        rest = FENCE + "\n" + rest
+    return head, rest
+
+
+def split_message(text: str, limit: int) -> list:
+    """Разбиение длинного текста на сообщения не длиннее limit (см. split_head)"""
+    parts = []
+    rest = text.strip()
+    while rest:
+        head, rest = split_head(rest, limit)
+        parts.append(head)
+    return parts
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "chat_id", "method", "kwargs", "future", "key")
+
+    def __init__(self, priority, seq, chat_id, method, kwargs, future, key=None):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.method = method
+        self.kwargs = kwargs
+        self.future = future
+        self.key = key
+
+
+class Outbox:
+    """Очередь исходящих сообщений бота с учетом лимитов Telegram.
+
+    Общий token bucket держит суммарную скорость бота, bucket каждого чата -
+    скорость в одном чате. Из готовых к отправке сообщений первым уходит
+    сообщение с меньшим priority, при равном - отправленное раньше. Одновременно
+    в одном чате выполняется не больше одного запроса, поэтому порядок сообщений
+    в чате сохраняется. На 429 очередь выдерживает retry_after и повторяет
+    сообщение, а не теряет его. Повторные правки одного сообщения, еще не
+    ушедшие в Telegram, склеиваются в одну с последним текстом.
+    """
+
+    def __init__(self, rate: float, chat_rate: float, chat_burst: float, max_retries: int = 5):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.bot = None
+        self._global = TokenBucket(rate, rate)
+        self._chats = {}        # chat_id -> TokenBucket
+        self._busy = set()      # чаты с запросом в полете
+        self._jobs = []
+        self._edits = {}        # (chat_id, message_id) -> ожидающая правка
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._inflight = set()
+        self._task = None
+        self.sent = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    async def start(self, bot):
+        self.bot = bot
+        self._task = asyncio.create_task(self._dispatcher())
+
+    async def stop(self, timeout: float = 10):
+        """Дослать очередь (не дольше timeout) и остановить диспетчер"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._jobs or self._inflight) and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for job in self._jobs:
+            job.future.cancel()
+        self._jobs = []
+
+    async def send(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL, **kwargs):
+        """Отправить сообщение; возвращает telegram.Message после фактической отправки"""
+        job = self._submit(chat_id, "send_message", dict(chat_id=chat_id, text=text, **kwargs), priority)
+        return await asyncio.shield(job.future)
+
+    async def edit(self, message, text: str, priority: int = PRIORITY_LOW):
+        """Изменить текст сообщения; ожидающая правка того же сообщения заменяется новой"""
+        key = (message.chat_id, message.message_id)
+        job = self._edits.get(key)
+        if job is not None:
+            job.kwargs["text"] = text
+            job.priority = min(job.priority, priority)
+            self.coalesced += 1
+            return await asyncio.shield(job.future)
+        kwargs = dict(chat_id=message.chat_id, message_id=message.message_id, text=text)
+        job = self._submit(message.chat_id, "edit_message_text", kwargs, priority, key)
+        return await asyncio.shield(job.future)
+
+    def _submit(self, chat_id, method, kwargs, priority, key=None):
+        job = _Job(priority, next(self._seq), chat_id, method, kwargs, asyncio.get_running_loop().create_future(), key)
+        self._jobs.append(job)
+        if key is not None:
+            self._edits[key] = job
+        self._changed.set()
+        return job
+
+    def _bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_MAX:
+                # Чаты без сообщений в очереди и в полете забываются, их лимит уже восстановился
+                pending = {job.chat_id for job in self._jobs} | self._busy
+                self._chats = {cid: b for cid, b in self._chats.items() if cid in pending}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _pick(self):
+        """Самое приоритетное сообщение, чат которого готов; иначе (None, сколько ждать).
+
+        Приоритет действует между чатами: внутри чата сообщения уходят в порядке отправки.
+        """
+        heads = {}
+        for job in self._jobs:
+            if job.chat_id not in heads or job.seq < heads[job.chat_id].seq:
+                heads[job.chat_id] = job
+        wait = None
+        for job in sorted(heads.values(), key=lambda j: (j.priority, j.seq)):
+            if job.chat_id in self._busy:
+                continue
+            delay = self._bucket(job.chat_id).try_acquire()
+            if delay == 0:
+                return job, 0
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _dispatcher(self):
+        have_token = False
+        while True:
+            self._changed.clear()
+            if not self._jobs:
+                await self._changed.wait()
+                continue
+            # Сначала общий токен, потом выбор: приоритеты сравниваются в момент отправки
+            if not have_token:
+                await self._global.acquire()
+                have_token = True
+            job, wait = self._pick()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            have_token = False
+            self._jobs.remove(job)
+            if job.key is not None:
+                self._edits.pop(job.key, None)
+            self._busy.add(job.chat_id)
+            task = asyncio.create_task(self._deliver(job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, job):
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await getattr(self.bot, job.method)(**job.kwargs)
+                    self.sent += 1
+                    if not job.future.done():
+                        job.future.set_result(result)
+                    return
+                except RetryAfter as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = e.retry_after
+                    delay = delay.total_seconds() if isinstance(delay, timedelta) else float(delay)
+                    logger.warning("Flood limit, повтор после паузы", extra={"chat_id": job.chat_id, "retry_after": delay})
+                    self.retries += 1
+                    # 429 означает, что бот уперся в лимит - притормаживаем и чат, и всю очередь
+                    self._global.pause(delay)
+                    self._bucket(job.chat_id).pause(delay)
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._busy.discard(job.chat_id)
+            self._changed.set()
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._jobs),
+            "inflight": len(self._inflight),
+            "sent": self.sent,
+            "coalesced_edits": self.coalesced,
+            "retries": self.retries,
+        }
@@ -1,248 +1,397 @@
-import os
-import requests
-from telegram import Update, ReplyKeyboardRemove
-from telegram.ext import (
-    Application, CommandHandler, MessageHandler, 
-    filters, ContextTypes, ConversationHandler
-)
-import logging
-from datetime import datetime
-
-# Настройки
-API_BASE_URL = "http://127.0.0.1:8000/api"  # URL вашего FastAPI
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_BOT_TOKEN = "81....."
-
-# Состояния разговора
-START, POSITION, INTERVIEW = range(3)
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-class TelegramBot:
-    def __init__(self):
-        self.application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-        self.setup_handlers()
-
-    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """Начало работы с ботом"""
-        user = update.message.from_user
-        context.user_data['user_id'] = str(user.id)
-        
-        await update.message.reply_text(
-            "🧠 Добро пожаловать в Нейро-HR бот!\n\n"
-            "Я проведу техническое собеседование и дам подробную обратную связь.\n\n"
-            "Для начала собеседования отправьте /interview\n"
-            "Для просмотра истории отправьте /history",
-            reply_markup=ReplyKeyboardRemove()
-        )
-        return START
-
-    async def start_interview(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """Начало нового собеседования"""
-        try:
-            user_id = context.user_data.get('user_id')
-            
-            # Создаем сессию через API
-            response = requests.post(f"{API_BASE_URL}/start_interview", json={
-                "start": True,
-                "user_id": user_id,
-                "platform": "telegram"
-            })
-            
-            if response.status_code == 200:
-                data = response.json()
-                context.user_data['session_id'] = data['session_id']
-                
-                await update.message.reply_text(
-                    data['message'],
-                    reply_markup=ReplyKeyboardRemove()
-                )
-                return POSITION
-            else:
-                await update.message.reply_text("❌ Ошибка при запуске собеседования. Попробуйте позже.")
-                return START
-        except Exception as e:
-            logger.error(f"Error starting interview: {e}")
-            await update.message.reply_text("❌ Ошибка при запуске собеседования. Попробуйте позже.")
-            return START
-
-    async def set_position(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """Установка позиции для собеседования"""
-        try:
-            position = update.message.text
-            session_id = context.user_data.get('session_id')
-            user_id = context.user_data.get('user_id')
-            
-            # Устанавливаем позицию через API
-            response = requests.post(f"{API_BASE_URL}/set_position", json={
-                "session_id": session_id,
-                "position": position,
-                "user_id": user_id
-            })
-            
-            if response.status_code == 200:
-                data = response.json()
-                context.user_data['current_question'] = 1
-                context.user_data['total_questions'] = data['total_questions']
-                context.user_data['position'] = data['position']
-                
-                await update.message.reply_text(
-                    f"🎯 Позиция: {data['position']}\n"
-                    f"📊 Вопрос {data['current_question']} из {data['total_questions']}:\n\n"
-                    f"{data['question']}",
-                    reply_markup=ReplyKeyboardRemove()
-                )
-                return INTERVIEW
-            else:
-                await update.message.reply_text("❌ Ошибка при установке позиции. Попробуйте еще раз.")
-                return POSITION
-        except Exception as e:
-            logger.error(f"Error setting position: {e}")
-            await update.message.reply_text("❌ Ошибка при установке позиции. Попробуйте еще раз.")
-            return POSITION
-
-    async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """Обработка ответа на вопрос"""
-        try:
-            answer = update.message.text
-            session_id = context.user_data.get('session_id')
-            user_id = context.user_data.get('user_id')
-
-            # Отправляем ответ через API
-            response = requests.post(f"{API_BASE_URL}/answer_question", json={
-                "session_id": session_id,
-                "answer": answer,
-                "user_id": user_id
-            })
-
-            if response.status_code == 200:
-                data = response.json()
-
-                if data.get('interview_complete'):
-                    # Собеседование завершено
-                    feedback = data['feedback']
-
-                    # Проверяем, не является ли фидбэк ошибкой
-                    if "Ошибка:" in feedback:
-                        await update.message.reply_text(
-                            "❌ Произошла ошибка при обработке результатов. Пожалуйста, начните собеседование заново.\n\n"
-                            "Для нового собеседования отправьте /interview",
-                            reply_markup=ReplyKeyboardRemove()
-                        )
-                        return START
-
-                    # Разбиваем фидбэк на части если он слишком длинный для Telegram
-                    if len(feedback) > 4096:
-                        for i in range(0, len(feedback), 4096):
-                            part = feedback[i:i + 4096]
-                            await update.message.reply_text(part)
-                    else:
-                        await update.message.reply_text(feedback)
-
-                    await update.message.reply_text(
-                        "✅ Собеседование завершено!\n\n"
-                        "Для нового собеседования отправьте /interview\n"
-                        "Для просмотра истории отправьте /history",
-                        reply_markup=ReplyKeyboardRemove()
-                    )
-                    return START
-                else:
-                    # Следующий вопрос
-                    context.user_data['current_question'] = data['current_question']
-
-                    await update.message.reply_text(
-                        f"📊 Вопрос {data['current_question']} из {data['total_questions']}:\n\n"
-                        f"{data['question']}",
-                        reply_markup=ReplyKeyboardRemove()
-                    )
-                    return INTERVIEW
-            else:
-                await update.message.reply_text("❌ Ошибка при обработке ответа. Попробуйте еще раз.")
-                return INTERVIEW
-        except Exception as e:
-            logger.error(f"Error handling answer: {e}")
-            await update.message.reply_text("❌ Ошибка при обработке ответа. Попробуйте еще раз.")
-            return INTERVIEW
-
-    async def show_history(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Показать историю собеседований"""
-        try:
-            user_id = context.user_data.get('user_id')
-            
-            response = requests.get(f"{API_BASE_URL}/user/{user_id}/sessions")
-            
-            if response.status_code == 200:
-                data = response.json()
-                sessions = data.get('sessions', [])
-                
-                if not sessions:
-                    await update.message.reply_text("📝 У вас еще не было собеседований.")
-                    return START
-                
-                message = "📋 История ваших собеседований:\n\n"
-                
-                for session in sessions[-5:]:  # Последние 5 собеседований
-                    status = "✅ Завершено" if session['status'] == 'completed' else "🟡 В процессе"
-                    date = datetime.fromisoformat(session['created_at'].replace('Z', '+00:00')).strftime("%d.%m.%Y %H:%M")
-                    message += f"• {session['position']} - {status}\n"
-                    message += f"  Дата: {date}\n"
-                    if session['status'] == 'completed':
-                        message += f"  Вопросов: {len(session['questions'])}\n\n"
-                
-                await update.message.reply_text(message)
-            else:
-                await update.message.reply_text("❌ Ошибка при получении истории.")
-        except Exception as e:
-            logger.error(f"Error showing history: {e}")
-            await update.message.reply_text("❌ Ошибка при получении истории.")
-        
-        return START
-
-    async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        """Отмена собеседования"""
-        await update.message.reply_text(
-            "Собеседование отменено. Для начала нового отправьте /start",
-            reply_markup=ReplyKeyboardRemove()
-        )
-        return ConversationHandler.END
-
-    def setup_handlers(self):
-        """Настройка обработчиков"""
-        conv_handler = ConversationHandler(
-            entry_points=[CommandHandler("start", self.start)],
-            states={
-                START: [
-                    CommandHandler("interview", self.start_interview),
-                    CommandHandler("history", self.show_history),
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.start)
-                ],
-                POSITION: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.set_position)
-                ],
-                INTERVIEW: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_answer)
-                ],
-            },
-            fallbacks=[CommandHandler("cancel", self.cancel)],
-        )
-
-        self.application.add_handler(conv_handler)
-
-    def run(self):
-        """Запуск бота"""
-        print("🤖 Telegram бот запущен...")
-        self.application.run_polling()
-
-if __name__ == "__main__":
-    if not TELEGRAM_BOT_TOKEN:
-        print("❌ TELEGRAM_BOT_TOKEN не установлен в environment variables")
-        print("❌ Убедитесь, что переменная TELEGRAM_BOT_TOKEN установлена в .env файле")
-        exit(1)
-    
-    bot = TelegramBot()
+import time
+import asyncio
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import Response, PlainTextResponse
+from starlette.routing import Route
+from telegram import Update, ReplyKeyboardRemove
+from telegram.error import BadRequest
+from telegram.ext import (
+    Application, CommandHandler, MessageHandler, 
+    filters, ContextTypes, ConversationHandler
+)
+import logging
+from datetime import datetime
+
+from app.config import settings
+from app.logging_config import setup_logging
+from bot.backends import create_backend
+from bot.update_processor import ChatOrderedUpdateProcessor
+from bot.outbox import Outbox, split_head, split_message, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+# Long-poll фидбэка: ждем до FEEDBACK_WAIT секунд за запрос
+FEEDBACK_WAIT = 30
+FEEDBACK_POLL_ATTEMPTS = 10
+
+# Лимит длины сообщения Telegram и минимальный интервал между правками сообщения
+TELEGRAM_MESSAGE_LIMIT = 4096
+STREAM_EDIT_INTERVAL = 1.5
+
+# Состояния разговора
+START, POSITION, INTERVIEW = range(3)
+
+# Настройка логирования
+setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+class ProgressiveMessage:
+    """Сообщение, которое дописывается по мере поступления текста.
+
+    Правки делаются не чаще STREAM_EDIT_INTERVAL, при превышении лимита
+    Telegram текст переносится в новое сообщение.
+    """
+
+    def __init__(self, outbox: Outbox, chat_id: int, placeholder: str):
+        self.outbox = outbox
+        self.chat_id = chat_id
+        self.placeholder = placeholder
+        self.current = None
+        self.buffer = ""
+        self.shown = ""
+        self.last_edit = 0.0
+        self.text = ""
+
+    async def append(self, chunk: str):
+        self.text += chunk
+        self.buffer += chunk
+        while len(self.buffer) > TELEGRAM_MESSAGE_LIMIT:
+            head, self.buffer = split_head(self.buffer, TELEGRAM_MESSAGE_LIMIT)
+            await self._show(head, PRIORITY_NORMAL)
+            self.current = None
+            self.shown = ""
+        if time.monotonic() - self.last_edit >= STREAM_EDIT_INTERVAL:
+            await self._show(self.buffer)
+
+    async def start(self):
+        self.current = await self.outbox.send(self.chat_id, self.placeholder, PRIORITY_NORMAL)
+        self.shown = self.placeholder
+
+    async def finish(self):
+        await self._show(self.buffer, PRIORITY_NORMAL)
+
+    async def _show(self, text: str, priority: int = PRIORITY_LOW):
+        """Промежуточные правки идут с низким приоритетом, окончательный текст - с обычным"""
+        if not text.strip() or text == self.shown:
+            return
+        self.last_edit = time.monotonic()
+        if self.current is None:
+            self.current = await self.outbox.send(self.chat_id, text, PRIORITY_NORMAL)
+        else:
+            try:
+                await self.outbox.edit(self.current, text, priority)
+            except BadRequest as e:
+                # "Message is not modified" и подобные ошибки не критичны
+                logger.warning("Edit message failed", extra={"chat_id": self.chat_id, "error": repr(e)})
+        self.shown = text
+
+
+class TelegramBot:
+    def __init__(self, mode: str = None):
+        self.backend = create_backend(mode or settings.BOT_MODE, settings.BOT_API_BASE_URL)
+        self.outbox = Outbox(settings.BOT_SEND_RATE, settings.BOT_SEND_CHAT_RATE, settings.BOT_SEND_CHAT_BURST)
+        builder = (
+            Application.builder()
+            .token(settings.TELEGRAM_BOT_TOKEN)
+            .concurrent_updates(ChatOrderedUpdateProcessor(settings.BOT_CONCURRENT_UPDATES))
+            .connection_pool_size(settings.BOT_CONNECTION_POOL_SIZE)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+        )
+        if settings.BOT_TELEGRAM_API_URL:
+            api_url = settings.BOT_TELEGRAM_API_URL.rstrip("/")
+            builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+        self.application = builder.build()
+        self.setup_handlers()
+
+    async def post_init(self, application: Application):
+        """HTTP-клиент или встроенный сервис и очередь исходящих живут вместе с Application"""
+        await self.backend.open()
+        await self.outbox.start(application.bot)
+
+    async def post_shutdown(self, application: Application):
+        await self.outbox.stop()
+        await self.backend.close()
+
+    async def reply(self, update: Update, text: str, priority: int = PRIORITY_HIGH, **kwargs):
+        """Ответ в чат через очередь исходящих сообщений"""
+        return await self.outbox.send(update.effective_chat.id, text, priority, **kwargs)
+
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Начало работы с ботом"""
+        user = update.message.from_user
+        context.user_data['user_id'] = str(user.id)
+        
+        await self.reply(
+            update,
+            "🧠 Добро пожаловать в Нейро-HR бот!\n\n"
+            "Я проведу техническое собеседование и дам подробную обратную связь.\n\n"
+            "Для начала собеседования отправьте /interview\n"
+            "Для просмотра истории отправьте /history",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return START
+
+    async def start_interview(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Начало нового собеседования"""
+        try:
+            user_id = context.user_data.get('user_id')
+            
+            # Создаем сессию
+            data = await self.backend.start_interview(user_id, "telegram")
+            context.user_data['session_id'] = data['session_id']
+            
+            await self.reply(
+                update,
+                data['message'],
+                reply_markup=ReplyKeyboardRemove()
+            )
+            return POSITION
+        except Exception as e:
+            logger.error("Error starting interview", extra={"chat_id": update.effective_chat.id, "error": repr(e)})
+            await self.reply(update, "❌ Ошибка при запуске собеседования. Попробуйте позже.")
+            return START
+
+    async def set_position(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Установка позиции для собеседования"""
+        try:
+            position = update.message.text
+            session_id = context.user_data.get('session_id')
+            user_id = context.user_data.get('user_id')
+            
+            # Устанавливаем позицию
+            data = await self.backend.set_position(session_id, position, user_id)
+            context.user_data['current_question'] = 1
+            context.user_data['total_questions'] = data['total_questions']
+            context.user_data['position'] = data['position']
+            
+            await self.reply(
+                update,
+                f"🎯 Позиция: {data['position']}\n"
+                f"📊 Вопрос {data['current_question']} из {data['total_questions']}:\n\n"
+                f"{data['question']}",
+                reply_markup=ReplyKeyboardRemove()
+            )
+            return INTERVIEW
+        except Exception as e:
+            logger.error("Error setting position", extra={"chat_id": update.effective_chat.id, "error": repr(e)})
+            await self.reply(update, "❌ Ошибка при установке позиции. Попробуйте еще раз.")
+            return POSITION
+
+    async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Обработка ответа на вопрос"""
+        try:
+            answer = update.message.text
+            session_id = context.user_data.get('session_id')
+            user_id = context.user_data.get('user_id')
+
+            # Отправляем ответ; номер вопроса защищает от повторной записи при ретраях
+            current_question = context.user_data.get('current_question')
+            question_index = current_question - 1 if current_question else None
+            data = await self.backend.answer(session_id, answer, user_id, question_index)
+
+            if data.get('interview_complete'):
+                # Собеседование завершено, фидбэк приходит потоком и показывается по мере генерации
+                streamed = True
+                try:
+                    feedback = await self.stream_feedback(update, session_id)
+                except Exception as e:
+                    logger.warning("Feedback stream failed, falling back to polling", extra={"session_id": session_id, "error": repr(e)})
+                    streamed = False
+                    await self.reply(update, "⏳ Анализирую ваши ответы, это может занять немного времени...")
+                    feedback = await self.wait_feedback(session_id)
+
+                # Проверяем, не является ли фидбэк ошибкой
+                if "Ошибка:" in feedback:
+                    await self.reply(
+                        update,
+                        "❌ Произошла ошибка при обработке результатов. Пожалуйста, начните собеседование заново.\n\n"
+                        "Для нового собеседования отправьте /interview",
+                        reply_markup=ReplyKeyboardRemove()
+                    )
+                    return START
+
+                if not streamed:
+                    # Разбиваем фидбэк на части по абзацам, если он слишком длинный для Telegram
+                    for part in split_message(feedback, TELEGRAM_MESSAGE_LIMIT):
+                        await self.reply(update, part, PRIORITY_NORMAL)
+
+                await self.reply(
+                    update,
+                    "✅ Собеседование завершено!\n\n"
+                    "Для нового собеседования отправьте /interview\n"
+                    "Для просмотра истории отправьте /history",
+                    reply_markup=ReplyKeyboardRemove()
+                )
+                return START
+            else:
+                # Следующий вопрос
+                context.user_data['current_question'] = data['current_question']
+
+                await self.reply(
+                    update,
+                    f"📊 Вопрос {data['current_question']} из {data['total_questions']}:\n\n"
+                    f"{data['question']}",
+                    reply_markup=ReplyKeyboardRemove()
+                )
+                return INTERVIEW
+        except Exception as e:
+            logger.error("Error handling answer", extra={"chat_id": update.effective_chat.id, "error": repr(e)})
+            await self.reply(update, "❌ Ошибка при обработке ответа. Попробуйте еще раз.")
+            return INTERVIEW
+
+    async def stream_feedback(self, update: Update, session_id: str) -> str:
+        """Получение фидбэка потоком с постепенным обновлением сообщения"""
+        progress = ProgressiveMessage(self.outbox, update.effective_chat.id, "⏳ Анализирую ваши ответы...")
+        done = False
+        events = self.backend.feedback_events(session_id)
+        try:
+            async for event, data in events:
+                if progress.current is None:
+                    await progress.start()
+                if event == "chunk":
+                    await progress.append(data["text"])
+                elif event == "done":
+                    done = True
+                    break
+                elif event == "pending":
+                    raise RuntimeError("feedback is not ready yet")
+        finally:
+            await events.aclose()
+
+        if not done:
+            raise RuntimeError("feedback stream ended unexpectedly")
+        await progress.finish()
+        return progress.text
+
+    async def wait_feedback(self, session_id: str) -> str:
+        """Ожидание фонового фидбэка через long-poll"""
+        for _ in range(FEEDBACK_POLL_ATTEMPTS):
+            data = await self.backend.wait_feedback(session_id, FEEDBACK_WAIT)
+            if data['status'] != 'evaluating':
+                return data['feedback'] or ""
+        return "Ошибка: не удалось дождаться результатов собеседования."
+
+    async def show_history(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показать историю собеседований"""
+        try:
+            user_id = context.user_data.get('user_id')
+            
+            data = await self.backend.history(user_id, limit=5)
+            sessions = data.get('sessions', [])
+            
+            if not sessions:
+                await self.reply(update, "📝 У вас еще не было собеседований.", PRIORITY_LOW)
+                return START
+            
+            message = "📋 История ваших собеседований:\n\n"
+            
+            for session in sessions:  # Последние 5 собеседований, новые первыми
+                status = {'completed': "✅ Завершено", 'expired': "⌛ Закрыто"}.get(session['status'], "🟡 В процессе")
+                created_at = session['created_at']
+                if isinstance(created_at, str):  # по HTTP дата приходит строкой ISO
+                    created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                date = created_at.strftime("%d.%m.%Y %H:%M")
+                message += f"• {session['position']} - {status}\n"
+                message += f"  Дата: {date}\n"
+                if session['status'] == 'completed':
+                    message += f"  Вопросов: {session['current_question']}\n\n"
+            
+            await self.reply(update, message, PRIORITY_LOW)
+        except Exception as e:
+            logger.error("Error showing history", extra={"chat_id": update.effective_chat.id, "error": repr(e)})
+            await self.reply(update, "❌ Ошибка при получении истории.", PRIORITY_LOW)
+        
+        return START
+
+    async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        """Отмена собеседования"""
+        await self.reply(
+            update,
+            "Собеседование отменено. Для начала нового отправьте /start",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return ConversationHandler.END
+
+    def setup_handlers(self):
+        """Настройка обработчиков"""
+        conv_handler = ConversationHandler(
+            entry_points=[CommandHandler("start", self.start)],
+            states={
+                START: [
+                    CommandHandler("interview", self.start_interview),
+                    CommandHandler("history", self.show_history),
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.start)
+                ],
+                POSITION: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.set_position)
+                ],
+                INTERVIEW: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_answer)
+                ],
+            },
+            fallbacks=[CommandHandler("cancel", self.cancel)],
+        )
+
+        self.application.add_handler(conv_handler)
+
+    async def webhook(self, request):
+        """Прием обновления от Telegram: только кладем его в очередь Application и сразу отвечаем 200"""
+        secret = settings.BOT_WEBHOOK_SECRET
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return Response(status_code=403)
+        update = Update.de_json(await request.json(), self.application.bot)
+        await self.application.update_queue.put(update)
+        return Response()
+
+    async def run_webhook(self):
+        """Webhook на собственном ASGI-сервере (uvicorn), без отдельного веб-сервера PTB"""
+        async def health(request):
+            return PlainTextResponse("ok")
+
+        server = uvicorn.Server(uvicorn.Config(
+            Starlette(routes=[
+                Route(settings.BOT_WEBHOOK_PATH, self.webhook, methods=["POST"]),
+                Route("/healthz", health),
+            ]),
+            host=settings.BOT_WEBHOOK_LISTEN,
+            port=settings.BOT_WEBHOOK_PORT,
+            log_level="warning"
+        ))
+
+        # post_init/post_shutdown вызывает только run_polling, здесь - вручную
+        async with self.application:
+            await self.post_init(self.application)
+            try:
+                await self.application.start()
+                if settings.BOT_WEBHOOK_URL:
+                    await self.application.bot.set_webhook(
+                        url=settings.BOT_WEBHOOK_URL.rstrip("/") + settings.BOT_WEBHOOK_PATH,
+                        secret_token=settings.BOT_WEBHOOK_SECRET or None,
+                        allowed_updates=Update.ALL_TYPES,
+                        max_connections=100
+                    )
+                await server.serve()
+                await self.application.stop()
+            finally:
+                await self.post_shutdown(self.application)
+
+    def run(self):
+        """Запуск бота"""
+        logger.info("Telegram бот запущен", extra={
+            "updates": settings.BOT_UPDATES,
+            "mode": settings.BOT_MODE,
+            "concurrent_updates": self.application.update_processor.max_concurrent_updates
+        })
+        if settings.BOT_UPDATES == "webhook":
+            asyncio.run(self.run_webhook())
+        else:
+            self.application.run_polling()
+
+if __name__ == "__main__":
+    if not settings.TELEGRAM_BOT_TOKEN:
+        print("❌ TELEGRAM_BOT_TOKEN не установлен в environment variables")
+        print("❌ Убедитесь, что переменная TELEGRAM_BOT_TOKEN установлена в .env файле")
+        exit(1)
+    
+    bot = TelegramBot()
     bot.run()
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""Заглушка Telegram для локальной проверки webhook-режима бота.
+
+Поднимает фейковый Bot API (getMe, setWebhook, sendMessage, editMessageText)
+и прогоняет через webhook бота полные собеседования от N кандидатов
+одновременно: /start -> /interview -> позиция -> ответы до фидбэка.
+
+    BOT_UPDATES=webhook BOT_TELEGRAM_API_URL=http://127.0.0.1:8081 \\
+    BOT_WEBHOOK_URL=http://127.0.0.1:8443 TELEGRAM_BOT_TOKEN=123:standin \\
+        python -m bot.telegram_standin --chats 100
+
+Сам бот запускается отдельно (python -m bot.telegram_bot) с теми же переменными.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from urllib.parse import parse_qs
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Нейро-HR", "username": "neuro_hr_bot"}
+
+
+class StandinTelegram:
+    """Фейковый Bot API: сообщения бота складываются в очередь чата"""
+
+    def __init__(self, flood_limit: float = 0):
+        self.inboxes = {}
+        self.message_ids = itertools.count(1)
+        self.update_ids = itertools.count(1)
+        self.calls = 0
+        self.flood_limit = flood_limit  # сообщений в секунду, сверх - 429 как у Telegram
+        self.window = (0, 0)            # (секунда, число сообщений в ней)
+        self.rejected = 0
+
+    def _flooded(self) -> bool:
+        second = int(time.monotonic())
+        start, count = self.window
+        count = count + 1 if start == second else 1
+        self.window = (second, count)
+        return bool(self.flood_limit) and count > self.flood_limit
+
+    def inbox(self, chat_id: int) -> asyncio.Queue:
+        return self.inboxes.setdefault(chat_id, asyncio.Queue())
+
+    def _message(self, chat_id: int, text: str, message_id: int = None, sender: dict = None) -> dict:
+        return {
+            "message_id": message_id or next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": sender or BOT_USER,
+            "text": text,
+        }
+
+    async def api(self, request):
+        self.calls += 1
+        method = request.path_params["method"]
+        body = await request.body()
+        if request.headers.get("content-type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("setWebhook", "deleteWebhook"):
+            result = True
+        elif method in ("sendMessage", "editMessageText"):
+            if self._flooded():
+                self.rejected += 1
+                return JSONResponse({
+                    "ok": False, "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1}
+                }, 429)
+            chat_id = int(params["chat_id"])
+            message_id = int(params["message_id"]) if "message_id" in params else None
+            result = self._message(chat_id, params["text"], message_id)
+            self.inbox(chat_id).put_nowait((method, params["text"]))
+        else:
+            return JSONResponse({"ok": False, "error_code": 404, "description": f"{method} не поддерживается"}, 404)
+        return JSONResponse({"ok": True, "result": result})
+
+    def update(self, chat_id: int, text: str) -> dict:
+        user = {"id": chat_id, "is_bot": False, "first_name": f"Кандидат {chat_id}"}
+        message = self._message(chat_id, text, sender=user)
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self.update_ids), "message": message}
+
+
+async def interview(standin: StandinTelegram, client: httpx.AsyncClient, webhook: str, headers: dict,
+                    chat_id: int, position: str, timeout: float, latencies: list):
+    inbox = standin.inbox(chat_id)
+
+    async def say(text: str):
+        response = await client.post(webhook, json=standin.update(chat_id, text), headers=headers)
+        response.raise_for_status()
+
+    async def reply(predicate) -> str:
+        while True:
+            _, text = await asyncio.wait_for(inbox.get(), timeout=timeout)
+            if predicate(text):
+                return text
+
+    async def step(text: str, predicate) -> str:
+        started = time.perf_counter()
+        await say(text)
+        result = await reply(predicate)
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    await step("/start", lambda t: "/interview" in t)
+    await step("/interview", lambda t: "позицию" in t)
+    text = await step(position, lambda t: "Вопрос" in t)
+    answer = 0
+    while "Собеседование завершено" not in text:
+        answer += 1
+        text = await step(
+            f"Ответ {answer}: подробное объяснение с примерами",
+            lambda t: t.startswith("📊 Вопрос") or "Собеседование завершено" in t or t.startswith("❌")
+        )
+        if text.startswith("❌"):
+            raise RuntimeError(text)
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+async def main(args):
+    standin = StandinTelegram(args.flood_limit)
+    server = uvicorn.Server(uvicorn.Config(
+        Starlette(routes=[Route("/bot{token}/{method}", standin.api, methods=["GET", "POST"])]),
+        host=args.host, port=args.port, log_level="warning"
+    ))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"Bot API заглушка: http://{args.host}:{args.port}, жду бота на {args.bot_health}")
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(args.bot_health)).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    latencies = []
+    limits = httpx.Limits(max_connections=args.chats, max_keepalive_connections=args.chats)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        results = await asyncio.gather(*[
+            interview(standin, client, args.webhook, headers, 1000 + i, args.position, args.timeout, latencies)
+            for i in range(args.chats)
+        ], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    errors = [repr(r) for r in results if isinstance(r, Exception)]
+    print(json.dumps({
+        "chats": args.chats,
+        "completed": args.chats - len(errors),
+        "errors": errors[:5],
+        "elapsed_s": round(elapsed, 3),
+        "interviews_per_s": round((args.chats - len(errors)) / elapsed, 2),
+        "steps": len(latencies),
+        "step_p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "step_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "step_max_ms": round(max(latencies, default=0) * 1000, 1),
+        "step_mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        "bot_api_calls": standin.calls,
+        "rejected_429": standin.rejected,
+    }, ensure_ascii=False, indent=2))
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заглушка Telegram Bot API и нагрузка на webhook бота")
+    parser.add_argument("--chats", type=int, default=20, help="число одновременных кандидатов")
+    parser.add_argument("--webhook", default="http://127.0.0.1:8443/telegram", help="адрес webhook бота")
+    parser.add_argument("--bot-health", default="http://127.0.0.1:8443/healthz",
+                        help="проверка готовности бота; бот запускается после заглушки (ему нужен getMe)")
+    parser.add_argument("--secret", default="", help="BOT_WEBHOOK_SECRET бота")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081, help="порт фейкового Bot API")
+    parser.add_argument("--flood-limit", type=float, default=0,
+                        help="отвечать 429 сверх этого числа сообщений в секунду (0 - без лимита)")
+    parser.add_argument("--position", default="Python developer")
+    parser.add_argument("--timeout", type=float, default=120, help="ожидание ответа бота, секунд")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+import logging
+from collections import deque
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений: разные чаты - одновременно, один чат - строго по очереди.
+
+    ConversationHandler рассчитан на последовательную обработку, поэтому два
+    сообщения одного кандидата не должны проходить через него одновременно.
+    Обновления чата ставятся в его очередь: место в max_concurrent_updates
+    держит только первое, оно и обрабатывает остальные по порядку. Серия
+    сообщений одного чата занимает одно место и не задерживает другие чаты.
+    """
+
+    __slots__ = ("_queues",)
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._queues = {}  # chat_id -> deque корутин обновлений, ждущих обработки
+
+    async def do_process_update(self, update, coroutine):
+        chat = getattr(update, "effective_chat", None)
+        if chat is None:
+            await coroutine
+            return
+
+        queue = self._queues.get(chat.id)
+        if queue is not None:
+            # Чат уже обрабатывается - обновление ждет в его очереди и освобождает место
+            queue.append(coroutine)
+            return
+
+        queue = self._queues[chat.id] = deque([coroutine])
+        try:
+            while queue:
+                try:
+                    await queue.popleft()
+                except Exception as e:
+                    # Ошибка одного обновления не должна оставить остальные сообщения чата без обработки
+                    logger.error("Ошибка обработки обновления", extra={"chat_id": chat.id, "error": repr(e)})
+        finally:
+            del self._queues[chat.id]
+            # Остановка прервала обработку - оставшиеся корутины закрываются без выполнения
+            for pending in queue:
+                pending.close()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
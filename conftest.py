@@ -0,0 +1,62 @@
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# Настройки читаются при импорте app.config: ключ и тестовая БД задаются до него
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='neurohr-test-')}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+
+@pytest.fixture
+def client():
+    """TestClient приложения с фейковым Gemini; client.portal.call выполняет корутины в цикле приложения"""
+    from fastapi.testclient import TestClient
+    from bench.fake_gemini import install_fake_gemini
+    from app.main import app
+
+    install_fake_gemini(latency=0.01, jitter=0, seed=1)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def start_session(client, position: str, user_id: str = None) -> str:
+    """Новая сессия с выбранной позицией"""
+    session_id = client.post("/api/start_interview", json={"start": True, "user_id": user_id}).json()["session_id"]
+    client.post("/api/set_position", json={"session_id": session_id, "position": position})
+    return session_id
+
+
+def complete_session(client, session_id: str):
+    """Ответить на все вопросы и дождаться фидбэка"""
+    for index in range(10):
+        client.post("/api/answer_question", json={
+            "session_id": session_id, "answer": f"ответ {index}", "question_index": index
+        })
+    assert client.get(f"/api/session/{session_id}/feedback", params={"wait": 10}).json()["status"] == "completed"
+
+
+def set_sessions(client, session_ids: list, **values):
+    """Записать значения колонок сессий напрямую в БД"""
+    from sqlalchemy import update
+    from app.database_fixed import AsyncSessionLocal, InterviewSessionDB
+
+    async def apply():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(InterviewSessionDB).where(
+                InterviewSessionDB.session_id.in_(session_ids)
+            ).values(**values))
+            await db.commit()
+
+    client.portal.call(apply)
+
+
+def archive_sessions(client, session_ids: list, batch_size: int = 100) -> int:
+    """Состарить сессии и выполнить проход архивации, как фоновое обслуживание; число перенесенных"""
+    from app.maintenance import SessionMaintenance
+
+    set_sessions(client, session_ids, updated_at=datetime(2000, 1, 1))
+    maintenance = SessionMaintenance(idle_ttl=0, archive_after_days=1, interval=0, batch_size=batch_size)
+    return client.portal.call(maintenance.archive)
@@ -0,0 +1,50 @@
+"""initial interview_sessions schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # База могла быть создана раньше через init_db() - тогда таблица уже есть
+    if sa.inspect(op.get_bind()).has_table("interview_sessions"):
+        return
+
+    op.create_table(
+        "interview_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.String()),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("platform", sa.String()),
+        sa.Column("position", sa.String()),
+        sa.Column("questions", sa.Text()),
+        sa.Column("answers", sa.Text()),
+        sa.Column("current_question", sa.Integer()),
+        sa.Column("status", sa.String()),
+        sa.Column("feedback", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_interview_sessions_id", "interview_sessions", ["id"])
+    op.create_index("ix_interview_sessions_session_id", "interview_sessions", ["session_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_interview_sessions_session_id", table_name="interview_sessions")
+    op.drop_index("ix_interview_sessions_id", table_name="interview_sessions")
+    op.drop_table("interview_sessions")
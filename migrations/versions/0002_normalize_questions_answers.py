@@ -0,0 +1,130 @@
+"""move questions/answers JSON blobs into interview_questions/interview_answers
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:30:00
+
+"""
+import json
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+CHILD_TABLES = ("interview_questions", "interview_answers")
+BLOB_COLUMNS = {"interview_questions": "questions", "interview_answers": "answers"}
+
+
+def _child_table(name: str) -> sa.Table:
+    return sa.table(
+        name,
+        sa.column("session_id", sa.String()),
+        sa.column("idx", sa.Integer()),
+        sa.column("text", sa.Text()),
+        sa.column("created_at", sa.DateTime()),
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Таблицы могли быть уже созданы init_db() новой версией приложения
+    for name in CHILD_TABLES:
+        if not inspector.has_table(name):
+            op.create_table(
+                name,
+                sa.Column("id", sa.Integer(), primary_key=True),
+                sa.Column(
+                    "session_id", sa.String(),
+                    sa.ForeignKey("interview_sessions.session_id", ondelete="CASCADE"),
+                    nullable=False,
+                ),
+                sa.Column("idx", sa.Integer(), nullable=False),
+                sa.Column("text", sa.Text(), nullable=False),
+                sa.Column("created_at", sa.DateTime()),
+                sa.UniqueConstraint("session_id", "idx", name=f"uq_{name}_session_idx"),
+            )
+
+    session_columns = {c["name"] for c in inspector.get_columns("interview_sessions")}
+    if not {"questions", "answers"} <= session_columns:
+        return
+
+    sessions = sa.table(
+        "interview_sessions",
+        sa.column("session_id", sa.String()),
+        sa.column("questions", sa.Text()),
+        sa.column("answers", sa.Text()),
+        sa.column("created_at", sa.DateTime()),
+    )
+    tables = {name: _child_table(name) for name in CHILD_TABLES}
+    # Сессии, для которых строки уже есть (созданы новой версией), не трогаем
+    converted = {
+        name: {row[0] for row in bind.execute(sa.select(tables[name].c.session_id).distinct())}
+        for name in CHILD_TABLES
+    }
+
+    result = bind.execution_options(stream_results=True).execute(
+        sa.select(sessions.c.session_id, sessions.c.questions, sessions.c.answers, sessions.c.created_at)
+    )
+    buffers = {name: [] for name in CHILD_TABLES}
+    rows = result.fetchmany(BATCH_SIZE)
+    while rows:
+        for session_id, questions, answers, created_at in rows:
+            blobs = {"interview_questions": questions, "interview_answers": answers}
+            for name in CHILD_TABLES:
+                if not blobs[name] or session_id in converted[name]:
+                    continue
+                buffers[name].extend(
+                    {"session_id": session_id, "idx": i, "text": text, "created_at": created_at or datetime.utcnow()}
+                    for i, text in enumerate(json.loads(blobs[name]))
+                )
+        rows = result.fetchmany(BATCH_SIZE)
+        for name in CHILD_TABLES:
+            if buffers[name] and (len(buffers[name]) >= BATCH_SIZE or not rows):
+                op.bulk_insert(tables[name], buffers[name])
+                buffers[name] = []
+
+    with op.batch_alter_table("interview_sessions") as batch_op:
+        batch_op.drop_column("questions")
+        batch_op.drop_column("answers")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    with op.batch_alter_table("interview_sessions") as batch_op:
+        batch_op.add_column(sa.Column("questions", sa.Text()))
+        batch_op.add_column(sa.Column("answers", sa.Text()))
+
+    sessions = sa.table(
+        "interview_sessions",
+        sa.column("session_id", sa.String()),
+        sa.column("questions", sa.Text()),
+        sa.column("answers", sa.Text()),
+    )
+    for name in CHILD_TABLES:
+        table = _child_table(name)
+        collected = {}
+        for session_id, text in bind.execute(
+            sa.select(table.c.session_id, table.c.text).order_by(table.c.session_id, table.c.idx)
+        ):
+            collected.setdefault(session_id, []).append(text)
+        column = BLOB_COLUMNS[name]
+        for session_id, items in collected.items():
+            bind.execute(
+                sessions.update()
+                .where(sessions.c.session_id == session_id)
+                .values({column: json.dumps(items, ensure_ascii=False)})
+            )
+        op.drop_table(name)
@@ -0,0 +1,33 @@
+"""composite index for user history: (user_id, created_at DESC)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_interview_sessions_user_created"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    indexes = {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("interview_sessions")}
+    if INDEX_NAME in indexes:
+        return
+    op.create_index(INDEX_NAME, "interview_sessions", ["user_id", sa.text("created_at DESC")])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(INDEX_NAME, table_name="interview_sessions")
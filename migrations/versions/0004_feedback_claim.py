@@ -0,0 +1,34 @@
+"""feedback_claimed_at: claim of a session by a feedback worker
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMN_NAME = "feedback_claimed_at"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("interview_sessions")}
+    if COLUMN_NAME in columns:
+        return
+    op.add_column("interview_sessions", sa.Column(COLUMN_NAME, sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("interview_sessions") as batch_op:
+        batch_op.drop_column(COLUMN_NAME)
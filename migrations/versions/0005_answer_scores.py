@@ -0,0 +1,41 @@
+"""per-answer score and notes for incremental evaluation
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 14:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = (
+    ("score", sa.Integer()),
+    ("notes", sa.Text()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("interview_answers")}
+    missing = [(name, type_) for name, type_ in NEW_COLUMNS if name not in columns]
+    if not missing:
+        return
+    with op.batch_alter_table("interview_answers") as batch_op:
+        for name, type_ in missing:
+            batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("interview_answers") as batch_op:
+        for name, _ in reversed(NEW_COLUMNS):
+            batch_op.drop_column(name)
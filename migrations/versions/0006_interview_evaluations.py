@@ -0,0 +1,48 @@
+"""interview_evaluations: versioned re-evaluations of completed sessions
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE_NAME = "interview_evaluations"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица могла быть уже создана init_db() новой версией приложения
+    if sa.inspect(op.get_bind()).has_table(TABLE_NAME):
+        return
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "session_id", sa.String(),
+            sa.ForeignKey("interview_sessions.session_id", ondelete="CASCADE"),
+            nullable=False
+        ),
+        sa.Column("version", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("feedback", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.UniqueConstraint("session_id", "version", name="uq_interview_evaluations_session_version"),
+    )
+    op.create_index("ix_interview_evaluations_version", TABLE_NAME, ["version"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_interview_evaluations_version", table_name=TABLE_NAME)
+    op.drop_table(TABLE_NAME)
@@ -0,0 +1,75 @@
+"""updated_at for session expiry and interview_sessions_archive
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ARCHIVE_TABLE = "interview_sessions_archive"
+STATUS_INDEX = "ix_interview_sessions_status_updated"
+# Как CompressedJSON: JSONB на PostgreSQL, сжатый orjson в BLOB на остальных БД
+PAYLOAD_TYPE = sa.LargeBinary().with_variant(JSONB(), "postgresql")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if "updated_at" not in {c["name"] for c in inspector.get_columns("interview_sessions")}:
+        op.add_column("interview_sessions", sa.Column("updated_at", sa.DateTime(), nullable=True))
+        # Для существующих сессий последнее изменение - завершение или создание
+        sessions = sa.table(
+            "interview_sessions",
+            sa.column("updated_at", sa.DateTime()),
+            sa.column("created_at", sa.DateTime()),
+            sa.column("completed_at", sa.DateTime()),
+        )
+        bind.execute(sessions.update().values(
+            updated_at=sa.func.coalesce(sessions.c.completed_at, sessions.c.created_at)
+        ))
+    if STATUS_INDEX not in {i["name"] for i in inspector.get_indexes("interview_sessions")}:
+        op.create_index(STATUS_INDEX, "interview_sessions", ["status", "updated_at"])
+
+    # Таблица могла быть уже создана init_db() новой версией приложения
+    if inspector.has_table(ARCHIVE_TABLE):
+        return
+    op.create_table(
+        ARCHIVE_TABLE,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("platform", sa.String()),
+        sa.Column("position", sa.String()),
+        sa.Column("current_question", sa.Integer()),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("archived_at", sa.DateTime()),
+        sa.Column("payload", PAYLOAD_TYPE, nullable=False),
+    )
+    op.create_index("ix_interview_sessions_archive_session_id", ARCHIVE_TABLE, ["session_id"], unique=True)
+    op.create_index("ix_interview_sessions_archive_user_created", ARCHIVE_TABLE, ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_interview_sessions_archive_user_created", table_name=ARCHIVE_TABLE)
+    op.drop_index("ix_interview_sessions_archive_session_id", table_name=ARCHIVE_TABLE)
+    op.drop_table(ARCHIVE_TABLE)
+    op.drop_index(STATUS_INDEX, table_name="interview_sessions")
+    with op.batch_alter_table("interview_sessions") as batch_op:
+        batch_op.drop_column("updated_at")
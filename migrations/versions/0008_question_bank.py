@@ -0,0 +1,45 @@
+"""question_bank: generated questions reused for similar positions
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE_NAME = "question_bank"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица могла быть уже создана init_db() новой версией приложения
+    if sa.inspect(op.get_bind()).has_table(TABLE_NAME):
+        return
+    op.create_table(
+        TABLE_NAME,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("position", sa.String(), nullable=False),
+        sa.Column("position_key", sa.String(), nullable=False),
+        sa.Column("question", sa.Text(), nullable=False),
+        sa.Column("fingerprint", sa.String(16), nullable=False),
+        sa.Column("signature", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.UniqueConstraint("position_key", "fingerprint", name="uq_question_bank_position_fingerprint"),
+    )
+    op.create_index("ix_question_bank_position_key", TABLE_NAME, ["position_key"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_question_bank_position_key", table_name=TABLE_NAME)
+    op.drop_table(TABLE_NAME)
@@ -0,0 +1,37 @@
+import pytest
+
+from app.cache import QuestionCache, normalize_position
+
+
+@pytest.mark.parametrize("position, key", [
+    ("  Senior   Python_Developer!! ", "senior python developer"),
+    ("Python-разработчик", "python разработчик"),
+    ("C++ developer", "cpp developer"),
+    ("C# developer", "csharp developer"),
+    ("C developer", "c developer"),
+    (".NET developer", "dotnet developer"),
+    ("ASP.NET Core", "asp dotnet core"),
+    ("Node.js", "nodejs"),
+])
+def test_normalize_position(position, key):
+    assert normalize_position(position) == key
+
+
+def test_languages_do_not_share_cached_questions():
+    cache = QuestionCache(max_size=10, ttl=60)
+    cache.put("C++ developer", ["вопрос о шаблонах C++"])
+    assert cache.get("c++   Developer") == ["вопрос о шаблонах C++"]
+    assert cache.get("C# developer") is None
+    assert cache.get("C developer") is None
+
+
+def test_cache_variants_and_eviction():
+    cache = QuestionCache(max_size=1, ttl=60, variants=2)
+    cache.put("Go", ["a"])
+    # Пул вариантов не заполнен - промах, чтобы сервис догенерировал еще один набор
+    assert cache.get("Go") is None
+    cache.put("Go", ["b"])
+    assert cache.get("Go") in (["a"], ["b"])
+    cache.put("Rust", ["c"])
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("Go") is None
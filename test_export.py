@@ -0,0 +1,111 @@
+import csv
+import io
+from datetime import datetime
+
+import orjson
+
+from app.config import settings
+from app.export import EXPORT_COLUMNS, iter_export_rows, _csv, _ndjson
+from conftest import start_session, complete_session, set_sessions, archive_sessions
+
+POSITION = "Haskell export developer"
+
+
+def _sessions(client) -> dict:
+    """Три сессии позиции POSITION: завершенная, активная и завершенная в архиве"""
+    completed, active, archived = (start_session(client, POSITION, user_id="export-user") for _ in range(3))
+    complete_session(client, completed)
+    complete_session(client, archived)
+    client.post("/api/answer_question", json={"session_id": active, "answer": "ответ 0", "question_index": 0})
+    set_sessions(client, [completed, active], created_at=datetime(2026, 2, 1))
+    set_sessions(client, [archived], created_at=datetime(2026, 1, 1))
+    assert archive_sessions(client, [archived]) >= 1
+    return {"completed": completed, "active": active, "archived": archived}
+
+
+def _export(client, **options) -> list:
+    async def collect():
+        return [row async for rows in iter_export_rows(**options) for row in rows]
+
+    return client.portal.call(collect)
+
+
+def test_export_filters(client):
+    sessions = _sessions(client)
+    ids = {session_id: name for name, session_id in sessions.items()}
+
+    def names(**options):
+        return sorted(ids[row["session_id"]] for row in _export(client, batch_size=1, **options))
+
+    # Позиция без учета регистра, обе таблицы
+    assert names(position=POSITION.upper()) == ["active", "archived", "completed"]
+    assert names(position=POSITION, include_archive=False) == ["active", "completed"]
+    assert names(position=POSITION, statuses=["completed"]) == ["archived", "completed"]
+    assert names(position=POSITION, statuses=["active", "expired"]) == ["active"]
+    assert names(position=POSITION, since=datetime(2026, 1, 15)) == ["active", "completed"]
+    assert names(position=POSITION, until=datetime(2026, 1, 15)) == ["archived"]
+    assert names(position="Haskell") == []
+
+    rows = {ids[row["session_id"]]: row for row in _export(client, position=POSITION)}
+    for name in ("completed", "archived"):
+        row = rows[name]
+        assert set(row) == set(EXPORT_COLUMNS)
+        assert row["archived"] == (name == "archived")
+        assert row["answers"] == [f"ответ {index}" for index in range(10)]
+        assert len(row["questions"]) == len(row["scores"]) == 10
+        assert row["feedback"]
+    assert rows["active"]["answers"] == ["ответ 0"]
+    assert rows["active"]["feedback"] is None
+
+
+def test_csv_and_ndjson_output():
+    row = {column: None for column in EXPORT_COLUMNS}
+    row.update({
+        "session_id": "s1", "position": "Python, \"senior\"", "created_at": datetime(2026, 1, 2, 3, 4, 5),
+        "questions": ["Что такое GIL?"], "answers": ["Блокировка"], "scores": [7], "archived": False,
+    })
+
+    lines = _ndjson([row, row]).splitlines()
+    assert len(lines) == 2
+    assert "Что такое GIL?".encode("utf-8") in lines[0]
+    assert orjson.loads(lines[0])["created_at"] == "2026-01-02T03:04:05"
+
+    header, values = list(csv.reader(io.StringIO(_csv([row], header=True))))
+    assert header == list(EXPORT_COLUMNS)
+    cell = dict(zip(header, values))
+    assert cell["position"] == "Python, \"senior\""
+    assert cell["created_at"] == "2026-01-02T03:04:05"
+    assert orjson.loads(cell["questions"]) == ["Что такое GIL?"]
+    assert orjson.loads(cell["scores"]) == [7]
+    assert cell["completed_at"] == ""
+    assert list(csv.reader(io.StringIO(_csv([row], header=False)))) == [values]
+
+
+def test_export_endpoint(client, monkeypatch):
+    session_id = start_session(client, "OCaml export developer", user_id="export-user")
+    complete_session(client, session_id)
+    params = {"position": "OCaml export developer", "batch_size": 1}
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/api/admin/export", headers={"X-Admin-Token": ""}).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/admin/export").status_code == 403
+    assert client.get("/api/admin/export", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    headers = {"X-Admin-Token": "secret"}
+
+    reply = client.get("/api/admin/export", params=params, headers=headers)
+    assert reply.headers["content-type"] == "application/x-ndjson"
+    rows = [orjson.loads(line) for line in reply.content.splitlines()]
+    assert [row["session_id"] for row in rows] == [session_id]
+
+    reply = client.get("/api/admin/export", params={**params, "format": "csv"}, headers=headers)
+    assert reply.headers["content-type"].startswith("text/csv")
+    assert "interviews.csv" in reply.headers["content-disposition"]
+    header, values = list(csv.reader(io.StringIO(reply.text)))
+    assert dict(zip(header, values))["session_id"] == session_id
+
+    # Пустая выгрузка CSV - только заголовок
+    reply = client.get("/api/admin/export", params={**params, "format": "csv", "status": "expired"}, headers=headers)
+    assert list(csv.reader(io.StringIO(reply.text))) == [list(EXPORT_COLUMNS)]
+    reply = client.get("/api/admin/export", params={**params, "format": "parquet"}, headers=headers)
+    assert reply.status_code == 422
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import feedback_queue as feedback_queue_module
+from app.database_fixed import AsyncSessionLocal, InterviewSessionDB
+from app.feedback_queue import feedback_queue
+from app.interview_service import interview_service
+from app.maintenance import SessionMaintenance
+from app.services import gemini_service
+from conftest import start_session, set_sessions
+
+POSITION = "Elm feedback developer"
+
+
+def _answer_all(client, session_id):
+    for index in range(10):
+        client.post("/api/answer_question", json={
+            "session_id": session_id, "answer": f"ответ {index}", "question_index": index
+        })
+
+
+async def _collect(session_id) -> list:
+    async with AsyncSessionLocal() as db:
+        events = await interview_service.feedback_events(db, session_id)
+    return [item async for item in events]
+
+
+def test_unsaved_feedback_is_pending(client, monkeypatch):
+    """Фидбэк сгенерирован, но не сохранен - поток заканчивается pending, а не done"""
+    release = asyncio.Event()
+
+    async def generate(position, questions, answers):
+        yield "часть фидбэка"
+        await release.wait()
+
+    async def failing_save(db, session_id, feedback):
+        raise RuntimeError("база недоступна")
+
+    monkeypatch.setattr(gemini_service, "generate_feedback_stream", generate)
+    monkeypatch.setattr(feedback_queue_module, "update_session_complete", failing_save)
+    session_id = start_session(client, POSITION)
+    _answer_all(client, session_id)
+
+    async def scenario():
+        collecting = asyncio.ensure_future(_collect(session_id))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.wait_for(collecting, timeout=5)
+
+    events = client.portal.call(scenario)
+    assert events == [("chunk", {"text": "часть фидбэка"}), ("pending", {"status": "evaluating"})]
+    # Повторная оценка отложена до истечения захвата - сессия не остается в очереди следующего запуска
+    set_sessions(client, [session_id], status="completed", feedback="сохранен позже")
+
+
+def test_session_archived_while_waiting(client, monkeypatch):
+    """Оценка идет в другом процессе, а сессию за это время перенесли в архив"""
+    session_id = start_session(client, POSITION)
+    set_sessions(client, [session_id], status="evaluating")
+    archived = asyncio.Event()
+    wait = feedback_queue.wait
+
+    async def wait_for_archive(session_id, timeout):
+        # Первая проверка БД - уже после переноса в архив
+        await archived.wait()
+        return await wait(session_id, 0)
+
+    monkeypatch.setattr(feedback_queue, "wait", wait_for_archive)
+
+    async def scenario():
+        collecting = asyncio.ensure_future(_collect(session_id))
+        await asyncio.sleep(0.05)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(InterviewSessionDB).where(
+                InterviewSessionDB.session_id == session_id
+            ).values(status="completed", feedback="из архива", updated_at=datetime(2000, 1, 1)))
+            await db.commit()
+        await SessionMaintenance(idle_ttl=0, archive_after_days=1, interval=0, batch_size=100).archive()
+        archived.set()
+        return await asyncio.wait_for(collecting, timeout=5)
+
+    events = client.portal.call(scenario)
+    assert events == [("chunk", {"text": "из архива"}), ("done", {"status": "completed"})]
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from conftest import set_sessions, archive_sessions
+
+
+def _pages(client, user_id, limit):
+    params, pages = {"limit": limit}, []
+    while True:
+        data = client.get(f"/api/user/{user_id}/sessions", params=params).json()
+        pages.append([item["session_id"] for item in data["sessions"]])
+        if data["next_before"] is None:
+            return pages
+        params = {"limit": limit, "before": data["next_before"], "before_id": data["next_before_id"]}
+
+
+def test_pages_with_same_created_at_skip_nothing(client):
+    user_id = "history-same-time"
+    session_ids = [
+        client.post("/api/start_interview", json={"start": True, "user_id": user_id}).json()["session_id"]
+        for _ in range(7)
+    ]
+    set_sessions(client, session_ids, created_at=datetime(2026, 1, 1, 12, 0))
+    # Часть сессий в архиве: страницы собираются из обеих таблиц
+    set_sessions(client, session_ids[:3], status="completed")
+    assert archive_sessions(client, session_ids[:3]) == 3
+
+    pages = _pages(client, user_id, limit=2)
+    returned = [session_id for page in pages for session_id in page]
+    assert sorted(returned) == sorted(session_ids)
+    assert returned == sorted(session_ids, reverse=True)
+    assert all(len(page) == 2 for page in pages[:-1])
+
+
+def test_pages_in_creation_order(client):
+    user_id = "history-order"
+    session_ids = []
+    for minute in range(5):
+        session_id = client.post("/api/start_interview", json={"start": True, "user_id": user_id}).json()["session_id"]
+        set_sessions(client, [session_id], created_at=datetime(2026, 1, 1, 12, minute))
+        session_ids.append(session_id)
+
+    pages = _pages(client, user_id, limit=2)
+    assert [session_id for page in pages for session_id in page] == session_ids[::-1]
+    # Без before_id курсор по одному created_at, как раньше
+    data = client.get(f"/api/user/{user_id}/sessions", params={"before": "2026-01-01T12:02:00"}).json()
+    assert [item["session_id"] for item in data["sessions"]] == session_ids[1::-1]
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.crud_fixed import claim_feedback
+from app.database_fixed import AsyncSessionLocal, InterviewSessionDB
+from app.feedback_queue import feedback_queue
+from app.interview_service import interview_service
+from app.services import gemini_service
+from conftest import start_session
+
+POSITION = "Python backend"
+
+
+def _answer(client, session_id, text, question_index=None, key=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post("/api/answer_question", headers=headers, json={
+        "session_id": session_id, "answer": text, "question_index": question_index
+    })
+
+
+def _answers(client, session_id) -> list:
+    return client.get(f"/api/session/{session_id}").json()["answers"]
+
+
+def _slow_answers(monkeypatch, delay=0.1):
+    """Запись ответа медленнее: повторы приходят, пока первый запрос еще выполняется"""
+    add_answer = interview_service.store.add_answer
+
+    async def slow_add_answer(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return await add_answer(*args, **kwargs)
+
+    monkeypatch.setattr(interview_service.store, "add_answer", slow_add_answer)
+
+
+def test_retry_with_question_index_saves_answer_once(client):
+    session_id = start_session(client, POSITION)
+    first = _answer(client, session_id, "первый", question_index=0)
+    retry = _answer(client, session_id, "повтор", question_index=0)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert first.json()["current_question"] == 2
+    assert _answers(client, session_id) == ["первый"]
+
+
+def test_retry_of_earlier_question_returns_its_result(client):
+    session_id = start_session(client, POSITION)
+    first = _answer(client, session_id, "a0", question_index=0).json()
+    _answer(client, session_id, "a1", question_index=1)
+    assert _answer(client, session_id, "a0 еще раз", question_index=0).json() == first
+    assert _answer(client, session_id, "мимо", question_index=5).status_code == 409
+    assert _answers(client, session_id) == ["a0", "a1"]
+
+
+def test_retry_with_idempotency_key(client):
+    session_id = start_session(client, POSITION)
+    first = _answer(client, session_id, "a0", key="request-1")
+    retry = _answer(client, session_id, "a0 повтор", key="request-1")
+    assert retry.json() == first.json()
+    assert _answers(client, session_id) == ["a0"]
+    # Без ключа и номера вопроса это обычный следующий ответ
+    assert _answer(client, session_id, "a1").json()["current_question"] == 3
+
+
+def test_concurrent_duplicates_share_one_answer(client, monkeypatch):
+    session_id = start_session(client, POSITION)
+    _slow_answers(monkeypatch)
+
+    async def answer_once(text):
+        async with AsyncSessionLocal() as db:
+            return await interview_service.answer(db, session_id, text, question_index=0)
+
+    async def duplicates():
+        return await asyncio.gather(*(answer_once(f"дубль {i}") for i in range(5)))
+
+    responses = client.portal.call(duplicates)
+    assert all(response == responses[0] for response in responses)
+    assert _answers(client, session_id) == ["дубль 0"]
+
+
+class _ClosedRequestSession:
+    """Сессия БД запроса, который уже завершился: get_async_db ее закрыл"""
+
+    def __getattr__(self, name):
+        raise RuntimeError("сессия запроса уже закрыта")
+
+
+def test_duplicate_survives_first_caller_disconnect(client, monkeypatch):
+    """Общий вызов не пользуется сессией БД первого запроса: тот мог отключиться раньше"""
+    session_id = start_session(client, POSITION)
+    _slow_answers(monkeypatch)
+
+    async def retry(text):
+        async with AsyncSessionLocal() as db:
+            return await interview_service.answer(db, session_id, text, question_index=0)
+
+    async def disconnect_then_retry():
+        first = asyncio.ensure_future(
+            interview_service.answer(_ClosedRequestSession(), session_id, "первый", question_index=0)
+        )
+        await asyncio.sleep(0.02)
+        second = asyncio.ensure_future(retry("повтор"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    response = client.portal.call(disconnect_then_retry)
+    assert response["current_question"] == 2
+    assert _answers(client, session_id) == ["первый"]
+
+
+def test_feedback_generated_once_for_concurrent_workers(client, monkeypatch):
+    """Два процесса взяли одну сессию в оценку: фидбэк генерирует только захвативший ее"""
+    session_id = start_session(client, POSITION)
+    monkeypatch.setattr(feedback_queue, "enqueue", lambda session_id: None)
+    for index in range(10):
+        _answer(client, session_id, f"a{index}", question_index=index)
+
+    calls = []
+    generate = gemini_service.generate_feedback_stream
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return generate(*args, **kwargs)
+
+    monkeypatch.setattr(gemini_service, "generate_feedback_stream", counting)
+
+    async def two_workers():
+        await asyncio.gather(feedback_queue._process(session_id), feedback_queue._process(session_id))
+
+    client.portal.call(two_workers)
+    assert len(calls) == 1
+    feedback = client.get(f"/api/session/{session_id}/feedback").json()
+    assert feedback["status"] == "completed"
+    assert feedback["feedback"]
+
+
+def test_feedback_claim_lease(client):
+    session_id = start_session(client, POSITION)
+
+    async def claims():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(InterviewSessionDB).where(
+                InterviewSessionDB.session_id == session_id
+            ).values(status="evaluating"))
+            await db.commit()
+            now = datetime.now()
+            first = await claim_feedback(db, session_id, stale_before=now)
+            # Захват еще действует - второй воркер сессию не получает
+            second = await claim_feedback(db, session_id, stale_before=now)
+            # Захват истек (воркер упал) - сессию можно взять снова
+            expired = await claim_feedback(db, session_id, stale_before=now + timedelta(hours=1))
+            return bool(first), bool(second), bool(expired)
+
+    assert client.portal.call(claims) == (True, False, True)
@@ -0,0 +1,124 @@
+from sqlalchemy import update
+
+from app.database_fixed import AsyncSessionLocal, InterviewSessionDB
+from app.interview_service import interview_service
+
+
+def _start(ws, position="Go developer") -> str:
+    ws.send_json({"type": "start", "user_id": "ws-user"})
+    started = ws.receive_json()
+    assert started["type"] == "started"
+    ws.send_json({"type": "position", "position": position})
+    question = ws.receive_json()
+    assert question["type"] == "question"
+    assert question["current_question"] == 1
+    return started["session_id"]
+
+
+def _answer_all(ws, first=0, last=9) -> dict:
+    for index in range(first, last + 1):
+        ws.send_json({"type": "answer", "answer": f"ответ {index}", "question_index": index})
+        reply = ws.receive_json()
+    return reply
+
+
+def _feedback_events(ws) -> list:
+    events = [ws.receive_json()]
+    while events[-1]["type"] == "chunk":
+        events.append(ws.receive_json())
+    return events
+
+
+def test_interview_and_feedback_over_one_connection(client):
+    with client.websocket_connect("/ws/interview") as ws:
+        session_id = _start(ws)
+        assert _answer_all(ws, last=8)["current_question"] == 10
+        complete = _answer_all(ws, first=9)
+        assert complete["type"] == "complete"
+        assert complete["interview_complete"]
+        events = _feedback_events(ws)
+
+    assert events[-1] == {"type": "done", "status": "completed"}
+    feedback = "".join(event["text"] for event in events[:-1])
+    assert feedback == client.get(f"/api/session/{session_id}/feedback").json()["feedback"]
+    assert len(client.get(f"/api/session/{session_id}").json()["answers"]) == 10
+
+
+def test_invalid_messages_keep_connection_open(client):
+    with client.websocket_connect("/ws/interview") as ws:
+        ws.send_json({"type": "answer", "answer": "x"})
+        assert ws.receive_json()["status"] == 422
+        ws.send_text("[1]")
+        assert ws.receive_json()["status"] == 422
+        ws.send_json({"type": "unknown"})
+        assert ws.receive_json()["status"] == 422
+        ws.send_json({"type": "start"})
+        assert ws.receive_json()["type"] == "started"
+        ws.send_json({"type": "answer", "answer": "до позиции"})
+        assert ws.receive_json() == {"type": "error", "status": 409, "detail": "Сначала укажите позицию"}
+
+
+def test_retry_and_rest_answers_behind_the_socket(client):
+    with client.websocket_connect("/ws/interview") as ws:
+        session_id = _start(ws)
+        first = _answer_all(ws, last=0)
+        # Повтор того же шага возвращает первый результат
+        ws.send_json({"type": "answer", "answer": "повтор", "question_index": 0})
+        assert {**ws.receive_json(), "type": first["type"]} == first
+
+        # Страница перешла на REST и ответила на следующий вопрос в обход соединения
+        rest = client.post("/api/answer_question", json={
+            "session_id": session_id, "answer": "через REST", "question_index": 1
+        })
+        assert rest.json()["current_question"] == 3
+        ws.send_json({"type": "answer", "answer": "устаревший шаг"})
+        assert ws.receive_json()["status"] == 409
+        # После ошибки сессия перечитывается, и соединение продолжает с нужного вопроса
+        assert _answer_all(ws, first=2, last=2)["current_question"] == 4
+
+    assert client.get(f"/api/session/{session_id}").json()["answers"] == ["ответ 0", "через REST", "ответ 2"]
+
+
+def test_new_connection_continues_session(client):
+    with client.websocket_connect("/ws/interview") as ws:
+        session_id = _start(ws)
+        _answer_all(ws, last=4)
+    with client.websocket_connect("/ws/interview") as ws:
+        ws.send_json({"type": "answer", "answer": "ответ 5", "question_index": 5, "session_id": session_id})
+        assert ws.receive_json()["current_question"] == 7
+
+
+def test_expired_session_is_closed_for_the_socket(client):
+    with client.websocket_connect("/ws/interview") as ws:
+        session_id = _start(ws)
+        _answer_all(ws, last=0)
+
+        async def expire():
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(InterviewSessionDB).where(
+                    InterviewSessionDB.session_id == session_id
+                ).values(status="expired"))
+                await db.commit()
+
+        client.portal.call(expire)
+        ws.send_json({"type": "answer", "answer": "поздно", "question_index": 1})
+        reply = ws.receive_json()
+    assert reply["status"] == 409
+    assert "неактивности" in reply["detail"]
+
+
+def test_feedback_error_is_sent_as_message(client, monkeypatch):
+    """Ошибка БД при отдаче фидбэка - сообщение error, а не обрыв соединения с кодом 1011"""
+    async def broken_feedback_events(db, session_id):
+        raise RuntimeError("база недоступна")
+
+    monkeypatch.setattr(interview_service, "feedback_events", broken_feedback_events)
+    with client.websocket_connect("/ws/interview") as ws:
+        session_id = _start(ws)
+        assert _answer_all(ws)["type"] == "complete"
+        assert ws.receive_json() == {"type": "error", "status": 500, "detail": "Внутренняя ошибка"}
+        # Соединение остается рабочим
+        ws.send_json({"type": "unknown"})
+        assert ws.receive_json()["status"] == 422
+    # Страница переходит на long-poll - фидбэк готовится как обычно
+    assert client.get(f"/api/session/{session_id}/feedback", params={"wait": 10}).json()["status"] == "completed"
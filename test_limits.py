@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from app.limits import SingleFlight, TokenBucket, CircuitBreaker, CircuitOpenError, RateLimitTimeout
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", factory) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.coalesced == 4
+    assert len(flight) == 0
+
+
+def test_single_flight_cancelled_waiter_does_not_cancel_call():
+    async def main():
+        flight = SingleFlight()
+
+        async def factory():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", factory))
+        second = asyncio.ensure_future(flight.do("key", factory))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "result"
+
+
+def test_token_bucket_burst_then_rate():
+    async def main():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        burst = time.monotonic() - started
+        await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.02
+    assert 0.03 <= total < 0.2
+
+
+def test_token_bucket_timeout():
+    async def main():
+        bucket = TokenBucket(rate=1, capacity=1)
+        await bucket.acquire()
+        with pytest.raises(RateLimitTimeout):
+            await bucket.acquire(timeout=0.1)
+
+    asyncio.run(main())
+
+
+def test_token_bucket_waiter_timeout_not_delayed_by_other_waiters():
+    """Ожидающий без срока не задерживает ожидающего со сроком дольше его timeout"""
+    async def main():
+        bucket = TokenBucket(rate=2, capacity=1)
+        await bucket.acquire()
+        patient = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        with pytest.raises(RateLimitTimeout):
+            await bucket.acquire(timeout=0.1)
+        elapsed = time.monotonic() - started
+        await patient
+        return elapsed
+
+    assert asyncio.run(main()) < 0.1
+
+
+def test_token_bucket_pause_and_try_acquire():
+    bucket = TokenBucket(rate=10, capacity=5)
+    assert bucket.try_acquire() == 0
+    bucket.pause(1)
+    assert bucket.try_acquire() == pytest.approx(1.1, abs=0.05)
+
+
+def test_token_bucket_without_rate_is_unlimited():
+    async def main():
+        bucket = TokenBucket(rate=0, capacity=1)
+        for _ in range(100):
+            await bucket.acquire(timeout=0)
+
+    asyncio.run(main())
+
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # В half-open пропускается только один пробный вызов
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_circuit_breaker_disabled():
+    breaker = CircuitBreaker(threshold=0, reset_timeout=1)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_saturated_operation_does_not_hold_global_slots():
+    """Очередь фидбэка не занимает общие слоты: вопросы генерируются без ожидания"""
+    from app.services import GeminiService
+
+    service = GeminiService()
+    service.rate_limiter = TokenBucket(rate=0, capacity=1)
+    service._concurrency = asyncio.Semaphore(2)
+    service._operation_concurrency["feedback"] = asyncio.Semaphore(1)
+
+    async def call_model(operation, prompt):
+        await asyncio.sleep(0.3 if operation == "feedback" else 0)
+        return operation
+
+    service._call_model_async = call_model
+
+    async def main():
+        feedback = [asyncio.ensure_future(service._generate_limited("feedback", str(i))) for i in range(4)]
+        await asyncio.sleep(0.01)
+        started = time.monotonic()
+        assert await service._generate_limited("questions", "q") == "questions"
+        elapsed = time.monotonic() - started
+        for task in feedback:
+            task.cancel()
+        await asyncio.gather(*feedback, return_exceptions=True)
+        return elapsed
+
+    assert asyncio.run(main()) < 0.1
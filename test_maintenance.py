@@ -0,0 +1,100 @@
+from datetime import datetime
+
+from app.crud_fixed import get_session, get_archived_session, save_evaluations
+from app.database_fixed import AsyncSessionLocal
+from app.maintenance import SessionMaintenance, unpack_session
+from conftest import start_session, complete_session, set_sessions, archive_sessions
+
+POSITION = "Scala developer"
+
+
+def test_idle_session_expires(client):
+    idle, fresh = start_session(client, POSITION), start_session(client, POSITION)
+    client.post("/api/answer_question", json={"session_id": idle, "answer": "ответ 0", "question_index": 0})
+    set_sessions(client, [idle], updated_at=datetime(2000, 1, 1))
+
+    maintenance = SessionMaintenance(idle_ttl=3600, archive_after_days=0, interval=0, batch_size=100)
+    assert client.portal.call(maintenance.expire) >= 1
+    assert client.get(f"/api/session/{idle}").json()["status"] == "expired"
+    assert client.get(f"/api/session/{fresh}").json()["status"] == "active"
+    reply = client.post("/api/answer_question", json={"session_id": idle, "answer": "поздно", "question_index": 1})
+    assert reply.status_code == 409
+    assert "неактивности" in reply.json()["detail"]
+
+
+def test_archived_session_is_read_from_archive(client):
+    session_id = start_session(client, POSITION, user_id="archive-user")
+    complete_session(client, session_id)
+
+    async def add_evaluation():
+        async with AsyncSessionLocal() as db:
+            await save_evaluations(db, [{
+                "session_id": session_id, "version": "v2", "model": "fake", "feedback": "повторная оценка",
+                "created_at": datetime(2026, 1, 2),
+            }])
+
+    client.portal.call(add_evaluation)
+    before = client.get(f"/api/session/{session_id}").json()
+    feedback = client.get(f"/api/session/{session_id}/feedback").json()
+    assert archive_sessions(client, [session_id]) >= 1
+
+    async def tables():
+        async with AsyncSessionLocal() as db:
+            return await get_session(db, session_id), unpack_session(await get_archived_session(db, session_id))
+
+    working, archived = client.portal.call(tables)
+    assert working is None
+    assert archived["answers"] == before["answers"]
+    assert archived["feedback"] == feedback["feedback"]
+
+    # API читает сессию из архива в том же виде
+    assert client.get(f"/api/session/{session_id}").json() == before
+    assert client.get(f"/api/session/{session_id}/feedback").json() == feedback
+    evaluations = client.get(f"/api/session/{session_id}/evaluations").json()["evaluations"]
+    assert [item["feedback"] for item in evaluations] == ["повторная оценка"]
+    history = client.get("/api/user/archive-user/sessions").json()["sessions"]
+    assert [item["session_id"] for item in history] == [session_id]
+    # Повтор последнего ответа получает результат первой попытки, новый ответ - 409
+    reply = client.post("/api/answer_question", json={"session_id": session_id, "answer": "еще", "question_index": 9})
+    assert reply.json()["interview_complete"]
+    assert client.post("/api/answer_question", json={"session_id": session_id, "answer": "еще"}).status_code == 409
+
+
+def test_archive_in_batches_skips_active_sessions(client):
+    completed = [start_session(client, POSITION, user_id="archive-batches") for _ in range(5)]
+    for session_id in completed:
+        complete_session(client, session_id)
+    active = start_session(client, POSITION, user_id="archive-batches")
+    assert archive_sessions(client, completed + [active], batch_size=2) >= 5
+
+    async def locations():
+        async with AsyncSessionLocal() as db:
+            return {
+                session_id: await get_archived_session(db, session_id) is not None
+                for session_id in completed + [active]
+            }
+
+    archived = client.portal.call(locations)
+    assert all(archived[session_id] for session_id in completed)
+    assert not archived[active]
+    assert client.get(f"/api/session/{active}").json()["status"] == "active"
+
+
+def test_metrics_reset_statuses_gone_from_db(client, monkeypatch):
+    """Последнюю истекшую сессию перенесли в архив - метрика показывает 0, а не прежнее значение"""
+    import app.main
+
+    def sessions(status):
+        line = f'neurohr_interview_sessions{{status="{status}"}}'
+        values = [row.split()[-1] for row in client.get("/metrics").text.splitlines() if row.startswith(line)]
+        return float(values[0]) if values else None
+
+    async def counts(db, result):
+        return result
+
+    monkeypatch.setattr(app.main, "count_sessions_by_status", lambda db: counts(db, {"expired": 2, "reviewing": 1}))
+    assert sessions("expired") == 2
+    assert sessions("reviewing") == 1
+    monkeypatch.setattr(app.main, "count_sessions_by_status", lambda db: counts(db, {}))
+    assert sessions("expired") == 0
+    assert sessions("reviewing") == 0
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import RetryAfter
+
+from bot.outbox import Outbox, split_message, FENCE, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+
+class FakeBot:
+    """Бот, который записывает отправленные сообщения; первые failures вызовов отвечают 429"""
+
+    def __init__(self, failures: int = 0, retry_after: float = 0.05):
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RetryAfter(timedelta(seconds=self.retry_after))
+        self.calls.append((time.monotonic(), chat_id, text))
+        return SimpleNamespace(chat_id=chat_id, message_id=len(self.calls), text=text)
+
+
+async def _run(outbox, bot, messages) -> list:
+    """Поставить сообщения (chat_id, text, priority) в очередь до старта диспетчера и дождаться отправки"""
+    sending = [asyncio.create_task(outbox.send(chat_id, text, priority)) for chat_id, text, priority in messages]
+    await asyncio.sleep(0)
+    await outbox.start(bot)
+    try:
+        return await asyncio.wait_for(asyncio.gather(*sending, return_exceptions=True), timeout=5)
+    finally:
+        await outbox.stop()
+
+
+def test_priority_between_chats():
+    outbox = Outbox(rate=100, chat_rate=100, chat_burst=10)
+    bot = FakeBot()
+    asyncio.run(_run(outbox, bot, [
+        (1, "история", PRIORITY_LOW),
+        (2, "фидбэк", PRIORITY_NORMAL),
+        (3, "вопрос", PRIORITY_HIGH),
+        # Внутри чата порядок отправки важнее приоритета
+        (1, "ошибка", PRIORITY_HIGH),
+    ]))
+    assert [text for _, _, text in bot.calls] == ["вопрос", "фидбэк", "история", "ошибка"]
+
+
+def test_retry_after_is_waited_and_retried():
+    outbox = Outbox(rate=100, chat_rate=100, chat_burst=10)
+    bot = FakeBot(failures=1, retry_after=0.1)
+    started = time.monotonic()
+    [message] = asyncio.run(_run(outbox, bot, [(1, "вопрос", PRIORITY_HIGH)]))
+    assert message.text == "вопрос"
+    assert [text for _, _, text in bot.calls] == ["вопрос"]
+    assert bot.calls[0][0] - started >= 0.1
+    assert outbox.stats()["retries"] == 1
+
+
+def test_retry_after_gives_up_after_max_retries():
+    outbox = Outbox(rate=100, chat_rate=100, chat_burst=10, max_retries=2)
+    bot = FakeBot(failures=3, retry_after=0.01)
+    [error] = asyncio.run(_run(outbox, bot, [(1, "вопрос", PRIORITY_HIGH)]))
+    assert isinstance(error, RetryAfter)
+    assert bot.calls == []
+    assert outbox.retries == 2
+
+
+def test_chat_bucket_does_not_hold_other_chats():
+    outbox = Outbox(rate=100, chat_rate=10, chat_burst=1)
+    bot = FakeBot()
+    asyncio.run(_run(outbox, bot, [
+        (1, "первое", PRIORITY_NORMAL),
+        (1, "второе", PRIORITY_NORMAL),
+        (2, "другой чат", PRIORITY_NORMAL),
+    ]))
+    assert [text for _, _, text in bot.calls] == ["первое", "другой чат", "второе"]
+    sent = {text: at for at, _, text in bot.calls}
+    # Второе сообщение чата ждет токен его bucket (10 в секунду), другой чат уходит раньше
+    assert sent["второе"] - sent["первое"] >= 0.09
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("первый абзац\n\nвторой абзац", ["первый абзац", "второй абзац"]),
+    ("строка один\nстрока два", ["строка один", "строка два"]),
+    ("слово " * 5, ["слово слово", "слово слово слово"]),
+])
+def test_split_prefers_separators(text, expected):
+    assert split_message(text, 20) == expected
+
+
+def test_split_without_separator_in_second_half():
+    # Единственный пробел в начале окна не дает короткого первого сообщения
+    parts = split_message("Hello " + "x" * 9000, 4096)
+    assert [len(part) for part in parts] == [4092, 4092, 822]
+    assert "".join(parts) == "Hello " + "x" * 9000
+
+
+def test_split_closes_and_reopens_code_fence():
+    code = "\n".join(f"print({index})" for index in range(60))
+    text = f"Пример:\n{FENCE}\n{code}\n{FENCE}\nГотово"
+    parts = split_message(text, 200)
+    assert len(parts) > 2
+    for part in parts:
+        assert len(part) <= 200
+        assert part.count(FENCE) % 2 == 0
+    assert parts[0].startswith("Пример:")
+    assert all(part.startswith(FENCE) for part in parts[1:])
+    lines = [line for part in parts for line in part.splitlines() if line != FENCE]
+    assert lines == [line for line in text.splitlines() if line != FENCE]
@@ -0,0 +1,59 @@
+import re
+
+from app.config import settings
+from app.prompt_budget import compact_text, estimate_tokens, fit_to_budget
+from app.services import GeminiService
+
+MARK_RE = re.compile(r"\n\[\.\.\. пропущено около (\d+) токенов \.\.\.\]\n")
+
+
+def _long_answer() -> str:
+    lines = [f"Шаг {index}: проверяем значение x{index} и идем дальше" for index in range(200)]
+    return "Начало ответа\n" + "\n".join(lines) + "\nИтог: O(n log n)"
+
+
+def test_compact_text():
+    text = (
+        "  def f(x):   \r\n"
+        "\tif x:\r\n"
+        "\t\treturn x      # комментарий\r\n"
+        "\r\n\r\n\r\n\r\n"
+        "      return   None\r\n"
+    )
+    assert compact_text(text) == "def f(x):\n if x:\n  return x # комментарий\n\n  return None"
+    assert compact_text("ответ без лишних пробелов") == "ответ без лишних пробелов"
+
+
+def test_short_answer_is_only_compacted():
+    text, saved, truncated = fit_to_budget("Ответ    с   выравниванием   \n\n\n\nи пустыми строками", 800)
+    assert text == "Ответ с выравниванием\n\nи пустыми строками"
+    assert saved > 0
+    assert not truncated
+
+
+def test_long_answer_keeps_head_and_tail():
+    answer = _long_answer()
+    text, saved, truncated = fit_to_budget(answer, 200)
+    assert truncated
+    assert estimate_tokens(text) <= 200
+    assert saved == estimate_tokens(answer) - estimate_tokens(text)
+
+    head, skipped, tail = MARK_RE.split(text)
+    assert head.startswith("Начало ответа\nШаг 0:")
+    assert tail.endswith("Итог: O(n log n)")
+    # Начало - около 2/3 оставленного, конец - около 1/3; обе части режутся по границе строки
+    assert len(head) > len(tail)
+    assert answer.startswith(head + "\n")
+    assert answer.endswith("\n" + tail)
+    assert int(skipped) == estimate_tokens(answer) - estimate_tokens(head) - estimate_tokens(tail)
+
+
+def test_zero_budget_disables_truncation(monkeypatch):
+    answer = _long_answer()
+    text, saved, truncated = fit_to_budget(answer, 0)
+    assert (text, saved, truncated) == (answer, 0, False)
+
+    monkeypatch.setattr(settings, "PROMPT_ANSWER_TOKEN_BUDGET", 0)
+    assert GeminiService()._fit_answer("feedback", answer + "   ") == answer
+    monkeypatch.setattr(settings, "PROMPT_ANSWER_TOKEN_BUDGET", 200)
+    assert MARK_RE.search(GeminiService()._fit_answer("feedback", answer))
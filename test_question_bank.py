@@ -0,0 +1,106 @@
+import pytest
+
+from app.question_bank import (
+    QuestionBank, trigrams, minhash, minhash_similarity, pack_signature, unpack_signature
+)
+from app.cache import normalize_position
+from app.database_fixed import AsyncSessionLocal
+
+TOPICS = [
+    "сборка мусора процессов", "горячая замена кода", "деревья супервизоров", "распределенные узлы кластера",
+    "очереди сообщений почтового ящика", "хранилище ETS таблиц", "профилирование планировщика",
+    "поведение gen_server", "обработка таймаутов вызова", "бинарные паттерны разбора",
+    "релизы rebar3", "мониторинг ссылок link", "тестирование common_test", "горизонтальное шардирование Mnesia",
+    "сериализация term_to_binary", "NIF расширения", "порты внешних программ", "логирование logger",
+    "конечные автоматы gen_statem", "безопасность cookie",
+]
+
+
+def _indexed(*positions) -> QuestionBank:
+    bank = QuestionBank(enabled=True, similarity=0.45, min_questions=20, dedup=0.6, refresh=0)
+    for position in positions:
+        bank._index_position(normalize_position(position), 30)
+    return bank
+
+
+def test_role_words_do_not_affect_trigrams():
+    assert trigrams("Python dev") == trigrams("Python-разработчик") == trigrams("python Developer")
+
+
+@pytest.mark.parametrize("position, other", [
+    ("C++ developer", "C# developer"),
+    ("C++ developer", "C developer"),
+    ("C# developer", "C developer"),
+    ("Java developer", "JavaScript developer"),
+    (".NET developer", "Node.js developer"),
+])
+def test_different_languages_do_not_match(position, other):
+    assert _indexed(position).match(other) == []
+    assert _indexed(other).match(position) == []
+
+
+def test_same_language_matches():
+    bank = _indexed("C++ developer", "C# developer")
+    assert [key for key, _ in bank.match("C++ разработчик")] == ["cpp developer"]
+    assert [key for key, _ in bank.match("Senior C# Engineer")] == ["csharp developer"]
+
+
+def test_generic_position_does_not_get_specific_questions():
+    bank = _indexed("Backend Python developer")
+    assert bank.match("Backend developer") == []
+    assert bank.match("Java backend developer") == []
+    # Более узкая позиция получает вопросы более общей
+    assert _indexed("Python developer").match("Backend Python Developer")
+
+
+def test_term_forms_still_match():
+    assert _indexed("PostgreSQL DBA").match("Postgres DBA")
+
+
+def test_minhash_near_duplicates():
+    question = minhash("Расскажите о вашем опыте работы с Docker")
+    assert minhash_similarity(question, minhash("Опишите опыт работы с Docker")) >= 0.6
+    assert minhash_similarity(question, minhash("Расскажите о вашем опыте работы с Kubernetes")) < 0.6
+    assert minhash_similarity(minhash("Что такое RAII в C++?"), minhash("Что такое RAII в C#?")) < 0.6
+
+
+def test_signature_roundtrip():
+    signature = minhash("Как устроен GIL в CPython?")
+    assert unpack_signature(pack_signature(signature)) == signature
+
+
+def test_add_and_find(client):
+    bank = QuestionBank(enabled=True, similarity=0.45, min_questions=20, dedup=0.6, refresh=0)
+    first = [f"Расскажите про {topic} в Erlang" for topic in TOPICS[:10]]
+    second = [f"Расскажите про {topic} в Erlang" for topic in TOPICS[10:]]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            saved_first = await bank.add(db, "Erlang developer", first)
+            # Вопросов похожих позиций меньше min_questions - банк не используется
+            too_few = await bank.find(db, "Erlang dev")
+            # Почти-дубликаты уже сохраненных вопросов похожей позиции не записываются
+            saved_second = await bank.add(db, "Erlang-разработчик", second + ["Опишите горячую замену кода в Erlang"])
+            found = await bank.find(db, "Senior Erlang Engineer")
+            other = await bank.find(db, "Elixir developer")
+            return saved_first, too_few, saved_second, found, other
+
+    saved_first, too_few, saved_second, found, other = client.portal.call(scenario)
+    assert saved_first == 10
+    assert too_few is None
+    assert saved_second == 10
+    assert bank.duplicates == 1
+    assert len(found) == 10
+    assert set(found) <= set(first + second)
+    assert other is None
+    assert bank.stats()["added"] == 20
+
+
+def test_disabled_bank(client):
+    bank = QuestionBank(enabled=False, similarity=0.45, min_questions=20, dedup=0.6, refresh=0)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await bank.add(db, "Erlang developer", ["вопрос"]), await bank.find(db, "Erlang developer")
+
+    assert client.portal.call(scenario) == (0, None)
@@ -0,0 +1,135 @@
+import app.rescoring as rescoring
+from app.crud_fixed import stream_sessions_to_evaluate, get_evaluations
+from app.database_fixed import AsyncSessionLocal
+from app.rescoring import Rescorer, _item, _item_tokens
+from app.services import GeminiService
+from bench.fake_gemini import install_fake_gemini
+from conftest import start_session, complete_session
+
+POSITION = "Erlang rescoring developer"
+
+
+def _completed(client, count: int) -> list:
+    session_ids = [start_session(client, POSITION, user_id="rescoring-user") for _ in range(count)]
+    for session_id in session_ids:
+        complete_session(client, session_id)
+    return session_ids
+
+
+def _only(monkeypatch, session_ids: list):
+    """Переоценка видит только сессии теста: тестовая БД общая"""
+    async def stream(db, version, batch_size, limit=None):
+        async for sessions in stream_sessions_to_evaluate(db, version, batch_size, limit):
+            yield [session for session in sessions if session.session_id in session_ids]
+
+    monkeypatch.setattr(rescoring, "stream_sessions_to_evaluate", stream)
+
+
+def _gemini(packs: list = None) -> GeminiService:
+    """Сервис с фейковым Gemini; размеры пакетов запросов пишутся в packs"""
+    service = GeminiService()
+    install_fake_gemini(service, latency=0, jitter=0, seed=1)
+    evaluate = service.evaluate_batch_async
+
+    async def recording(items):
+        if packs is not None:
+            packs.append([item["session_id"] for item in items])
+        return await evaluate(items)
+
+    service.evaluate_batch_async = recording
+    return service
+
+
+def _evaluations(client, session_ids: list) -> dict:
+    async def read():
+        async with AsyncSessionLocal() as db:
+            return {session_id: [e.version for e in await get_evaluations(db, session_id)] for session_id in session_ids}
+
+    return client.portal.call(read)
+
+
+def test_split_batch():
+    service = GeminiService()
+    text = (
+        "Вступление без номера\n"
+        "=== ОЦЕНКА 2 ===\nвторое\n"
+        "=== ОЦЕНКА 1 ===\nпервое\n"
+        "=== ОЦЕНКА 1 ===\nповтор первого\n"
+        "=== ОЦЕНКА 4 ===\nлишнее\n"
+        "=== ОЦЕНКА 3 ===\n"
+    )
+    # Порядок в ответе не важен, повтор и номер вне пакета отбрасываются, пустая оценка - пропуск
+    assert service._split_batch(text, 3) == ["первое", "второе", None]
+    assert service._split_batch("ответ без разделителей", 2) == [None, None]
+
+
+def test_packs_limited_by_tokens(client, monkeypatch):
+    session_ids = _completed(client, 5)
+    _only(monkeypatch, session_ids)
+
+    async def tokens():
+        async with AsyncSessionLocal() as db:
+            return [_item_tokens(_item(session))
+                    async for sessions in rescoring.stream_sessions_to_evaluate(db, "pack-tokens", 100)
+                    for session in sessions]
+
+    item_tokens = client.portal.call(tokens)
+    assert len(item_tokens) == 5
+    packs = []
+    # Токенов на два собеседования: третье в пакет уже не помещается, хотя pack=4
+    rescorer = Rescorer(version="pack-tokens", model="fake", pack=4, pack_tokens=2 * max(item_tokens), gemini=_gemini(packs))
+    stats = client.portal.call(rescorer.run)
+
+    assert [len(pack) for pack in packs] == [2, 2, 1]
+    assert [session_id for pack in packs for session_id in pack] == session_ids
+    assert (stats["evaluated"], stats["failed"], stats["requests"]) == (5, 0, 3)
+    assert all(versions == ["pack-tokens"] for versions in _evaluations(client, session_ids).values())
+
+
+def test_missed_sessions_rescored_one_by_one(client, monkeypatch):
+    session_ids = _completed(client, 3)
+    _only(monkeypatch, session_ids)
+    packs = []
+    service = _gemini(packs)
+    split_batch = service._split_batch
+
+    def missing_second(text, count):
+        # Модель потеряла второе собеседование пакета
+        result = split_batch(text, count)
+        if count > 1:
+            result[1] = None
+        return result
+
+    monkeypatch.setattr(service, "_split_batch", missing_second)
+    stats = client.portal.call(Rescorer(version="missed", model="fake", pack=3, gemini=service).run)
+
+    assert packs == [session_ids, [session_ids[1]]]
+    assert (stats["evaluated"], stats["failed"], stats["requests"]) == (3, 0, 2)
+    assert all(versions == ["missed"] for versions in _evaluations(client, session_ids).values())
+
+
+def test_rerun_with_same_version_resumes(client, monkeypatch):
+    session_ids = _completed(client, 3)
+    _only(monkeypatch, session_ids)
+    failing = _gemini()
+    evaluate = failing.evaluate_batch_async
+
+    async def fail_first(items):
+        if items[0]["session_id"] == session_ids[0]:
+            raise RuntimeError("модель недоступна")
+        return await evaluate(items)
+
+    failing.evaluate_batch_async = fail_first
+    stats = client.portal.call(Rescorer(version="resume", model="fake", pack=1, retries=0, gemini=failing).run)
+    assert (stats["evaluated"], stats["failed"]) == (2, 1)
+
+    # Повторный запуск той же версии оценивает только то, что не успел первый
+    packs = []
+    stats = client.portal.call(Rescorer(version="resume", model="fake", pack=1, gemini=_gemini(packs)).run)
+    assert packs == [[session_ids[0]]]
+    assert (stats["evaluated"], stats["failed"]) == (1, 0)
+
+    # Другая версия оценивает все заново, исходные оценки остаются
+    stats = client.portal.call(Rescorer(version="resume-2", model="fake", pack=4, gemini=_gemini()).run)
+    assert stats["evaluated"] == 3
+    assert all(sorted(versions) == ["resume", "resume-2"] for versions in _evaluations(client, session_ids).values())
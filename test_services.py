@@ -0,0 +1,41 @@
+import asyncio
+
+from app.services import GeminiService, FEEDBACK_RUBRIC
+from bench.fake_gemini import install_fake_gemini
+
+QUESTIONS = [f"Вопрос {index}" for index in range(10)]
+ANSWERS = [f"Ответ {index}" for index in range(10)]
+
+
+def test_system_instruction_per_operation(monkeypatch):
+    """Рубрика фидбэка уходит только с фидбэком и переоценкой, короткие запросы идут без нее"""
+    service = GeminiService()
+    install_fake_gemini(service, latency=0, jitter=0, seed=1)
+    sent = {}
+    generation_config = service._generation_config
+
+    def recording(operation, cached_content=None):
+        config = generation_config(operation, cached_content)
+        sent[operation] = config.system_instruction
+        return config
+
+    monkeypatch.setattr(service, "_generation_config", recording)
+    items = [{"question": question, "score": 7, "notes": "хорошо"} for question in QUESTIONS]
+
+    async def scenario():
+        await service.generate_questions_async("Clojure system instruction developer")
+        await service.score_answer_async("Clojure developer", QUESTIONS[0], ANSWERS[0])
+        async for _ in service.generate_summary_stream("Clojure developer", items):
+            pass
+        async for _ in service.generate_feedback_stream("Clojure developer", QUESTIONS, ANSWERS):
+            pass
+        await service.evaluate_batch_async([{"position": "Clojure developer", "questions": QUESTIONS, "answers": ANSWERS}])
+
+    asyncio.run(scenario())
+    assert sent == {
+        "questions": None,
+        "scoring": None,
+        "summary": None,
+        "feedback": FEEDBACK_RUBRIC,
+        "rescoring": FEEDBACK_RUBRIC,
+    }
@@ -0,0 +1,176 @@
+import pytest
+from sqlalchemy import update
+
+from app import crud_fixed
+from app.database_fixed import AsyncSessionLocal, InterviewSessionDB
+from app.feedback_queue import feedback_queue
+from app.interview_service import InterviewService
+from app.session_store import SessionStore
+
+
+async def _in_db(session_id: str):
+    async with AsyncSessionLocal() as db:
+        row = await crud_fixed.get_session(db, session_id)
+        return row.get_answers(), row.current_question, row.status
+
+
+async def _interview(service) -> str:
+    async with AsyncSessionLocal() as db:
+        session_id = (await service.start(db, user_id="store-user"))["session_id"]
+        await service.set_position(db, session_id, "Kotlin developer")
+    return session_id
+
+
+async def _answer(service, session_id, index):
+    async with AsyncSessionLocal() as db:
+        return await service.answer(db, session_id, f"ответ {index}", question_index=index)
+
+
+def test_answers_are_written_behind(client):
+    # start() не вызывается - фонового сброса нет, ответы пишутся только flush() или завершением
+    store = SessionStore(mode="memory", max_sessions=100, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+
+    async def scenario():
+        session_id = await _interview(service)
+        for index in range(3):
+            await _answer(service, session_id, index)
+        before = await _in_db(session_id)
+        pending = store.stats()["pending_answers"]
+        await store.flush()
+        return before, pending, await _in_db(session_id)
+
+    before, pending, after = client.portal.call(scenario)
+    assert before == ([], 0, "active")
+    assert pending == 3
+    assert after == (["ответ 0", "ответ 1", "ответ 2"], 3, "active")
+    assert store.stats()["flushes"] == 1
+    assert store.stats()["last_batch_size"] == 3
+
+
+def test_last_answer_flushes_synchronously(client):
+    store = SessionStore(mode="memory", max_sessions=100, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+
+    async def scenario():
+        session_id = await _interview(service)
+        for index in range(10):
+            result = await _answer(service, session_id, index)
+        written = await _in_db(session_id)
+        # Оценка идет в общей очереди - не оставляем ее прерываться остановкой приложения
+        await feedback_queue.wait(session_id, timeout=10)
+        return result, written
+
+    result, (answers, current_question, status) = client.portal.call(scenario)
+    assert result["interview_complete"]
+    assert answers == [f"ответ {index}" for index in range(10)]
+    assert current_question == 10
+    assert status in ("evaluating", "completed")
+    assert store.stats()["pending_answers"] == 0
+    assert store.stats()["active_sessions"] == 0
+
+
+def test_evicted_session_is_reloaded_after_flush(client):
+    store = SessionStore(mode="memory", max_sessions=1, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+
+    async def scenario():
+        first = await _interview(service)
+        await _answer(service, first, 0)
+        # Вторая сессия вытесняет первую, ее ответ еще не записан
+        second = await _interview(service)
+        await _answer(service, second, 0)
+        reply = await _answer(service, first, 1)
+        await store.flush()
+        return reply, await _in_db(first), await _in_db(second)
+
+    reply, first, second = client.portal.call(scenario)
+    assert reply["current_question"] == 3
+    assert first == (["ответ 0", "ответ 1"], 2, "active")
+    assert second == (["ответ 0"], 1, "active")
+    assert store.stats()["evictions"] >= 1
+
+
+def test_stale_step_is_rejected_in_memory(client):
+    store = SessionStore(mode="memory", max_sessions=100, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+
+    async def scenario():
+        session_id = await _interview(service)
+        await _answer(service, session_id, 0)
+        async with AsyncSessionLocal() as db:
+            session = await store.get(db, session_id)
+            return await store.add_answer(db, session, 0, "опоздавший ответ")
+
+    assert client.portal.call(scenario) is None
+
+
+def test_failed_flush_keeps_answers(client, monkeypatch):
+    store = SessionStore(mode="memory", max_sessions=100, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+    save_answers_batch = crud_fixed.save_answers_batch
+
+    async def failing(db, answers):
+        raise RuntimeError("база недоступна")
+
+    async def scenario():
+        session_id = await _interview(service)
+        await _answer(service, session_id, 0)
+        monkeypatch.setattr(crud_fixed, "save_answers_batch", failing)
+        with pytest.raises(RuntimeError):
+            await store.flush()
+        pending = store.stats()["pending_answers"]
+        monkeypatch.setattr(crud_fixed, "save_answers_batch", save_answers_batch)
+        await store.flush()
+        return pending, await _in_db(session_id)
+
+    pending, (answers, _, _) = client.portal.call(scenario)
+    assert pending == 1
+    assert answers == ["ответ 0"]
+    assert store.stats()["flush_errors"] == 1
+
+
+def test_forgotten_session_is_read_from_db(client):
+    """Сессию закрыли в БД в обход хранилища - после forget() хранилище видит новый статус"""
+    store = SessionStore(mode="memory", max_sessions=100, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+
+    async def scenario():
+        session_id = await _interview(service)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(InterviewSessionDB).where(
+                InterviewSessionDB.session_id == session_id
+            ).values(status="expired"))
+            await db.commit()
+        store.forget([session_id])
+        async with AsyncSessionLocal() as db:
+            return (await store.get(db, session_id)).status
+
+    assert client.portal.call(scenario) == "expired"
+
+
+def test_rejected_answer_does_not_block_flushes(client):
+    """Строка, которую БД не принимает, отбрасывается - остальные ответы записываются"""
+    store = SessionStore(mode="memory", max_sessions=100, flush_interval=60, batch_size=100)
+    service = InterviewService(store=store)
+
+    async def scenario():
+        session_id = await _interview(service)
+        for index in range(3):
+            await _answer(service, session_id, index)
+        # Ответ на второй вопрос уже есть в БД - вставка пачки нарушит уникальность (session_id, idx)
+        async with AsyncSessionLocal() as db:
+            await crud_fixed.save_answers_batch(db, [{"session_id": session_id, "idx": 1, "text": "записан раньше"}])
+        await store.flush()
+        await _answer(service, session_id, 3)
+        await store.flush()
+        return await _in_db(session_id)
+
+    answers, current_question, _ = client.portal.call(scenario)
+    assert answers == ["ответ 0", "записан раньше", "ответ 2", "ответ 3"]
+    assert current_question == 4
+    stats = store.stats()
+    assert stats["flush_errors"] == 1
+    assert stats["dropped_answers"] == 1
+    assert stats["pending_answers"] == 0
+    assert stats["flushed_answers"] == 3
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+from bot.update_processor import ChatOrderedUpdateProcessor
+
+
+def _update(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+
+
+def test_burst_of_one_chat_does_not_block_others():
+    processor = ChatOrderedUpdateProcessor(max_concurrent_updates=2)
+    handled, busy = [], []
+
+    async def handle(chat_id, index, delay):
+        busy.append(chat_id)
+        assert busy.count(chat_id) == 1, "обновления одного чата обрабатываются одновременно"
+        await asyncio.sleep(delay)
+        busy.remove(chat_id)
+        handled.append((chat_id, index))
+
+    async def scenario():
+        burst = [
+            asyncio.create_task(processor.process_update(_update(1), handle(1, index, 0.05)))
+            for index in range(5)
+        ]
+        await asyncio.sleep(0.01)
+        # Серия первого чата держит одно место - второй чат обрабатывается сразу
+        await asyncio.wait_for(processor.process_update(_update(2), handle(2, 0, 0)), timeout=0.05)
+        assert processor.current_concurrent_updates == 1
+        # Первое обновление серии возвращается, обработав всю очередь чата
+        await asyncio.gather(*burst)
+
+    asyncio.run(scenario())
+    assert [index for chat_id, index in handled if chat_id == 1] == list(range(5))
+    assert handled.index((2, 0)) < 2
+    assert processor.current_concurrent_updates == 0
+    assert not processor._queues
+
+
+def test_failed_update_does_not_stop_the_chat():
+    processor = ChatOrderedUpdateProcessor(max_concurrent_updates=4)
+    handled = []
+
+    async def handle(index):
+        await asyncio.sleep(0)
+        if index == 1:
+            raise RuntimeError("ошибка обработчика")
+        handled.append(index)
+
+    async def scenario():
+        await asyncio.gather(*(processor.process_update(_update(7), handle(index)) for index in range(3)))
+
+    asyncio.run(scenario())
+    assert handled == [0, 2]